@@ -0,0 +1,250 @@
+"""
+Календарь доступности врачей DentalCare App API
+
+Для каждого врача хранится битовая карта свободных слотов на каждый рабочий
+день горизонта планирования: бит i равен 1, если слот начала рабочего дня
++ i * SLOT_MINUTES свободен. Календарь строится один раз по занятым слотам
+из хранилища и дальше точечно правится при бронировании, переносе и отмене
+записей. Поиск ближайших N свободных слотов перебирает только установленные
+биты, поэтому стоит O(N + просмотренные дни), а не O(горизонт x записи).
+
+Настройки (переменные окружения):
+- DENTAL_SLOT_MINUTES - шаг сетки слотов в минутах
+- DENTAL_CALENDAR_HORIZON_DAYS - горизонт планирования в днях
+
+Рабочие часы врача задаются полями work_start и work_end записи врача
+("HH:MM"); по умолчанию 9:00-18:00. Клиника работает по будням.
+
+Запись на приём занимает столько слотов сетки подряд, сколько нужно на её
+длительность (duration_minutes записи, по умолчанию - один слот).
+"""
+import math
+import os
+import threading
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+# Шаг сетки слотов в минутах
+SLOT_MINUTES = int(os.environ.get("DENTAL_SLOT_MINUTES", "30"))
+
+# Горизонт планирования в днях
+HORIZON_DAYS = int(os.environ.get("DENTAL_CALENDAR_HORIZON_DAYS", "90"))
+
+# Рабочие дни клиники (0 - понедельник)
+WORKING_WEEKDAYS = range(5)
+
+
+class WorkingHours:
+    """Рабочие часы врача"""
+
+    __slots__ = ("start", "end")
+
+    def __init__(self, start: time = time(9, 0), end: time = time(18, 0)):
+        self.start = start
+        self.end = end
+
+    @classmethod
+    def from_doctor(cls, doctor: Optional[dict]) -> "WorkingHours":
+        """Рабочие часы из полей work_start/work_end врача (или часы по умолчанию)"""
+        if not doctor:
+            return DEFAULT_WORKING_HOURS
+        return cls(
+            time.fromisoformat(doctor["work_start"]) if doctor.get("work_start") else DEFAULT_WORKING_HOURS.start,
+            time.fromisoformat(doctor["work_end"]) if doctor.get("work_end") else DEFAULT_WORKING_HOURS.end
+        )
+
+    def __str__(self) -> str:
+        return f"{self.start.hour}:{self.start.minute:02d}-{self.end.hour}:{self.end.minute:02d}"
+
+    @property
+    def slots_per_day(self) -> int:
+        """Количество слотов сетки в рабочем дне"""
+        minutes = (self.end.hour - self.start.hour) * 60 + self.end.minute - self.start.minute
+        return max(0, minutes // SLOT_MINUTES)
+
+    def contains(self, moment: datetime) -> bool:
+        """Попадает ли момент в рабочие часы"""
+        return self.start <= moment.time() < self.end
+
+    def fits(self, moment: datetime, duration_minutes: Optional[int] = None) -> bool:
+        """Заканчивается ли приём, начатый в момент moment, до конца рабочего дня"""
+        end = occupied_slots(moment, duration_minutes)[-1] + timedelta(minutes=SLOT_MINUTES)
+        return end <= datetime.combine(moment.date(), self.end)
+
+    def on_grid(self, moment: datetime) -> bool:
+        """Совпадает ли момент с началом слота сетки (шаг SLOT_MINUTES от начала рабочего дня)"""
+        offset = moment - datetime.combine(moment.date(), self.start)
+        return offset % timedelta(minutes=SLOT_MINUTES) == timedelta(0)
+
+
+DEFAULT_WORKING_HOURS = WorkingHours()
+
+
+def slots_needed(duration_minutes: int) -> int:
+    """Сколько слотов сетки подряд занимает приём указанной длительности"""
+    return max(1, math.ceil(duration_minutes / SLOT_MINUTES))
+
+
+def occupied_slots(start: datetime, duration_minutes: Optional[int] = None) -> List[datetime]:
+    """Начала слотов сетки, которые занимает приём (без длительности - один слот)"""
+    step = timedelta(minutes=SLOT_MINUTES)
+    return [start + step * i for i in range(slots_needed(duration_minutes or SLOT_MINUTES))]
+
+
+class DoctorCalendar:
+    """
+    Битовые карты свободных слотов одного врача на горизонт планирования.
+
+    version - версия бронирований врача в хранилище, по которой построен
+    календарь; календарь другой версии нужно перестроить или обновить.
+    """
+
+    def __init__(
+        self,
+        hours: WorkingHours,
+        booked: Iterable[datetime],
+        version: int,
+        start_day: date,
+        horizon_days: int = HORIZON_DAYS
+    ):
+        self.hours = hours
+        self.version = version
+        self.start_day = start_day
+        self.days: List[date] = [
+            day for day in (start_day + timedelta(days=i) for i in range(horizon_days))
+            if day.weekday() in WORKING_WEEKDAYS
+        ]
+        self._free: Dict[date, int] = dict.fromkeys(self.days, (1 << hours.slots_per_day) - 1)
+        for slot_time in booked:
+            self.book(slot_time)
+
+    def _locate(self, moment: datetime) -> Optional[Tuple[date, int]]:
+        """День и номер слота сетки для момента (None - вне сетки или горизонта)"""
+        day = moment.date()
+        if day not in self._free:
+            return None
+        offset = moment - datetime.combine(day, self.hours.start)
+        index, remainder = divmod(offset, timedelta(minutes=SLOT_MINUTES))
+        if offset < timedelta(0) or remainder or index >= self.hours.slots_per_day:
+            return None
+        return day, index
+
+    def book(self, slot_time: datetime) -> None:
+        """Отметить слот занятым"""
+        location = self._locate(slot_time)
+        if location:
+            day, index = location
+            self._free[day] &= ~(1 << index)
+
+    def release(self, slot_time: datetime) -> None:
+        """Отметить слот свободным"""
+        location = self._locate(slot_time)
+        if location:
+            day, index = location
+            self._free[day] |= 1 << index
+
+    def iter_free(
+        self,
+        after: datetime,
+        duration_minutes: int = SLOT_MINUTES,
+        until: Optional[datetime] = None
+    ) -> Iterator[datetime]:
+        """
+        Свободные начала приёмов длительностью duration_minutes строго после after.
+
+        Слоты идут по возрастанию времени; приём должен целиком помещаться
+        в свободные слоты одного рабочего дня. Если задан until, слоты
+        начинаются раньше него.
+        """
+        need = slots_needed(duration_minutes)
+        step = timedelta(minutes=SLOT_MINUTES)
+        for i in range(bisect_left(self.days, after.date()), len(self.days)):
+            day = self.days[i]
+            base = datetime.combine(day, self.hours.start)
+            if until is not None and base >= until:
+                return
+
+            # Биты, с которых начинается need свободных слотов подряд
+            free = self._free[day]
+            starts = free
+            for shift in range(1, need):
+                starts &= free >> shift
+            if after >= base:
+                first = (after - base) // step + 1
+                starts &= ~((1 << first) - 1)
+
+            while starts:
+                lowest = starts & -starts
+                starts ^= lowest
+                slot_time = base + step * (lowest.bit_length() - 1)
+                if until is not None and slot_time >= until:
+                    return
+                yield slot_time
+
+    def next_free(
+        self,
+        after: datetime,
+        count: int,
+        duration_minutes: int = SLOT_MINUTES,
+        until: Optional[datetime] = None
+    ) -> List[datetime]:
+        """Ближайшие count свободных начал приёмов после after"""
+        return list(islice(self.iter_free(after, duration_minutes, until), count))
+
+
+class AvailabilityCalendar:
+    """
+    Календари доступности всех врачей процесса.
+
+    Календарь врача строится при первом запросе и перестраивается, если версия
+    бронирований врача в хранилище ушла вперёд или начался новый день.
+    Изменения бронирований, сделанные через это хранилище, применяются
+    точечно (patch) без перестроения.
+    """
+
+    def __init__(self, horizon_days: int = HORIZON_DAYS):
+        self.horizon_days = horizon_days
+        self._calendars: Dict[int, DoctorCalendar] = {}
+        self._lock = threading.Lock()
+
+    def get(self, doctor_id: int, version: int, build: Callable[[date], DoctorCalendar]) -> DoctorCalendar:
+        """Календарь врача для версии version; build(start_day) строит его заново"""
+        today = date.today()
+        with self._lock:
+            calendar = self._calendars.get(doctor_id)
+        if calendar is None or calendar.version != version or calendar.start_day != today:
+            calendar = build(today)
+            with self._lock:
+                self._calendars[doctor_id] = calendar
+        return calendar
+
+    def patch(
+        self,
+        doctor_id: int,
+        version: int,
+        booked: Iterable[datetime] = (),
+        released: Iterable[datetime] = ()
+    ) -> None:
+        """
+        Применить изменение бронирований врача, переводящее его в версию version.
+
+        booked и released - занятые и освободившиеся этим изменением слоты.
+
+        Если календарь отстаёт больше чем на одно изменение, он удаляется
+        и будет перестроен при следующем запросе.
+        """
+        with self._lock:
+            calendar = self._calendars.get(doctor_id)
+            if calendar is None:
+                return
+            if calendar.version != version - 1:
+                del self._calendars[doctor_id]
+                return
+            for slot_time in released:
+                calendar.release(slot_time)
+            for slot_time in booked:
+                calendar.book(slot_time)
+            calendar.version = version
@@ -0,0 +1,105 @@
+"""
+Бенчмарк бронирования: задержка записи на приём в зависимости от объёма базы
+
+Для каждого размера заполняет хранилище N записями на приём (слоты врачей
+по дням, последний слот дня оставлен свободным) и замеряет задержку
+add_appointment - проверку слота, выдачу ID, вставку в индексы и правку
+календаря доступности. Бронируются свободные слоты в случайные дни всего
+диапазона, поэтому новые записи попадают в середину индексов, а не в хвост.
+Задержка должна оставаться одинаковой от тысяч до миллиона записей.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_booking.py --sizes 1000 10000 100000 1000000
+    python benchmarks/bench_booking.py --storage sqlite --sizes 1000 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from models import AppointmentStatus  # noqa: E402
+from storage import InMemoryStorage, SQLiteStorage  # noqa: E402
+
+START = datetime(2031, 1, 6)
+SLOTS_PER_DAY = 18  # 9:00-17:30, последний слот остаётся свободным
+
+
+def seed() -> dict:
+    return {
+        "doctors": main.MOCK_DOCTORS, "patients": main.MOCK_PATIENTS,
+        "appointments": {}, "results": {}, "services": {}, "reviews": {}, "notifications": {},
+    }
+
+
+def appointment(doctor_id: int, day: int, slot: int, status=AppointmentStatus.CONFIRMED) -> dict:
+    return {
+        "patient_id": 1 + (day + slot) % len(main.MOCK_PATIENTS), "doctor_id": doctor_id,
+        "appointment_time": START + timedelta(days=day, hours=9, minutes=30 * slot),
+        "service_type": "Консультация", "status": status,
+        "created_at": START, "updated_at": START,
+    }
+
+
+def filled(rows: int, backend: str, directory: str):
+    """Хранилище с rows записями; возвращает его и число заполненных дней"""
+    doctors = sorted(main.MOCK_DOCTORS)
+    per_day = len(doctors) * (SLOTS_PER_DAY - 1)
+    appointments = [
+        appointment(doctors[index % len(doctors)], index // per_day, index % per_day // len(doctors))
+        for index in range(rows)
+    ]
+    if backend == "sqlite":
+        path = os.path.join(directory, f"booking-{rows}.db")
+        SQLiteStorage.initialize(path, seed())
+        storage = SQLiteStorage.connect(path)
+    else:
+        storage = InMemoryStorage(seed())
+    for offset in range(0, rows, 5000):
+        storage.add_appointments(appointments[offset:offset + 5000])
+    return storage, rows // per_day + 1
+
+
+def measure(storage, days: int, bookings: int) -> list:
+    """Задержки (мкс) бронирования свободных последних слотов в случайные дни"""
+    doctors = sorted(main.MOCK_DOCTORS)
+    free = random.Random(0).sample([(doctor, day) for day in range(days) for doctor in doctors],
+                                   min(bookings, days * len(doctors)))
+    latencies = []
+    for doctor, day in free:
+        record = appointment(doctor, day, SLOTS_PER_DAY - 1, AppointmentStatus.PENDING)
+        started = time.perf_counter()
+        storage.add_appointment(record)
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return latencies
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--bookings", type=int, default=2_000)
+    parser.add_argument("--storage", choices=["memory", "sqlite"], default="memory")
+    args = parser.parse_args()
+
+    print(f"Хранилище {args.storage}, бронирований на размер: {args.bookings}")
+    print(f"{'записей':>10} {'медиана, мкс':>13} {'p99, мкс':>10} {'среднее, мкс':>13}")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in args.sizes:
+            storage, days = filled(rows, args.storage, directory)
+            latencies = sorted(measure(storage, days, args.bookings))
+            p99 = latencies[int(len(latencies) * 0.99) - 1]
+            print(f"{rows:>10} {statistics.median(latencies):>13.1f} {p99:>10.1f} "
+                  f"{statistics.fmean(latencies):>13.1f}")
+            if args.storage == "sqlite":
+                storage.close()
+            del storage
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,91 @@
+"""
+Бенчмарк быстрой сериализации списков: запросов в секунду на GET /api/appointments
+
+Заполняет хранилище N записями на приём и по очереди замеряет обычный путь
+FastAPI (проверка моделью ответа) и быстрый режим (DENTAL_FAST_JSON).
+Запросы выполняются в процессе через ASGI-транспорт httpx, без сети и
+сервера, поэтому разница показывает стоимость обработки ответа, а не
+сетевого стека. Общая для обоих режимов часть - выборка записей и
+подстановка имён.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_fast_json.py --rows 10000 --seconds 5
+    DENTAL_STORAGE=sqlite DENTAL_DB_PATH=/tmp/bench.db python benchmarks/bench_fast_json.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+import serialization  # noqa: E402
+from models import AppointmentStatus  # noqa: E402
+
+
+async def fill(rows: int, batch: int = 500) -> None:
+    """Добавить rows записей на приём (слоты четырёх врачей по рабочим дням)"""
+    start = datetime.combine(datetime.now().date() + timedelta(days=365), datetime.min.time())
+    appointments = []
+    for index in range(rows):
+        slot, doctor = divmod(index, 4)
+        day, slot = divmod(slot, 18)
+        appointments.append({
+            "patient_id": 1 + index % 3, "doctor_id": 1 + doctor,
+            "appointment_time": start + timedelta(days=day, hours=9, minutes=30 * slot),
+            "service_type": "Консультация", "status": AppointmentStatus.CONFIRMED,
+            "notes": "Бенчмарк" if index % 2 else None,
+            "created_at": start, "updated_at": start,
+        })
+    async with main.database.session() as db:
+        for offset in range(0, rows, batch):
+            await db.add_appointments(appointments[offset:offset + batch])
+
+
+async def measure(client: httpx.AsyncClient, url: str, seconds: float) -> tuple:
+    """Запросов в секунду и тело ответа"""
+    body = (await client.get(url)).content  # прогрев
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        response = await client.get(url)
+        assert response.status_code == 200
+        count += 1
+    return count / (time.perf_counter() - started), body
+
+
+async def run(rows: int, seconds: float, url: str) -> dict:
+    await fill(rows)
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, fast in (("pydantic", False), ("fast", True)):
+            serialization.FAST_JSON = fast
+            results[name] = await measure(client, url, seconds)
+    return results
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    url = "/api/appointments"
+    results = asyncio.run(run(args.rows, args.seconds, url))
+
+    rows = len(serialization.loads(results["fast"][1]))
+    print(f"GET {url}: {rows} записей, ответ {len(results['fast'][1]) / 1e6:.1f} МБ")
+    for name, (rps, _) in results.items():
+        print(f"  {name:<9} {rps:8.2f} запросов/с  {1000 / rps:8.1f} мс/запрос")
+    print(f"  ускорение {results['fast'][0] / results['pydantic'][0]:.1f}x, "
+          f"ответы совпадают: {results['fast'][1] == results['pydantic'][1]}")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,142 @@
+"""
+Бенчмарк рассылки уведомлений: задержка переходов записей не включает рассылку
+
+Клиенты параллельно подтверждают (PUT /api/appointments/{id}/confirm) и
+отменяют (DELETE /api/appointments/{id}) записи на приём. Каждый переход
+публикует событие, а NotificationWorker (notifications.py) в фоне сохраняет
+уведомления и передаёт их отправителю push. Замеры в трёх режимах:
+- без фоновых обработчиков (событие публикуется в пустую шину);
+- с обработчиками и мгновенной отправкой push;
+- с медленной отправкой push (--push-ms на уведомление).
+Задержка и пропускная способность запросов во всех режимах должны быть
+одинаковыми; рассылка догоняет после ответов (время досылки - отдельно).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_notifications.py --requests 2000 --clients 16 --push-ms 5
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from models import AppointmentStatus  # noqa: E402
+from notifications import PushSender  # noqa: E402
+
+
+class SlowPushSender(PushSender):
+    """Отправка push с задержкой сети на каждое уведомление"""
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.delay = delay
+
+    async def send(self, notifications):
+        await asyncio.sleep(self.delay * len(notifications))
+        await super().send(notifications)
+
+
+async def fill(count: int) -> list:
+    """count записей в ожидании подтверждения (слоты врачей по рабочим дням через год)"""
+    start = datetime.combine(datetime.now().date() + timedelta(days=365), datetime.min.time())
+    doctors = sorted(main.MOCK_DOCTORS)
+    appointments = []
+    for index in range(count):
+        slot, doctor = divmod(index, len(doctors))
+        day, slot = divmod(slot, 18)
+        appointments.append({
+            "patient_id": 1 + index % len(main.MOCK_PATIENTS), "doctor_id": doctors[doctor],
+            "appointment_time": start + timedelta(days=day, hours=9, minutes=30 * slot),
+            "service_type": "Консультация", "status": AppointmentStatus.PENDING,
+            "created_at": start, "updated_at": start,
+        })
+    created = []
+    async with main.database.session() as db:
+        for offset in range(0, count, 500):
+            created += await db.add_appointments(appointments[offset:offset + 500])
+    return [appointment["id"] for appointment in created]
+
+
+async def transitions(client: httpx.AsyncClient, ids: list, clients: int) -> tuple:
+    """Подтвердить, затем отменить записи ids; задержки запросов (мс) и запросов в секунду"""
+    latencies = []
+
+    async def run(queue: list) -> None:
+        while queue:
+            appointment_id = queue.pop()
+            for method, url in (
+                ("PUT", f"/api/appointments/{appointment_id}/confirm"),
+                ("DELETE", f"/api/appointments/{appointment_id}?cancelled_by=clinic"),
+            ):
+                started = time.perf_counter()
+                response = await client.request(method, url)
+                latencies.append((time.perf_counter() - started) * 1000)
+                assert response.status_code == 200, response.text
+
+    queue = list(ids)
+    started = time.perf_counter()
+    await asyncio.gather(*(run(queue) for _ in range(clients)))
+    return latencies, len(latencies) / (time.perf_counter() - started)
+
+
+async def scenario(client: httpx.AsyncClient, ids: list, clients: int, workers: bool, sender=None) -> dict:
+    if not workers:
+        latencies, rps = await transitions(client, ids, clients)
+        return {"latencies": latencies, "rps": rps, "drain": 0.0, "created": 0}
+    main.NOTIFICATION_WORKER.sender = sender or PushSender()
+    created = main.NOTIFICATION_WORKER.created
+    lifespan = main.lifespan(main.app)
+    await lifespan.__aenter__()
+    latencies, rps = await transitions(client, ids, clients)
+    # Остановка дожидается обработки всех опубликованных событий
+    started = time.perf_counter()
+    await lifespan.__aexit__(None, None, None)
+    return {
+        "latencies": latencies, "rps": rps, "drain": time.perf_counter() - started,
+        "created": main.NOTIFICATION_WORKER.created - created,
+    }
+
+
+async def run(requests: int, clients: int, push_ms: float) -> dict:
+    count = requests // 2
+    ids = await fill(3 * count)
+    modes = {
+        "без рассылки": (False, None),
+        "рассылка": (True, PushSender()),
+        f"push {push_ms:g} мс": (True, SlowPushSender(push_ms / 1000)),
+    }
+    results = {}
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for number, (name, (workers, sender)) in enumerate(modes.items()):
+            results[name] = await scenario(client, ids[number * count:(number + 1) * count], clients, workers, sender)
+    return results
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2_000, help="запросов на режим")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--push-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests, args.clients, args.push_ms))
+    print(f"Переходы записей: {args.requests} запросов на режим, {args.clients} клиентов")
+    print(f"{'режим':<14} {'запросов/с':>10} {'медиана, мс':>12} {'p99, мс':>8} "
+          f"{'уведомлений':>12} {'досылка, с':>11}")
+    for name, result in results.items():
+        latencies = sorted(result["latencies"])
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{name:<14} {result['rps']:>10.0f} {statistics.median(latencies):>12.2f} {p99:>8.2f} "
+              f"{result['created']:>12} {result['drain']:>11.2f}")
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,140 @@
+"""
+Бенчмарк памяти записей: словари против компактных записей (records.py)
+
+Строит N записей на приём, результатов обследований и уведомлений из
+одинаковых исходных словарей (каждая строка и дата - отдельный объект, как
+после разбора JSON) и хранит их либо копиями dict, либо CompactRecord.
+Измеряет байты на запись по tracemalloc (точно и воспроизводимо) и прирост
+RSS процесса (каждый вариант строится в отдельном процессе, Linux).
+В обоих вариантах учтены сами значения полей и 8 байт ссылки в списке.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_records_memory.py --records 200000
+"""
+import argparse
+import gc
+import multiprocessing
+import os
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import AppointmentStatus, NotificationType, ResultType  # noqa: E402
+from records import AppointmentRecord, NotificationRecord, ResultRecord  # noqa: E402
+
+START = datetime(2031, 1, 6, 9, 0)
+SERVICES = ["Консультация", "Профессиональная гигиена", "Лечение кариеса", "Удаление зуба"]
+STATUSES = tuple(AppointmentStatus)
+RESULT_TYPES = tuple(ResultType)
+NOTIFICATION_TYPES = tuple(NotificationType)
+
+
+def appointment(index: int) -> dict:
+    created = START + timedelta(minutes=index)
+    return {
+        "id": index + 1, "patient_id": 1 + index % 5000, "doctor_id": 1 + index % 40,
+        "appointment_time": START + timedelta(minutes=30 * index),
+        "service_type": "".join(SERVICES[index % len(SERVICES)]),  # новая строка, как из JSON
+        "status": STATUSES[index % len(STATUSES)],
+        "notes": f"Пожелание пациента {index}" if index % 3 == 0 else None,
+        "diagnosis": None, "treatment": None, "recommendations": None,
+        "created_at": created, "updated_at": created + timedelta(seconds=1),
+        "reminded_at": None, "duration_minutes": 30 if index % 4 else 60,
+    }
+
+
+def result(index: int) -> dict:
+    return {
+        "id": index + 1, "patient_id": 1 + index % 5000, "doctor_id": 1 + index % 40,
+        "result_type": RESULT_TYPES[index % len(RESULT_TYPES)],
+        "title": f"Снимок {index % 32 + 1} зуба", "description": f"Заключение по обследованию {index}",
+        "file_url": f"/files/results/{index}.pdf" if index % 2 else None,
+        "created_at": START + timedelta(minutes=index),
+    }
+
+
+def notification(index: int) -> dict:
+    return {
+        "id": index + 1, "user_id": 1 + index % 5000,
+        "notification_type": NOTIFICATION_TYPES[index % len(NOTIFICATION_TYPES)],
+        "title": "".join(["Напоминание ", "о приёме"]), "message": f"Приём {index} завтра в 10:00",
+        "is_read": bool(index % 2), "related_id": index + 1,
+        "created_at": START + timedelta(minutes=index),
+    }
+
+
+TABLES = {
+    "appointments": (appointment, AppointmentRecord),
+    "results": (result, ResultRecord),
+    "notifications": (notification, NotificationRecord),
+}
+
+
+def build(table: str, compact: bool, count: int) -> list:
+    source, record_class = TABLES[table]
+    wrap = record_class if compact else dict
+    return [wrap(source(index)) for index in range(count)]
+
+
+def traced_bytes(table: str, compact: bool, count: int) -> float:
+    """Байт на запись по tracemalloc"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    records = build(table, compact, count)
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del records
+    return used / count
+
+
+def _rss() -> int:
+    """Текущий RSS процесса в байтах"""
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def _rss_child(table: str, compact: bool, count: int, queue) -> None:
+    gc.collect()
+    before = _rss()
+    records = build(table, compact, count)
+    gc.collect()
+    queue.put((_rss() - before) / count)
+    del records
+
+
+def rss_bytes(table: str, compact: bool, count: int) -> float:
+    """Прирост RSS на запись, в отдельном процессе"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_rss_child, args=(table, compact, count, queue))
+    process.start()
+    value = queue.get()
+    process.join()
+    return value
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--no-rss", action="store_true", help="только tracemalloc")
+    args = parser.parse_args()
+    args.no_rss = args.no_rss or not os.path.exists("/proc/self/statm")
+
+    print(f"{args.records} записей, байт на запись")
+    print(f"{'таблица':<14} {'dict':>8} {'compact':>8} {'экономия':>9}"
+          + ("" if args.no_rss else f" {'RSS dict':>9} {'RSS compact':>12}"))
+    for table in TABLES:
+        plain = traced_bytes(table, False, args.records)
+        compact = traced_bytes(table, True, args.records)
+        line = f"{table:<14} {plain:>8.0f} {compact:>8.0f} {1 - compact / plain:>8.0%}"
+        if not args.no_rss:
+            line += (f" {rss_bytes(table, False, args.records):>9.0f}"
+                     f" {rss_bytes(table, True, args.records):>12.0f}")
+        print(line)
+
+
+if __name__ == "__main__":
+    main_()
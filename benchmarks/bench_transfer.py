@@ -0,0 +1,156 @@
+"""
+Бенчмарк импорта и экспорта: потоковая загрузка и выгрузка больших таблиц
+
+Генерирует тело файла записей на приём (NDJSON или CSV) частями по мере
+чтения, загружает его тем же Importer, что и POST /api/import/{entity},
+и выгружает таблицу тем же export_rows, что и GET /api/export/{entity}.
+Замеряет строк в секунду и прирост RSS процесса по ходу загрузки и
+выгрузки. С хранилищем SQLite данные лежат на диске, и RSS не должен
+расти с числом строк: в памяти держится одна порция (DENTAL_TRANSFER_CHUNK).
+
+Запуск из корня репозитория:
+    python benchmarks/bench_transfer.py --rows 10000000
+    python benchmarks/bench_transfer.py --rows 1000000 --format csv --storage memory
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from database import Database  # noqa: E402
+from models import DataEntity, DataFormat  # noqa: E402
+from serialization import dumps  # noqa: E402
+from storage import InMemoryStorage, SQLiteStorage  # noqa: E402
+from transfer import Importer, export_rows  # noqa: E402
+
+START = datetime(2031, 1, 6)
+DOCTORS = sorted(main.MOCK_DOCTORS)
+PATIENTS = sorted(main.MOCK_PATIENTS)
+FIELDS = ("id", "patient_id", "doctor_id", "appointment_time", "service_type", "status",
+          "notes", "created_at", "updated_at", "duration_minutes")
+
+
+def seed() -> dict:
+    return {
+        "doctors": main.MOCK_DOCTORS, "patients": main.MOCK_PATIENTS,
+        "appointments": {}, "results": {}, "services": {}, "reviews": {}, "notifications": {},
+    }
+
+
+def row(index: int) -> dict:
+    """Предстоящая запись на приём: слоты врачей по рабочим дням"""
+    slot, doctor = divmod(index, len(DOCTORS))
+    day, slot = divmod(slot, 18)
+    return {
+        "id": index + 1, "patient_id": PATIENTS[index % len(PATIENTS)], "doctor_id": DOCTORS[doctor],
+        "appointment_time": START + timedelta(days=day, hours=9, minutes=30 * slot),
+        "service_type": "Консультация", "status": "pending",
+        "notes": f"Строка {index}" if index % 4 == 0 else None,
+        "created_at": START, "updated_at": START, "duration_minutes": 30,
+    }
+
+
+async def body(rows: int, fmt: DataFormat, part_size: int = 64 * 1024):
+    """Тело файла частями по ~part_size байт"""
+    if fmt == DataFormat.CSV:
+        yield ",".join(FIELDS).encode() + b"\n"
+    parts, size = [], 0
+    for index in range(rows):
+        record = row(index)
+        if fmt == DataFormat.CSV:
+            line = ",".join("" if record[field] is None else str(record[field]) for field in FIELDS).encode()
+        else:
+            line = dumps(record)
+        parts.append(line)
+        size += len(line) + 1
+        if size >= part_size:
+            parts.append(b"")
+            yield b"\n".join(parts)
+            parts, size = [], 0
+    if parts:
+        parts.append(b"")
+        yield b"\n".join(parts)
+
+
+def rss() -> int:
+    """Текущий RSS процесса в байтах (Linux; 0 если недоступен)"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+class Progress:
+    """Пиковый прирост RSS и вывод хода раз в report строк"""
+
+    def __init__(self, label: str, report: int):
+        self.label = label
+        self.report = report
+        self.base = rss()
+        self.peak = 0
+        self.rows = 0
+        self.started = self.finished = time.perf_counter()
+
+    def update(self, rows: int) -> None:
+        before = self.rows
+        self.rows += rows
+        self.finished = time.perf_counter()
+        self.peak = max(self.peak, rss() - self.base)
+        if self.rows // self.report != before // self.report:
+            print(f"  {self.label}: {self.rows:>11,} строк, {self.rate():>9,.0f} строк/с, "
+                  f"RSS +{self.peak / 2**20:.0f} МБ", flush=True)
+
+    def rate(self) -> float:
+        return self.rows / (self.finished - self.started)
+
+
+async def run(rows: int, fmt: DataFormat, database: Database, report: int) -> None:
+    imported = Progress("импорт", report)
+    summary = await Importer(
+        database, DataEntity.APPOINTMENTS, on_saved=lambda records: imported.update(len(records))
+    ).run(body(rows, fmt), fmt)
+    assert summary["imported"] == rows, summary["errors"][:5]
+
+    exported = Progress("экспорт", report)
+    header = fmt == DataFormat.CSV
+    async for part in export_rows(database, DataEntity.APPOINTMENTS, fmt):
+        exported.update(part.count(b"\n") - header)  # первая часть CSV - строка заголовков
+        header = False
+    assert exported.rows == rows
+
+    print(f"{'':<8} {'строк/с':>10} {'RSS, МБ':>8}")
+    for progress in (imported, exported):
+        print(f"{progress.label:<8} {progress.rate():>10,.0f} {progress.peak / 2**20:>8.0f}")
+
+
+def main_() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--format", choices=[fmt.value for fmt in DataFormat], default=DataFormat.NDJSON.value)
+    parser.add_argument("--storage", choices=["sqlite", "memory"], default="sqlite")
+    parser.add_argument("--report", type=int, default=1_000_000, help="выводить ход каждые N строк")
+    args = parser.parse_args()
+
+    fmt = DataFormat(args.format)
+    print(f"{args.rows:,} записей на приём, {fmt.value}, хранилище {args.storage}")
+    with tempfile.TemporaryDirectory() as directory:
+        if args.storage == "sqlite":
+            path = os.path.join(directory, "transfer.db")
+            SQLiteStorage.initialize(path, seed())
+            database = Database(partial(SQLiteStorage.connect, path), pool_size=2)
+        else:
+            storage = InMemoryStorage(seed())
+            database = Database(lambda: storage, pool_size=2)
+        asyncio.run(run(args.rows, fmt, database, args.report))
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,129 @@
+"""
+Кэши ответов DentalCare App API
+"""
+import hashlib
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Tuple
+
+
+class VersionedCache:
+    """
+    LRU-кэш собранных ответов с инвалидацией по версии.
+
+    Хранилище увеличивает версию ключа (например, пациента) при каждом изменении
+    его данных; запись кэша действительна, пока версия совпадает. Если ответ
+    зависит от текущего времени, запись дополнительно истекает в valid_until.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[Hashable, Optional[datetime], Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: Hashable, now: Optional[datetime] = None) -> Optional[Any]:
+        """Значение из кэша, если оно построено для этой версии и ещё не истекло"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_version, valid_until, value = entry
+            if entry_version == version and (valid_until is None or (now or datetime.now()) < valid_until):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, version: Hashable, value: Any, valid_until: Optional[datetime] = None) -> None:
+        """Сохранить значение для версии (самые давние записи вытесняются)"""
+        self._entries[key] = (version, valid_until, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        """Размер кэша и счётчики попаданий"""
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def make_etag(body: bytes) -> str:
+    """Сильный ETag тела ответа"""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Совпадает ли ETag с заголовком If-None-Match (слабое сравнение, как требует RFC 9110)"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class CachedResponse(NamedTuple):
+    """Готовый ответ: ETag, тело JSON и дополнительные заголовки"""
+
+    etag: str
+    body: bytes
+    headers: Dict[str, str]
+
+
+class ResponseCache:
+    """
+    LRU-кэш сериализованных JSON-ответов справочников.
+
+    Ключ - вариант запроса (эндпоинт и параметры), запись действительна, пока
+    версия набора данных в хранилище не изменилась. ETag вычисляется по телу
+    один раз при сборке ответа. Кэш ограничен и количеством записей,
+    и суммарным размером тел.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 32 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[int, CachedResponse]]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, version: int) -> Optional[CachedResponse]:
+        """Ответ из кэша, если он собран для этой версии данных"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry_version, response = entry
+            if entry_version == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return response
+            self._discard(key)
+        self.misses += 1
+        return None
+
+    def put(
+        self,
+        key: Hashable,
+        version: int,
+        body: bytes,
+        headers: Optional[Dict[str, str]] = None
+    ) -> CachedResponse:
+        """Сохранить ответ для версии данных (самые давние записи вытесняются)"""
+        response = CachedResponse(make_etag(body), body, headers or {})
+        self._discard(key)
+        if len(body) <= self.max_bytes:
+            self._entries[key] = (version, response)
+            self._size += len(body)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+        return response
+
+    def _discard(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._size -= len(entry[1].body)
+
+    def stats(self) -> dict:
+        """Размер кэша и счётчики попаданий"""
+        return {"entries": len(self._entries), "bytes": self._size, "hits": self.hits, "misses": self.misses}
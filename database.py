@@ -0,0 +1,116 @@
+"""
+Асинхронный доступ к хранилищу DentalCare App API
+
+Эндпоинты получают сессию хранилища через зависимость FastAPI: сессия берётся
+из ограниченного пула на время запроса и возвращается в пул после ответа.
+Вызовы блокирующих хранилищ (SQLite) выполняются в пуле потоков, поэтому
+медленный запрос к базе не останавливает цикл событий.
+
+Настройки (переменные окружения):
+- DENTAL_STORAGE - memory или sqlite
+- DENTAL_DB_PATH - путь к файлу базы SQLite
+- DENTAL_DB_POOL_SIZE - размер пула соединений
+- DENTAL_DB_POOL_TIMEOUT - сколько секунд ждать свободное соединение
+"""
+import os
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, List
+
+import anyio
+from fastapi import HTTPException, status
+
+from availability import AvailabilityCalendar
+from storage import InMemoryStorage, SQLiteStorage, Storage
+
+
+class AsyncStorage:
+    """
+    Асинхронная обёртка над сессией хранилища.
+
+    Предоставляет те же методы, что и Storage, но в виде корутин.
+    """
+
+    def __init__(self, storage: Storage, database: "Database"):
+        self._storage = storage
+        self._database = database
+
+    def __getattr__(self, name: str):
+        method = getattr(self._storage, name)
+
+        if self._storage.blocking:
+            async def call(*args, **kwargs):
+                return await self._database.run_in_thread(method, *args, **kwargs)
+        else:
+            async def call(*args, **kwargs):
+                return method(*args, **kwargs)
+
+        call.__name__ = name
+        return call
+
+
+class Database:
+    """
+    Ограниченный пул сессий хранилища.
+
+    Не больше pool_size запросов одновременно работают с хранилищем; остальные
+    ждут свободную сессию не дольше timeout секунд и получают 503.
+    """
+
+    def __init__(self, connect: Callable[[], Storage], pool_size: int = 10, timeout: float = 5.0):
+        self._connect = connect
+        self._idle: List[Storage] = []
+        self._slots = anyio.Semaphore(pool_size)
+        self._limiter = anyio.CapacityLimiter(pool_size)
+        self.pool_size = pool_size
+        self.timeout = timeout
+
+    async def run_in_thread(self, func: Callable, *args, **kwargs):
+        """Выполнить блокирующий вызов хранилища в пуле потоков (не больше pool_size одновременно)"""
+        return await anyio.to_thread.run_sync(partial(func, *args, **kwargs), limiter=self._limiter)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncStorage]:
+        """Взять сессию из пула на время блока"""
+        try:
+            with anyio.fail_after(self.timeout):
+                await self._slots.acquire()
+        except TimeoutError:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Сервер перегружен, повторите запрос позже"
+            )
+
+        try:
+            storage = self._idle.pop() if self._idle else self._connect()
+            try:
+                yield AsyncStorage(storage, self)
+            finally:
+                self._idle.append(storage)
+        finally:
+            self._slots.release()
+
+    @property
+    def in_use(self) -> int:
+        """Количество сессий, занятых запросами"""
+        return self.pool_size - self._slots.value
+
+
+def create_database(seed: Dict[str, Dict[int, dict]]) -> Database:
+    """Создать пул сессий согласно переменным окружения"""
+    backend = os.environ.get("DENTAL_STORAGE", "memory")
+    pool_size = int(os.environ.get("DENTAL_DB_POOL_SIZE", "10"))
+    timeout = float(os.environ.get("DENTAL_DB_POOL_TIMEOUT", "5"))
+
+    if backend == "sqlite":
+        path = os.environ.get("DENTAL_DB_PATH", "dental.db")
+        SQLiteStorage.initialize(path, seed)
+        # Сессии процесса разделяют один календарь доступности
+        calendar = AvailabilityCalendar()
+        return Database(partial(SQLiteStorage.connect, path, calendar), pool_size, timeout)
+    if backend != "memory":
+        raise ValueError(f"Неизвестное хранилище DENTAL_STORAGE={backend!r}")
+
+    # Все сессии in-memory хранилища разделяют одни и те же данные
+    storage = InMemoryStorage(seed)
+    return Database(lambda: storage, pool_size, timeout)
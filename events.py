@@ -0,0 +1,118 @@
+"""
+Шина событий DentalCare App API
+
+Эндпоинты публикуют события (переходы статусов записей, новые результаты)
+и сразу отвечают клиенту, а фоновые обработчики получают события из своих
+очередей. Публикация не ждёт подписчиков: очередь каждого подписчика
+ограничена, и если она переполнена, событие для этого подписчика
+отбрасывается и учитывается в счётчике dropped.
+
+Шина работает внутри одного процесса (воркера uvicorn).
+"""
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, FrozenSet, Iterable, List, NamedTuple, Optional
+
+
+class Event(NamedTuple):
+    """Событие предметной области"""
+
+    type: str  # например, NotificationType.APPOINTMENT_CONFIRMED
+    user_id: int  # пользователь, которого касается событие
+    related_id: Optional[int]  # ID связанной записи/результата
+    data: Dict[str, Any]
+    created_at: datetime
+
+
+# Служебные события (кроме событий с типами NotificationType)
+NOTIFICATION_CREATED = "notification_created"  # уведомление сохранено в хранилище
+SLOT_BOOKED = "slot_booked"  # слот врача занят
+SLOT_RELEASED = "slot_released"  # слот врача освободился
+
+
+# Признак закрытия подписки в очереди
+_CLOSED = object()
+
+
+class Subscription:
+    """Подписка на события шины с собственной ограниченной очередью"""
+
+    def __init__(self, bus: "EventBus", maxsize: int, types: Optional[FrozenSet[str]]):
+        self.maxsize = maxsize
+        self.types = types
+        self.closed = False
+        self.dropped = 0
+        self._bus = bus
+        self._queue: asyncio.Queue = asyncio.Queue()
+
+    def offer(self, event: Event) -> None:
+        """Положить событие в очередь подписки (при переполнении событие отбрасывается)"""
+        if self.closed or (self.types is not None and event.type not in self.types):
+            return
+        if self._queue.qsize() >= self.maxsize:
+            self.dropped += 1
+            return
+        self._queue.put_nowait(event)
+
+    @property
+    def pending(self) -> int:
+        """Сколько событий ждёт обработки"""
+        return self._queue.qsize()
+
+    async def next_batch(self, max_items: int) -> List[Event]:
+        """
+        Дождаться хотя бы одного события и забрать накопившиеся (не больше max_items).
+
+        Пустой список означает, что подписка закрыта и все события обработаны.
+        """
+        if self.closed and self._queue.empty():
+            return []
+        batch: List[Event] = []
+        event = await self._queue.get()
+        while event is not _CLOSED:
+            batch.append(event)
+            if len(batch) >= max_items or self._queue.empty():
+                break
+            event = self._queue.get_nowait()
+        return batch
+
+    def close(self) -> None:
+        """Отписаться от шины; уже полученные события остаются в очереди"""
+        if not self.closed:
+            self.closed = True
+            self._bus.unsubscribe(self)
+            self._queue.put_nowait(_CLOSED)
+
+
+class EventBus:
+    """Шина событий процесса"""
+
+    def __init__(self):
+        self._subscriptions: List[Subscription] = []
+        self.published = 0
+
+    def subscribe(self, maxsize: int = 1000, types: Optional[Iterable[str]] = None) -> Subscription:
+        """Подписаться на события (types - только события этих типов)"""
+        subscription = Subscription(self, maxsize, frozenset(types) if types is not None else None)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Удалить подписку"""
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    def publish(self, event: Event) -> None:
+        """Опубликовать событие всем подписчикам (не блокирует)"""
+        self.published += 1
+        for subscription in self._subscriptions:
+            subscription.offer(event)
+
+    def stats(self) -> dict:
+        """Счётчики шины"""
+        return {
+            "published": self.published,
+            "subscriptions": len(self._subscriptions),
+            "pending": sum(s.pending for s in self._subscriptions),
+            "dropped": sum(s.dropped for s in self._subscriptions),
+        }
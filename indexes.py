@@ -0,0 +1,581 @@
+"""
+Индексы in-memory хранилища DentalCare App API
+"""
+import math
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter, defaultdict
+from datetime import datetime
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from availability import occupied_slots
+from models import AppointmentStatus
+
+
+# Статусы отменённых записей - такие записи не занимают слот врача
+CANCELLED_STATUSES = [AppointmentStatus.CANCELLED_BY_PATIENT, AppointmentStatus.CANCELLED_BY_CLINIC]
+
+# Статусы предстоящих (ещё не проведённых и не отменённых) записей
+UPCOMING_STATUSES = [AppointmentStatus.PENDING, AppointmentStatus.CONFIRMED]
+
+
+class BookingLedger:
+    """
+    Реестр бронирований слотов врачей.
+
+    Хранит соответствие (doctor_id, начало слота) -> ID записи для каждого
+    слота сетки, который занимает запись (на всю длительность приёма).
+    Проверка конфликта выполняется за O(слотов записи) вместо прохода по всем
+    записям, а бронирование и перенос выполняются атомарно под блокировкой.
+    """
+
+    def __init__(self):
+        self._slots: Dict[Tuple[int, datetime], int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _keys(appointment: dict, slot_time: Optional[datetime] = None) -> List[Tuple[int, datetime]]:
+        """Ключи слотов, которые занимает запись (или заняла бы, начавшись в slot_time)"""
+        start = slot_time or appointment["appointment_time"]
+        return [
+            (appointment["doctor_id"], slot)
+            for slot in occupied_slots(start, appointment.get("duration_minutes"))
+        ]
+
+    def _owner(self, keys: List[Tuple[int, datetime]], appointment_id: Optional[int]) -> Optional[int]:
+        """Первая другая запись, занимающая один из слотов keys (вызывается под блокировкой)"""
+        for key in keys:
+            owner = self._slots.get(key)
+            if owner is not None and owner != appointment_id:
+                return owner
+        return None
+
+    def add(self, appointment: dict) -> None:
+        """Занять слоты записью (отменённые записи слоты не занимают)"""
+        if appointment["status"] in CANCELLED_STATUSES:
+            return
+        with self._lock:
+            for key in self._keys(appointment):
+                self._slots[key] = appointment["id"]
+
+    def remove(self, appointment: dict) -> None:
+        """Освободить слоты, занятые этой записью"""
+        with self._lock:
+            for key in self._keys(appointment):
+                if self._slots.get(key) == appointment["id"]:
+                    del self._slots[key]
+
+    def reserve(self, appointment: dict, allocate: Optional[Callable[[], int]] = None) -> Optional[int]:
+        """
+        Атомарно забронировать слоты записи (все или ни одного).
+
+        Новой записи ID выдаёт allocate - только после успешного бронирования,
+        поэтому отклонённая запись не расходует ID.
+        Возвращает ID конфликтующей записи, если слот уже занят, иначе None.
+        """
+        keys = self._keys(appointment)
+        with self._lock:
+            owner = self._owner(keys, appointment["id"])
+            if owner is None:
+                if allocate is not None:
+                    appointment["id"] = allocate()
+                for key in keys:
+                    self._slots[key] = appointment["id"]
+        return owner
+
+    def reserve_many(
+        self,
+        appointments: List[dict],
+        allocate: Optional[Callable[[], int]] = None
+    ) -> Dict[int, Optional[int]]:
+        """
+        Атомарно забронировать слоты нескольких записей.
+
+        Слоты бронируются все или ни одного: если часть слотов занята (в том
+        числе более ранней записью того же пакета), возвращается
+        {номер записи: ID конфликтующей записи}, иначе пустой словарь
+        (для новой записи пакета, которой ID ещё не выдан, - None).
+        Новым записям ID выдаёт allocate - только если пакет принят.
+        """
+        keys = [self._keys(appointment) for appointment in appointments]
+        with self._lock:
+            conflicts: Dict[int, Optional[int]] = {}
+            batch: Dict[Tuple[int, datetime], Optional[int]] = {}
+            for index, appointment in enumerate(appointments):
+                owner = self._owner(keys[index], appointment["id"])
+                if owner is not None:
+                    conflicts[index] = owner
+                else:
+                    overlap = [key for key in keys[index] if key in batch]
+                    if overlap:
+                        conflicts[index] = batch[overlap[0]]
+                batch.update(dict.fromkeys(keys[index], appointment["id"]))
+            if not conflicts:
+                for index, appointment in enumerate(appointments):
+                    if allocate is not None:
+                        appointment["id"] = allocate()
+                    self._slots.update(dict.fromkeys(keys[index], appointment["id"]))
+        return conflicts
+
+    def move(self, appointment: dict, new_time: datetime) -> Optional[int]:
+        """
+        Атомарно перенести бронирование записи на новое время.
+
+        Возвращает ID конфликтующей записи, если новые слоты заняты (старые
+        слоты при этом остаются за записью), иначе None.
+        """
+        appointment_id = appointment["id"]
+        new_keys = self._keys(appointment, new_time)
+        with self._lock:
+            owner = self._owner(new_keys, appointment_id)
+            if owner is not None:
+                return owner
+            for key in self._keys(appointment):
+                if self._slots.get(key) == appointment_id:
+                    del self._slots[key]
+            for key in new_keys:
+                self._slots[key] = appointment_id
+        return None
+
+    def owner(self, doctor_id: int, slot_time: datetime) -> Optional[int]:
+        """ID записи, занимающей слот, или None если слот свободен"""
+        return self._slots.get((doctor_id, slot_time))
+
+    def is_taken(self, doctor_id: int, slot_time: datetime, exclude_id: Optional[int] = None) -> bool:
+        """Проверить, занят ли слот (запись exclude_id не учитывается)"""
+        owner = self._slots.get((doctor_id, slot_time))
+        return owner is not None and owner != exclude_id
+
+
+class SortedBlocks:
+    """
+    Отсортированный список, разбитый на блоки длиной до 2 * BLOCK_SIZE.
+
+    Вставка и удаление сдвигают элементы только внутри одного блока, а не
+    всего списка, поэтому не дорожают с ростом числа записей: блок находится
+    бинарным поиском по максимумам блоков. Обход идёт по блокам по порядку.
+    """
+
+    BLOCK_SIZE = 512
+
+    __slots__ = ("_blocks", "_maxes", "_len")
+
+    def __init__(self, items: Iterable[Any] = ()):
+        items = sorted(items)
+        self._blocks: List[List[Any]] = [
+            items[i:i + self.BLOCK_SIZE] for i in range(0, len(items), self.BLOCK_SIZE)
+        ]
+        self._maxes: List[Any] = [block[-1] for block in self._blocks]
+        self._len = len(items)
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[Any]:
+        for block in self._blocks:
+            yield from block
+
+    def add(self, item: Any) -> None:
+        """Вставить элемент на его место"""
+        self._len += 1
+        if not self._blocks:
+            self._blocks.append([item])
+            self._maxes.append(item)
+            return
+        i = bisect_right(self._maxes, item)
+        if i == len(self._blocks):
+            i -= 1
+            self._blocks[i].append(item)
+            self._maxes[i] = item
+        else:
+            insort(self._blocks[i], item)
+        block = self._blocks[i]
+        if len(block) > 2 * self.BLOCK_SIZE:
+            self._blocks[i:i + 1] = [block[:self.BLOCK_SIZE], block[self.BLOCK_SIZE:]]
+            self._maxes[i:i + 1] = [block[self.BLOCK_SIZE - 1], block[-1]]
+
+    def remove(self, item: Any) -> bool:
+        """Удалить элемент; False если его нет"""
+        i = bisect_left(self._maxes, item)
+        if i == len(self._blocks):
+            return False
+        block = self._blocks[i]
+        j = bisect_left(block, item)
+        if block[j] != item:
+            return False
+        del block[j]
+        self._len -= 1
+        if not block:
+            del self._blocks[i]
+            del self._maxes[i]
+        elif j == len(block):
+            self._maxes[i] = block[-1]
+        return True
+
+    def bisect_right(self, item: Any) -> int:
+        """Количество элементов, не больших item"""
+        i = bisect_right(self._maxes, item)
+        if i == len(self._blocks):
+            return self._len
+        return sum(map(len, self._blocks[:i])) + bisect_right(self._blocks[i], item)
+
+    def iter_after(self, after: Optional[Any] = None, reverse: bool = False) -> Iterator[Any]:
+        """
+        Обойти элементы строго после after (при reverse=True - строго до него,
+        от больших к меньшим). Без after обходятся все элементы.
+        """
+        blocks = self._blocks
+        if reverse:
+            i, end = len(blocks) - 1, None
+            if after is not None:
+                i = bisect_left(self._maxes, after)
+                if i < len(blocks):
+                    end = bisect_left(blocks[i], after)
+                else:
+                    i -= 1
+            for block in blocks[i::-1] if i >= 0 else ():
+                for k in range((len(block) if end is None else end) - 1, -1, -1):
+                    yield block[k]
+                end = None
+        else:
+            if after is None:
+                i, start = 0, 0
+            else:
+                i = bisect_right(self._maxes, after)
+                start = bisect_right(blocks[i], after) if i < len(blocks) else 0
+            for block in blocks[i:]:
+                for k in range(start, len(block)):
+                    yield block[k]
+                start = 0
+
+
+class SortedIndex:
+    """
+    Вторичный индекс по значению поля.
+
+    Каждая корзина - пары (значение поля сортировки, ID), упорядоченные
+    по полю сортировки (SortedBlocks), поэтому выборка по значению не требует
+    сортировки, а вставка не дорожает с ростом корзины.
+    Если поле не задано, все записи попадают в одну корзину.
+    """
+
+    def __init__(self, field: Optional[str] = None, sort_field: str = "appointment_time"):
+        self.field = field
+        self.sort_field = sort_field
+        self._buckets: Dict[Any, SortedBlocks] = defaultdict(SortedBlocks)
+
+    def _value(self, record: dict) -> Any:
+        return record[self.field] if self.field else None
+
+    def _entry(self, record: dict) -> Tuple[Any, int]:
+        return record[self.sort_field], record["id"]
+
+    def add(self, record: dict) -> None:
+        """Добавить запись в корзину её значения"""
+        self._buckets[self._value(record)].add(self._entry(record))
+
+    def remove(self, record: dict) -> None:
+        """Удалить запись из корзины её значения"""
+        value = self._value(record)
+        bucket = self._buckets.get(value)
+        if not bucket:
+            return
+        bucket.remove(self._entry(record))
+        if not bucket:
+            del self._buckets[value]
+
+    def bucket(self, value: Any = None) -> SortedBlocks:
+        """Отсортированная корзина значения (пустая если значений нет)"""
+        return self._buckets.get(value) or SortedBlocks()
+
+    def pop_bucket(self, value: Any = None) -> SortedBlocks:
+        """Удалить корзину значения целиком и вернуть её"""
+        return self._buckets.pop(value, None) or SortedBlocks()
+
+    def iter_bucket(
+        self,
+        value: Any = None,
+        after: Optional[Tuple[Any, int]] = None,
+        reverse: bool = False
+    ) -> Iterator[Tuple[Any, int]]:
+        """
+        Обойти корзину значения, начиная строго после ключа after.
+
+        При reverse=True обход идёт от больших ключей к меньшим.
+        Начальная позиция находится бинарным поиском.
+        """
+        return self.bucket(value).iter_after(after, reverse)
+
+
+class UniqueIndex:
+    """
+    Уникальный индекс: значение поля -> ID единственной записи с этим значением.
+
+    Проверка и занятие значения выполняются атомарно под блокировкой.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self._ids: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, record: dict, allocate: Callable[[], int]) -> Optional[int]:
+        """
+        Атомарно закрепить значение поля за новой записью.
+
+        ID записи выдаёт allocate - только если значение свободно, поэтому
+        отклонённая запись не расходует ID.
+        Возвращает ID записи, которая уже владеет значением, иначе None.
+        """
+        value = record[self.field]
+        with self._lock:
+            owner = self._ids.get(value)
+            if owner is None:
+                record["id"] = allocate()
+                self._ids[value] = record["id"]
+        return owner
+
+    def add(self, record: dict) -> None:
+        """Добавить запись в индекс"""
+        with self._lock:
+            self._ids[record[self.field]] = record["id"]
+
+    def get(self, value: Any) -> Optional[int]:
+        """ID записи с этим значением или None"""
+        return self._ids.get(value)
+
+
+class KeyOrder:
+    """
+    Упорядоченные ID таблицы для выгрузки порциями.
+
+    Из таблиц in-memory хранилища записи не удаляются, поэтому новые ID -
+    хвост словаря в порядке вставки. Список догоняет таблицу при чтении:
+    ID, выданные по возрастанию, дописываются в конец, загруженные импортом
+    вне порядка - вставляются на место. Порция находится бинарным поиском
+    и не зависит от разреженности ID.
+    """
+
+    def __init__(self, records: Dict[int, Any]):
+        self._records = records
+        self._ids: List[int] = sorted(records)
+        self._seen = len(records)
+        self._lock = threading.Lock()
+
+    def after(self, after_id: int, limit: int) -> List[int]:
+        """Не больше limit ID больше after_id по возрастанию"""
+        with self._lock:
+            if len(self._records) != self._seen:
+                for record_id in islice(self._records, self._seen, None):
+                    if not self._ids or record_id > self._ids[-1]:
+                        self._ids.append(record_id)
+                    else:
+                        insort(self._ids, record_id)
+                self._seen = len(self._records)
+            start = bisect_right(self._ids, after_id)
+            return self._ids[start:start + limit]
+
+
+class RecordIndex:
+    """
+    Набор вторичных индексов одной таблицы по полям FIELDS.
+
+    Все корзины упорядочены по SORT_FIELD. Фильтрованная выборка обходит
+    наименьшую из подходящих корзин и проверяет остальные фильтры по самой записи.
+    """
+
+    FIELDS: Tuple[str, ...] = ()
+    SORT_FIELD = "appointment_time"
+
+    def __init__(self):
+        self._all = SortedIndex(sort_field=self.SORT_FIELD)
+        self._indexes = {field: SortedIndex(field, sort_field=self.SORT_FIELD) for field in self.FIELDS}
+
+    def index(self, field: Optional[str] = None) -> SortedIndex:
+        """Индекс по полю (без поля - индекс всех записей)"""
+        return self._indexes[field] if field else self._all
+
+    def add(self, record: dict) -> None:
+        """Добавить запись во все индексы"""
+        self._all.add(record)
+        for index in self._indexes.values():
+            index.add(record)
+
+    def remove(self, record: dict) -> None:
+        """Удалить запись из всех индексов"""
+        self._all.remove(record)
+        for index in self._indexes.values():
+            index.remove(record)
+
+    def query(
+        self,
+        records: Dict[int, dict],
+        after: Optional[Tuple[Any, int]] = None,
+        reverse: bool = False,
+        **filters: Any
+    ) -> Iterator[dict]:
+        """
+        Записи, удовлетворяющие фильтрам, в порядке SORT_FIELD.
+
+        Фильтры со значением None не применяются. Если задан ключ after
+        (значение SORT_FIELD, id), выборка начинается строго после него.
+        При reverse=True записи идут от новых к старым.
+        """
+        filters = {field: value for field, value in filters.items() if value is not None}
+        index, value = self._all, None
+        for field, candidate in filters.items():
+            if len(self._indexes[field].bucket(candidate)) < len(index.bucket(value)):
+                index, value = self._indexes[field], candidate
+
+        for _, record_id in index.iter_bucket(value, after=after, reverse=reverse):
+            record = records[record_id]
+            if all(record[field] == value for field, value in filters.items()):
+                yield record
+
+
+class AppointmentIndex(RecordIndex):
+    """Вторичные индексы записей на приём по patient_id, doctor_id и status"""
+
+    FIELDS = ("patient_id", "doctor_id", "status")
+    SORT_FIELD = "appointment_time"
+
+
+class ReviewIndex(RecordIndex):
+    """Вторичные индексы отзывов по doctor_id и patient_id (по времени создания)"""
+
+    FIELDS = ("doctor_id", "patient_id")
+    SORT_FIELD = "created_at"
+
+
+class InboxIndex:
+    """
+    Входящие уведомления пользователей.
+
+    Для каждого пользователя хранятся две корзины, упорядоченные по времени
+    создания: все уведомления и только непрочитанные. Последние N уведомлений
+    берутся с конца корзины без просмотра и сортировки, счётчик непрочитанных -
+    размер корзины непрочитанных, а отметка о прочтении удаляет запись только
+    из неё.
+    """
+
+    def __init__(self):
+        self._all = SortedIndex("user_id", sort_field="created_at")
+        self._unread = SortedIndex("user_id", sort_field="created_at")
+
+    def add(self, notification: dict) -> None:
+        """Добавить уведомление во входящие пользователя"""
+        self._all.add(notification)
+        if not notification["is_read"]:
+            self._unread.add(notification)
+
+    def mark_read(self, notification: dict) -> None:
+        """Убрать уведомление из непрочитанных"""
+        self._unread.remove(notification)
+
+    def unread_count(self, user_id: int) -> int:
+        """Количество непрочитанных уведомлений пользователя"""
+        return len(self._unread.bucket(user_id))
+
+    def take_unread(self, user_id: int) -> List[int]:
+        """Забрать ID всех непрочитанных уведомлений пользователя (корзина очищается целиком)"""
+        return [notification_id for _, notification_id in self._unread.pop_bucket(user_id)]
+
+    def iter_latest(
+        self,
+        user_id: int,
+        unread_only: bool = False,
+        after: Optional[Tuple[Any, int]] = None
+    ) -> Iterator[Tuple[Any, int]]:
+        """Ключи (created_at, id) уведомлений пользователя от новых к старым, строго после after"""
+        index = self._unread if unread_only else self._all
+        return index.iter_bucket(user_id, after=after, reverse=True)
+
+
+# Поля статистики врача, которые поддерживаются счётчиками
+DOCTOR_COUNTER_FIELDS = (
+    "total_appointments",
+    "completed_appointments",
+    "cancelled_appointments",
+    "patients_served",
+    "rating_sum",
+    "rating_count",
+)
+
+
+class DoctorCounters:
+    """Счётчики статистики одного врача"""
+
+    __slots__ = ("total", "completed", "cancelled", "patients", "upcoming", "rating_sum", "rating_count")
+
+    def __init__(self):
+        self.total = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.patients: Counter = Counter()  # patient_id -> количество записей
+        self.upcoming = SortedBlocks()  # (время, ID) записей в статусах UPCOMING_STATUSES
+        self.rating_sum = 0
+        self.rating_count = 0
+
+
+class DoctorStatsIndex:
+    """
+    Статистика врачей, поддерживаемая инкрементально.
+
+    Счётчики обновляются при каждом изменении записи (remove старого состояния,
+    add нового) и при каждом новом отзыве, поэтому статистика врача читается
+    за O(log n) - бинарный поиск нужен только для отсечения прошедших записей.
+    """
+
+    def __init__(self):
+        self._doctors: Dict[int, DoctorCounters] = defaultdict(DoctorCounters)
+
+    def add(self, appointment: dict) -> None:
+        """Учесть запись в счётчиках врача"""
+        counters = self._doctors[appointment["doctor_id"]]
+        counters.total += 1
+        counters.patients[appointment["patient_id"]] += 1
+        if appointment["status"] == AppointmentStatus.COMPLETED:
+            counters.completed += 1
+        elif appointment["status"] in CANCELLED_STATUSES:
+            counters.cancelled += 1
+        elif appointment["status"] in UPCOMING_STATUSES:
+            counters.upcoming.add((appointment["appointment_time"], appointment["id"]))
+
+    def remove(self, appointment: dict) -> None:
+        """Исключить запись из счётчиков врача"""
+        counters = self._doctors[appointment["doctor_id"]]
+        counters.total -= 1
+        counters.patients[appointment["patient_id"]] -= 1
+        if not counters.patients[appointment["patient_id"]]:
+            del counters.patients[appointment["patient_id"]]
+        if appointment["status"] == AppointmentStatus.COMPLETED:
+            counters.completed -= 1
+        elif appointment["status"] in CANCELLED_STATUSES:
+            counters.cancelled -= 1
+        elif appointment["status"] in UPCOMING_STATUSES:
+            counters.upcoming.remove((appointment["appointment_time"], appointment["id"]))
+
+    def add_review(self, review: dict) -> None:
+        """Учесть оценку отзыва в рейтинге врача"""
+        counters = self._doctors[review["doctor_id"]]
+        counters.rating_sum += review["rating"]
+        counters.rating_count += 1
+
+    def get(self, doctor_id: int, now: datetime) -> dict:
+        """Статистика врача на момент now"""
+        counters = self._doctors.get(doctor_id) or DoctorCounters()
+        past = counters.upcoming.bisect_right((now, math.inf))
+        return {
+            "total_appointments": counters.total,
+            "completed_appointments": counters.completed,
+            "upcoming_appointments": len(counters.upcoming) - past,
+            "cancelled_appointments": counters.cancelled,
+            "patients_served": len(counters.patients),
+            "rating_sum": counters.rating_sum,
+            "rating_count": counters.rating_count,
+        }
+
+    def doctor_ids(self) -> List[int]:
+        """ID врачей, для которых есть счётчики"""
+        return list(self._doctors)
@@ -2,26 +2,61 @@
 DentalCare App - FastAPI Backend
 Демонстрационный API для системы управления стоматологической клиникой
 """
-from fastapi import FastAPI, HTTPException, status
+import time
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+from pydantic import TypeAdapter
 from datetime import datetime, timedelta
 from models import (
-    DoctorWithSchedule, DoctorSpecialization,
-    AppointmentCreate, AppointmentResponse, AppointmentStatus, AppointmentUpdate, AppointmentComplete,
+    DoctorWithSchedule, DoctorSpecialization, AvailableSlotResponse,
+    AppointmentCreate, AppointmentBatchCreate, BatchItemError, AppointmentResponse,
+    AppointmentIdsRequest, DoctorRangeCancel, BulkTransitionResponse, AppointmentStatus, AppointmentUpdate, AppointmentComplete,
     MedicalResultCreate, MedicalResultResponse, ResultType,
     SuccessResponse, ErrorResponse, PatientBase, PatientHistoryResponse,
-    NotificationResponse, NotificationType,
+    NotificationResponse, NotificationType, UnreadCountResponse, MarkReadResponse,
     ServiceResponse,
     ReviewCreate, ReviewResponse,
-    DoctorStatisticsResponse
+    DoctorStatisticsResponse,
+    DataEntity, DataFormat, ImportSummary
 )
+from pagination import MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, lookahead, paginate
+from database import AsyncStorage, create_database
+from metrics import LatencyTracker
+from storage import BatchConflictError, DuplicateReviewError, SlotConflictError, StatusTransition, UnknownDoctorError
+from indexes import UPCOMING_STATUSES
+from cache import ResponseCache, VersionedCache, etag_matches
+from availability import DEFAULT_WORKING_HOURS, SLOT_MINUTES, WorkingHours, occupied_slots
+from profiles import DoctorDirectory, join_json
+from serialization import RecordEncoder, records_response
+from names import APPOINTMENT_NAMES, RESULT_NAMES, REVIEW_NAMES, NameCache
+from events import SLOT_BOOKED, SLOT_RELEASED, EventBus
+from notifications import NotificationWorker, PushSender, appointment_event, result_event
+from reminders import ReminderScheduler
+from streams import StreamConnection, StreamHub, doctor_channel, event_stream, slot_event, user_channel
+from transfer import MEDIA_TYPES, Importer, export_rows
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Запуск и остановка фоновых обработчиков"""
+    await STREAMS.start()
+    await NOTIFICATION_WORKER.start()
+    await REMINDERS.start()
+    yield
+    await REMINDERS.stop()
+    await NOTIFICATION_WORKER.stop()
+    await STREAMS.stop()
+
 
 # Инициализация приложения
 app = FastAPI(
     title="DentalCare App API",
     description="REST API для мобильного приложения сети стоматологических клиник",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS middleware для работы с фронтендом
@@ -31,10 +66,25 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
+# Длительности запросов для оценки перцентилей задержки
+LATENCY = LatencyTracker()
+
+
+@app.middleware("http")
+async def track_latency(request: Request, call_next):
+    """Замеряет длительность обработки запроса"""
+    started = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    LATENCY.observe(elapsed)
+    response.headers["Server-Timing"] = f"app;dur={elapsed * 1000:.1f}"
+    return response
 
-# ========== In-Memory Storage (Заглушки) ==========
+
+# ========== Тестовые данные (Заглушки) ==========
 
 # Тестовые данные - врачи
 MOCK_DOCTORS = {
@@ -105,9 +155,7 @@ MOCK_APPOINTMENTS = {
     1: {
         "id": 1,
         "patient_id": 1,
-        "patient_name": "Иван Сидоров",
         "doctor_id": 1,
-        "doctor_name": "Анна Иванова",
         "appointment_time": datetime.now() - timedelta(days=1),  # Вчера
         "service_type": "Консультация ортодонта",
         "status": AppointmentStatus.CONFIRMED,
@@ -121,9 +169,7 @@ MOCK_APPOINTMENTS = {
     2: {
         "id": 2,
         "patient_id": 1,
-        "patient_name": "Иван Сидоров",
         "doctor_id": 2,
-        "doctor_name": "Дмитрий Петров",
         "appointment_time": datetime(2025, 11, 5, 14, 30),
         "service_type": "Удаление зуба мудрости",
         "status": AppointmentStatus.PENDING,
@@ -142,7 +188,6 @@ MOCK_RESULTS = {
         "id": 1,
         "patient_id": 1,
         "doctor_id": 1,
-        "doctor_name": "Анна Иванова",
         "result_type": ResultType.XRAY,
         "title": "Панорамный снимок",
         "description": "Общее состояние зубов удовлетворительное",
@@ -153,7 +198,6 @@ MOCK_RESULTS = {
         "id": 2,
         "patient_id": 1,
         "doctor_id": 1,
-        "doctor_name": "Анна Иванова",
         "result_type": ResultType.PHOTO,
         "title": "Фото прикуса",
         "description": "Для планирования ортодонтического лечения",
@@ -219,7 +263,6 @@ MOCK_REVIEWS = {
     1: {
         "id": 1,
         "patient_id": 1,
-        "patient_name": "Иван Сидоров",
         "doctor_id": 1,
         "appointment_id": 1,
         "rating": 5,
@@ -229,7 +272,6 @@ MOCK_REVIEWS = {
     2: {
         "id": 2,
         "patient_id": 2,
-        "patient_name": "Мария Федорова",
         "doctor_id": 2,
         "appointment_id": 3,
         "rating": 5,
@@ -272,23 +314,141 @@ MOCK_NOTIFICATIONS = {
     }
 }
 
-# Счетчики для генерации ID
-appointment_counter = 3
-result_counter = 3
-review_counter = 3
-notification_counter = 4
+# Хранилище данных (in-memory или SQLite, см. storage.py) и пул его сессий
+database = create_database({
+    "doctors": MOCK_DOCTORS,
+    "patients": MOCK_PATIENTS,
+    "appointments": MOCK_APPOINTMENTS,
+    "results": MOCK_RESULTS,
+    "services": MOCK_SERVICES,
+    "reviews": MOCK_REVIEWS,
+    "notifications": MOCK_NOTIFICATIONS
+})
+
+# Кэш собранных историй пациентов (инвалидируется версией данных пациента)
+PATIENT_HISTORY_CACHE = VersionedCache(max_entries=1024)
+
+# Сколько ближайших свободных слотов показывать в списке врачей
+SCHEDULE_PREVIEW_SLOTS = 10
+
+# Снимок профилей врачей (перестраивается при изменении версии врачей)
+DOCTOR_DIRECTORY = DoctorDirectory()
+
+# Шина событий и фоновая доставка уведомлений
+EVENTS = EventBus()
+NOTIFICATION_WORKER = NotificationWorker(EVENTS, database, PushSender())
+
+# Напоминания о подтверждённых приёмах (за DENTAL_REMINDER_HOURS часов)
+REMINDERS = ReminderScheduler(EVENTS, database, NOTIFICATION_WORKER)
+
+# Потоки событий (SSE) для клиентов: уведомления и изменения слотов
+STREAMS = StreamHub(EVENTS)
+
+# Имена пациентов и врачей для ответов (записи хранят только ID)
+NAMES = NameCache()
+
+# Готовые ответы справочников (врачи, пациенты, услуги) с ETag
+RESPONSE_CACHE = ResponseCache()
+
+SERVICE_LIST = TypeAdapter(List[ServiceResponse])
+
+# Кодировщики списков для быстрого режима сериализации (DENTAL_FAST_JSON)
+APPOINTMENT_JSON = RecordEncoder(AppointmentResponse)
+RESULT_JSON = RecordEncoder(MedicalResultResponse)
+NOTIFICATION_JSON = RecordEncoder(NotificationResponse)
+REVIEW_JSON = RecordEncoder(ReviewResponse)
 
 
 # ========== Helper Functions ==========
 
-def validate_appointment_time(appointment_time: datetime) -> None:
+async def get_db() -> AsyncIterator[AsyncStorage]:
+    """Зависимость FastAPI: сессия хранилища из пула на время запроса"""
+    async with database.session() as db:
+        yield db
+
+
+async def cached_json(
+    request: Request,
+    key: Hashable,
+    version: int,
+    build: Callable[[], Awaitable[Tuple[bytes, Dict[str, str]]]]
+) -> Response:
+    """
+    Ответ справочника из кэша с сильным ETag.
+
+    version - версия набора данных в хранилище, прочитанная до сборки ответа;
+    build собирает тело JSON и дополнительные заголовки. Если ETag совпадает
+    с If-None-Match запроса, возвращается 304 без тела.
+    """
+    cached = RESPONSE_CACHE.get(key, version)
+    if cached is None:
+        body, headers = await build()
+        cached = RESPONSE_CACHE.put(key, version, body, headers)
+    
+    headers = {"ETag": cached.etag, "Cache-Control": "no-cache", **cached.headers}
+    if etag_matches(request.headers.get("if-none-match"), cached.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=cached.body, media_type="application/json", headers=headers)
+
+
+def sse_response(connection: StreamConnection) -> StreamingResponse:
+    """Ответ text/event-stream для соединения с каналом потока событий"""
+    return StreamingResponse(
+        event_stream(connection),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def bulk_summary(new_status: AppointmentStatus, transition: StatusTransition) -> dict:
+    """Сводка массовой смены статуса вместо полных записей"""
+    return {
+        "status": new_status,
+        "updated_count": len(transition.updated),
+        "updated_ids": [appointment["id"] for appointment in transition.updated],
+        "skipped": [
+            {"id": appointment_id, "status": current}
+            for appointment_id, current in transition.skipped.items()
+        ],
+    }
+
+
+def publish_cancellations(appointments: List[dict]) -> None:
+    """События отмены записей клиникой (уведомления пациентам и освобождённые слоты)"""
+    for appointment in appointments:
+        EVENTS.publish(appointment_event(
+            NotificationType.APPOINTMENT_CANCELLED, appointment, cancelled_by="clinic"
+        ))
+        EVENTS.publish(slot_event(SLOT_RELEASED, appointment))
+
+
+async def service_duration(db: AsyncStorage, service_id: Optional[int]) -> Optional[int]:
+    """Длительность приёма по услуге в минутах (None - услуга не указана)"""
+    if service_id is None:
+        return None
+    service = await db.get_service(service_id)
+    if service is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Услуга с ID {service_id} не найдена"
+        )
+    return service["duration_minutes"]
+
+
+def validate_appointment_time(
+    appointment_time: datetime,
+    hours: WorkingHours = DEFAULT_WORKING_HOURS,
+    duration_minutes: Optional[int] = None
+) -> None:
     """
     Валидация времени записи
     
     Проверяет:
     - Время не в прошлом
-    - Время в рабочие часы (9:00-18:00)
+    - Время в рабочие часы врача (по умолчанию 9:00-18:00), приём длительностью
+      duration_minutes заканчивается до конца рабочего дня
     - Время не в выходные (суббота, воскресенье)
+    - Время на сетке слотов календаря (шаг SLOT_MINUTES от начала рабочего дня)
     """
     now = datetime.now()
     
@@ -299,11 +459,16 @@ def validate_appointment_time(appointment_time: datetime) -> None:
             detail="Нельзя записаться на время в прошлом"
         )
     
-    # Проверка: рабочие часы (9:00-18:00)
-    if appointment_time.hour < 9 or appointment_time.hour >= 18:
+    # Проверка: рабочие часы врача
+    if not hours.contains(appointment_time):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Запись возможна только в рабочее время ({hours})"
+        )
+    if not hours.fits(appointment_time, duration_minutes):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Запись возможна только в рабочее время (9:00-18:00)"
+            detail=f"Приём не заканчивается до конца рабочего времени ({hours})"
         )
     
     # Проверка: не выходные дни
@@ -313,43 +478,14 @@ def validate_appointment_time(appointment_time: datetime) -> None:
             detail="Клиника не работает в выходные дни"
         )
     
-    # Проверка: минуты должны быть :00 или :30
-    if appointment_time.minute not in [0, 30]:
+    # Проверка: время совпадает с началом слота сетки календаря
+    if not hours.on_grid(appointment_time):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Запись возможна только на :00 или :30 минут"
+            detail=f"Запись возможна только на начало слота: каждые {SLOT_MINUTES} минут с {hours.start:%H:%M}"
         )
 
 
-def generate_time_slots(doctor_id: int, days_ahead: int = 7) -> List[datetime]:
-    """Генерирует доступные временные слоты для врача"""
-    slots = []
-    base_date = datetime.now().replace(hour=9, minute=0, second=0, microsecond=0)
-    
-    for day in range(1, days_ahead + 1):
-        current_date = base_date + timedelta(days=day)
-        
-        # Пропускаем выходные
-        if current_date.weekday() >= 5:
-            continue
-        
-        # Рабочие часы: 9:00 - 18:00, слоты по 30 минут
-        for hour in range(9, 18):
-            for minute in [0, 30]:
-                slot_time = current_date.replace(hour=hour, minute=minute)
-                # Проверяем, не занят ли слот
-                is_booked = any(
-                    apt["doctor_id"] == doctor_id and 
-                    apt["appointment_time"] == slot_time and
-                    apt["status"] not in [AppointmentStatus.CANCELLED_BY_PATIENT, AppointmentStatus.CANCELLED_BY_CLINIC]
-                    for apt in MOCK_APPOINTMENTS.values()
-                )
-                if not is_booked:
-                    slots.append(slot_time)
-    
-    return slots[:10]  # Возвращаем первые 10 доступных слотов
-
-
 # ========== API Endpoints ==========
 
 @app.get("/", tags=["General"])
@@ -377,30 +513,209 @@ async def root():
     summary="Получить список врачей"
 )
 async def get_doctors(
+    request: Request,
     specialization: Optional[DoctorSpecialization] = None,
-    include_schedule: bool = False
+    include_schedule: bool = False,
+    sort_by_rating: bool = False,
+    db: AsyncStorage = Depends(get_db)
 ):
     """
     Получить список врачей с возможностью фильтрации по специализации.
     
     - **specialization**: Фильтр по специализации (опционально)
     - **include_schedule**: Включить доступные слоты расписания
+    - **sort_by_rating**: Отсортировать по убыванию рейтинга
     """
-    doctors = list(MOCK_DOCTORS.values())
+    # Снимок профилей перестраивается только при изменении врачей
+    version = await db.table_version("doctors")
+    snapshot = DOCTOR_DIRECTORY.get(version)
+    if snapshot is None:
+        snapshot = DOCTOR_DIRECTORY.rebuild(version, await db.list_doctors())
+    
+    # Без расписания ответ зависит только от данных врачей и кэшируется с ETag
+    if not include_schedule:
+        async def build():
+            return snapshot.body(specialization, sort_by_rating), {}
+        
+        return await cached_json(request, ("doctors", specialization, sort_by_rating), version, build)
     
-    # Фильтрация по специализации
-    if specialization:
-        doctors = [d for d in doctors if d["specialization"] == specialization]
+    # Добавление расписания (ближайшие свободные слоты из календаря доступности)
+    now = datetime.now()
+    body = join_json([
+        profile.with_slots(await db.free_slots(profile.id, now, SCHEDULE_PREVIEW_SLOTS))
+        for profile in snapshot.select(specialization, sort_by_rating)
+    ])
     
-    # Добавление расписания
-    if include_schedule:
-        for doctor in doctors:
-            doctor["available_slots"] = generate_time_slots(doctor["id"])
-    else:
-        for doctor in doctors:
-            doctor["available_slots"] = []
+    return Response(content=body, media_type="application/json")
+
+
+# ========== GET /api/doctors/{doctor_id}/slots - Свободные слоты врача ==========
+
+@app.get(
+    "/api/doctors/{doctor_id}/slots",
+    response_model=List[datetime],
+    tags=["Doctors"],
+    summary="Получить ближайшие свободные слоты врача"
+)
+async def get_doctor_slots(
+    doctor_id: int,
+    count: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    service_id: Optional[int] = None,
+    after: Optional[datetime] = None,
+    db: AsyncStorage = Depends(get_db)
+):
+    """
+    Получить ближайшие свободные слоты врача из календаря доступности.
+    
+    - **count**: Сколько слотов вернуть
+    - **service_id**: Услуга - слот подходит, если подряд свободно время на всю её длительность
+    - **after**: Искать слоты после этого момента (по умолчанию - после текущего времени)
+    
+    Слоты ищутся в пределах горизонта планирования (DENTAL_CALENDAR_HORIZON_DAYS).
+    """
+    if await db.get_doctor(doctor_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Врач с ID {doctor_id} не найден"
+        )
+    
+    duration_minutes = await service_duration(db, service_id) or SLOT_MINUTES
+    
+    # Слоты в прошлом не предлагаем
+    now = datetime.now()
+    after = max(after, now) if after else now
+    
+    return await db.free_slots(doctor_id, after, count, duration_minutes)
+
+
+# ========== GET /api/doctors/{doctor_id}/slots/stream - Поток изменений слотов врача ==========
+
+@app.get(
+    "/api/doctors/{doctor_id}/slots/stream",
+    response_class=StreamingResponse,
+    tags=["Doctors"],
+    summary="Поток изменений свободных слотов врача (SSE)"
+)
+async def stream_doctor_slots(
+    doctor_id: int,
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Поток Server-Sent Events с изменениями свободных слотов врача вместо опроса
+    `GET /api/doctors?include_schedule=true`.
+    
+    - событие `slot_booked` - слот занят, `slot_released` - слот освободился
+      (данные: doctor_id, slot_time, available);
+    - событие `reset` - пропущенные изменения недоступны, слоты нужно загрузить заново.
+    
+    При переподключении клиент передаёт заголовок Last-Event-ID и получает пропущенные события.
+    """
+    # Сессия хранилища нужна только для проверки врача и не удерживается на время потока
+    async with database.session() as db:
+        doctor = await db.get_doctor(doctor_id)
+    if doctor is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Врач с ID {doctor_id} не найден"
+        )
     
-    return doctors
+    return sse_response(STREAMS.connect(doctor_channel(doctor_id), last_event_id))
+
+
+# ========== PUT /api/doctors/{doctor_id}/appointments/cancel - Отменить приёмы врача за период ==========
+
+@app.put(
+    "/api/doctors/{doctor_id}/appointments/cancel",
+    response_model=BulkTransitionResponse,
+    tags=["Doctors"],
+    summary="Отменить все записи врача за период (Администратор)"
+)
+async def cancel_doctor_appointments(
+    doctor_id: int,
+    period: DoctorRangeCancel,
+    db: AsyncStorage = Depends(get_db)
+):
+    """
+    Отменить от имени клиники все предстоящие записи врача с приёмом в [start, end)
+    (например, врач заболел).
+    
+    Записи выбираются по индексу записей врача и отменяются одной операцией.
+    Слоты освобождаются, пациенты получают уведомления.
+    """
+    if period.end <= period.start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Конец периода должен быть позже начала"
+        )
+    
+    if await db.get_doctor(doctor_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Врач с ID {doctor_id} не найден"
+        )
+    
+    cancelled = await db.transition_doctor_appointments(
+        doctor_id,
+        period.start,
+        period.end,
+        AppointmentStatus.CANCELLED_BY_CLINIC,
+        UPCOMING_STATUSES,
+        datetime.now()
+    )
+    
+    publish_cancellations(cancelled)
+    
+    return bulk_summary(AppointmentStatus.CANCELLED_BY_CLINIC, StatusTransition(cancelled, {}))
+
+
+# ========== GET /api/slots/earliest - Ближайшие свободные слоты по специализации ==========
+
+@app.get(
+    "/api/slots/earliest",
+    response_model=List[AvailableSlotResponse],
+    tags=["Doctors"],
+    summary="Найти ближайшее свободное время у врачей специализации"
+)
+async def get_earliest_slots(
+    specialization: DoctorSpecialization,
+    count: int = Query(5, ge=1, le=MAX_PAGE_SIZE),
+    service_id: Optional[int] = None,
+    duration_minutes: Optional[int] = Query(None, ge=1, le=24 * 60),
+    after: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    db: AsyncStorage = Depends(get_db)
+):
+    """
+    Найти ближайшие свободные слоты среди всех врачей специализации.
+    
+    **User Story:** Как пациент, я хочу записаться к первому свободному
+    ортодонту, не просматривая расписание каждого врача.
+    
+    - **specialization**: Специализация врача
+    - **count**: Сколько пар (врач, слот) вернуть
+    - **service_id**: Услуга - длительность приёма берётся из неё
+    - **duration_minutes**: Длительность приёма, если услуга не указана
+    - **after** / **before**: Окно поиска (по умолчанию - от текущего времени до конца горизонта планирования)
+    """
+    if service_id is not None:
+        duration_minutes = await service_duration(db, service_id)
+    
+    now = datetime.now()
+    after = max(after, now) if after else now
+    
+    doctors = {doctor["id"]: doctor for doctor in await db.list_doctors(specialization)}
+    slots = await db.earliest_free_slots(
+        list(doctors), after, count, duration_minutes or SLOT_MINUTES, until=before
+    )
+    
+    return [
+        {
+            "doctor_id": doctor_id,
+            "doctor_name": f"{doctors[doctor_id]['first_name']} {doctors[doctor_id]['last_name']}",
+            "slot_time": slot_time
+        }
+        for slot_time, doctor_id in slots
+    ]
 
 
 # ========== 2. GET /api/appointments - Получить записи ==========
@@ -412,9 +727,13 @@ async def get_doctors(
     summary="Получить список записей"
 )
 async def get_appointments(
+    response: Response,
     patient_id: Optional[int] = None,
     doctor_id: Optional[int] = None,
-    status: Optional[AppointmentStatus] = None
+    status: Optional[AppointmentStatus] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncStorage = Depends(get_db)
 ):
     """
     Получить список записей на приём с возможностью фильтрации.
@@ -422,21 +741,29 @@ async def get_appointments(
     - **patient_id**: ID пациента (для просмотра своих записей)
     - **doctor_id**: ID врача (для просмотра расписания врача)
     - **status**: Статус записи
+    - **limit**: Размер страницы (без него возвращаются все записи)
+    - **cursor**: Курсор следующей страницы из заголовка X-Next-Cursor
     """
-    appointments = list(MOCK_APPOINTMENTS.values())
+    after = decode_cursor(cursor, datetime.fromisoformat, int) if cursor else None
+    
+    # Фильтрация по индексам (результат уже отсортирован по времени приёма)
+    appointments = await db.query_appointments(
+        patient_id=patient_id or None,
+        doctor_id=doctor_id or None,
+        status=status or None,
+        after=after,
+        limit=lookahead(limit)
+    )
     
-    # Фильтрация
-    if patient_id:
-        appointments = [a for a in appointments if a["patient_id"] == patient_id]
-    if doctor_id:
-        appointments = [a for a in appointments if a["doctor_id"] == doctor_id]
-    if status:
-        appointments = [a for a in appointments if a["status"] == status]
+    page = paginate(
+        appointments, limit,
+        lambda a: (a["appointment_time"].isoformat(), a["id"]),
+        response
+    )
     
-    # Сортировка по времени приёма
-    appointments.sort(key=lambda x: x["appointment_time"])
+    page = await NAMES.resolve(db, page, APPOINTMENT_NAMES)
     
-    return appointments
+    return records_response(page, APPOINTMENT_JSON, response)
 
 
 # ========== 3. POST /api/appointments - Создать запись ==========
@@ -448,56 +775,42 @@ async def get_appointments(
     tags=["Appointments"],
     summary="Создать новую запись на приём"
 )
-async def create_appointment(appointment_data: AppointmentCreate):
+async def create_appointment(
+    appointment_data: AppointmentCreate,
+    db: AsyncStorage = Depends(get_db)
+):
     """
     Создать новую запись на приём к врачу.
     
     Пациент создает запись, которая получает статус "Ожидает подтверждения".
     Регистратура должна подтвердить запись.
-    """
-    global appointment_counter
     
+    Если указана услуга (service_id), приём занимает слоты врача на всю её длительность.
+    """
     # Валидация: проверка существования пациента
-    if appointment_data.patient_id not in MOCK_PATIENTS:
+    patient = await db.get_patient(appointment_data.patient_id)
+    if patient is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Пациент с ID {appointment_data.patient_id} не найден"
         )
     
     # Валидация: проверка существования врача
-    if appointment_data.doctor_id not in MOCK_DOCTORS:
+    doctor = await db.get_doctor(appointment_data.doctor_id)
+    if doctor is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Врач с ID {appointment_data.doctor_id} не найден"
         )
     
-    # Валидация: проверка времени записи
-    validate_appointment_time(appointment_data.appointment_time)
-    
-    # Валидация: проверка доступности слота
-    is_slot_available = all(
-        apt["doctor_id"] != appointment_data.doctor_id or
-        apt["appointment_time"] != appointment_data.appointment_time or
-        apt["status"] in [AppointmentStatus.CANCELLED_BY_PATIENT, AppointmentStatus.CANCELLED_BY_CLINIC]
-        for apt in MOCK_APPOINTMENTS.values()
-    )
-    
-    if not is_slot_available:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Выбранное время уже занято"
-        )
+    # Валидация: проверка времени записи на всю длительность услуги
+    duration_minutes = await service_duration(db, appointment_data.service_id)
+    validate_appointment_time(appointment_data.appointment_time, WorkingHours.from_doctor(doctor), duration_minutes)
     
     # Создание новой записи
-    patient = MOCK_PATIENTS[appointment_data.patient_id]
-    doctor = MOCK_DOCTORS[appointment_data.doctor_id]
-    
     new_appointment = {
-        "id": appointment_counter,
         "patient_id": appointment_data.patient_id,
-        "patient_name": f"{patient['first_name']} {patient['last_name']}",
         "doctor_id": appointment_data.doctor_id,
-        "doctor_name": f"{doctor['first_name']} {doctor['last_name']}",
         "appointment_time": appointment_data.appointment_time,
         "service_type": appointment_data.service_type,
         "status": AppointmentStatus.PENDING,  # Ожидает подтверждения
@@ -506,13 +819,185 @@ async def create_appointment(appointment_data: AppointmentCreate):
         "treatment": None,
         "recommendations": None,
         "created_at": datetime.now(),
-        "updated_at": datetime.now()
+        "updated_at": datetime.now(),
+        "duration_minutes": duration_minutes
     }
     
-    MOCK_APPOINTMENTS[appointment_counter] = new_appointment
-    appointment_counter += 1
+    # Валидация: бронирование слота (проверка и занятие выполняются атомарно)
+    try:
+        appointment = await db.add_appointment(new_appointment)
+    except SlotConflictError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Выбранное время уже занято"
+        )
+    
+    EVENTS.publish(slot_event(SLOT_BOOKED, appointment))
     
-    return new_appointment
+    return await NAMES.resolve_one(db, appointment, APPOINTMENT_NAMES)
+
+
+# ========== POST /api/appointments/batch - Создать пакет записей ==========
+
+@app.post(
+    "/api/appointments/batch",
+    response_model=List[AppointmentResponse],
+    status_code=status.HTTP_201_CREATED,
+    tags=["Appointments"],
+    summary="Создать пакет записей (визиты плана лечения)"
+)
+async def create_appointments_batch(
+    batch: AppointmentBatchCreate,
+    db: AsyncStorage = Depends(get_db)
+):
+    """
+    Создать несколько связанных записей за один запрос (например, 5-20 визитов
+    ортодонтического или имплантологического плана лечения).
+    
+    Записи создаются все или ни одной. Пациенты и врачи загружаются по одному
+    разу на пакет, а все слоты проверяются и бронируются в одной операции хранилища.
+    
+    При ошибках detail содержит список ошибок по записям (BatchItemError, index - номер записи в пакете):
+    - 400 - запись не прошла проверку (пациент, врач или услуга не найдены, недопустимое
+      время, пересечение с другой записью пакета);
+    - 409 - слот уже занят другой записью (conflicting_appointment_id).
+    """
+    patients, hours, services = {}, {}, {None: None}
+    for patient_id in {item.patient_id for item in batch.appointments}:
+        patients[patient_id] = await db.get_patient(patient_id)
+    for doctor_id in {item.doctor_id for item in batch.appointments}:
+        doctor = await db.get_doctor(doctor_id)
+        hours[doctor_id] = WorkingHours.from_doctor(doctor) if doctor else None
+    for service_id in {item.service_id for item in batch.appointments} - {None}:
+        service = await db.get_service(service_id)
+        services[service_id] = service["duration_minutes"] if service else 0
+    
+    # Проверка записей пакета (ошибки собираются по всем записям)
+    errors, slots = [], {}
+    for index, item in enumerate(batch.appointments):
+        if patients[item.patient_id] is None:
+            errors.append(BatchItemError(index=index, detail=f"Пациент с ID {item.patient_id} не найден"))
+            continue
+        if hours[item.doctor_id] is None:
+            errors.append(BatchItemError(index=index, detail=f"Врач с ID {item.doctor_id} не найден"))
+            continue
+        if services[item.service_id] == 0:
+            errors.append(BatchItemError(index=index, detail=f"Услуга с ID {item.service_id} не найдена"))
+            continue
+        try:
+            validate_appointment_time(item.appointment_time, hours[item.doctor_id], services[item.service_id])
+        except HTTPException as exc:
+            errors.append(BatchItemError(index=index, detail=exc.detail))
+            continue
+        item_slots = [
+            (item.doctor_id, slot_time)
+            for slot_time in occupied_slots(item.appointment_time, services[item.service_id])
+        ]
+        overlap = next((slots[slot] for slot in item_slots if slot in slots), None)
+        if overlap is not None:
+            errors.append(BatchItemError(index=index, detail=f"Время пересекается с записью {overlap} пакета"))
+            continue
+        slots.update(dict.fromkeys(item_slots, index))
+    if errors:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=[error.model_dump() for error in errors]
+        )
+    
+    now = datetime.now()
+    new_appointments = [
+        {
+            "patient_id": item.patient_id,
+            "doctor_id": item.doctor_id,
+            "appointment_time": item.appointment_time,
+            "service_type": item.service_type,
+            "status": AppointmentStatus.PENDING,  # Ожидает подтверждения
+            "notes": item.notes,
+            "diagnosis": None,
+            "treatment": None,
+            "recommendations": None,
+            "created_at": now,
+            "updated_at": now,
+            "duration_minutes": services[item.service_id]
+        }
+        for item in batch.appointments
+    ]
+    
+    # Бронирование всех слотов пакета (все или ни одного)
+    try:
+        appointments = await db.add_appointments(new_appointments)
+    except BatchConflictError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=[
+                BatchItemError(
+                    index=index, detail="Выбранное время уже занято", conflicting_appointment_id=owner
+                ).model_dump()
+                for index, owner in sorted(exc.conflicts.items())
+            ]
+        )
+    
+    for appointment in appointments:
+        EVENTS.publish(slot_event(SLOT_BOOKED, appointment))
+    
+    return await NAMES.resolve(db, appointments, APPOINTMENT_NAMES)
+
+
+# ========== PUT /api/appointments/bulk/confirm - Подтвердить записи ==========
+
+@app.put(
+    "/api/appointments/bulk/confirm",
+    response_model=BulkTransitionResponse,
+    tags=["Appointments"],
+    summary="Подтвердить несколько записей (Администратор)"
+)
+async def bulk_confirm_appointments(request: AppointmentIdsRequest, db: AsyncStorage = Depends(get_db)):
+    """
+    Подтвердить несколько записей одной операцией (например, все утренние заявки).
+    
+    Подтверждаются только записи в статусе "pending"; остальные и несуществующие
+    возвращаются в skipped с текущим статусом. Пациенты получают уведомления.
+    """
+    transition = await db.transition_appointments(
+        request.appointment_ids,
+        AppointmentStatus.CONFIRMED,
+        [AppointmentStatus.PENDING],
+        datetime.now()
+    )
+    
+    # Уведомления пациентам создаются фоновым обработчиком
+    for appointment in transition.updated:
+        EVENTS.publish(appointment_event(NotificationType.APPOINTMENT_CONFIRMED, appointment))
+    
+    return bulk_summary(AppointmentStatus.CONFIRMED, transition)
+
+
+# ========== PUT /api/appointments/bulk/cancel - Отменить записи (клиника) ==========
+
+@app.put(
+    "/api/appointments/bulk/cancel",
+    response_model=BulkTransitionResponse,
+    tags=["Appointments"],
+    summary="Отменить несколько записей от имени клиники (Администратор)"
+)
+async def bulk_cancel_appointments(request: AppointmentIdsRequest, db: AsyncStorage = Depends(get_db)):
+    """
+    Отменить несколько записей от имени клиники одной операцией.
+    
+    Отменяются предстоящие записи (pending/confirmed); завершённые, уже отменённые
+    и несуществующие возвращаются в skipped. Слоты освобождаются, пациенты
+    получают уведомления.
+    """
+    transition = await db.transition_appointments(
+        request.appointment_ids,
+        AppointmentStatus.CANCELLED_BY_CLINIC,
+        UPCOMING_STATUSES,
+        datetime.now()
+    )
+    
+    publish_cancellations(transition.updated)
+    
+    return bulk_summary(AppointmentStatus.CANCELLED_BY_CLINIC, transition)
 
 
 # ========== 4. PUT /api/appointments/{appointment_id}/confirm - Подтвердить запись ==========
@@ -523,21 +1008,20 @@ async def create_appointment(appointment_data: AppointmentCreate):
     tags=["Appointments"],
     summary="Подтвердить запись на приём (Администратор)"
 )
-async def confirm_appointment(appointment_id: int):
+async def confirm_appointment(appointment_id: int, db: AsyncStorage = Depends(get_db)):
     """
     Подтвердить запись на приём.
     
     Используется администратором/регистратурой для подтверждения заявки пациента.
     После подтверждения пациент получает уведомление.
     """
-    if appointment_id not in MOCK_APPOINTMENTS:
+    appointment = await db.get_appointment(appointment_id)
+    if appointment is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Запись с ID {appointment_id} не найдена"
         )
     
-    appointment = MOCK_APPOINTMENTS[appointment_id]
-    
     if appointment["status"] != AppointmentStatus.PENDING:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -545,12 +1029,16 @@ async def confirm_appointment(appointment_id: int):
         )
     
     # Подтверждаем запись
-    appointment["status"] = AppointmentStatus.CONFIRMED
-    appointment["updated_at"] = datetime.now()
+    appointment = await db.update_appointment(
+        appointment_id,
+        status=AppointmentStatus.CONFIRMED,
+        updated_at=datetime.now()
+    )
     
-    # В реальной системе здесь отправляется push-уведомление пациенту
+    # Уведомление пациенту создаётся фоновым обработчиком
+    EVENTS.publish(appointment_event(NotificationType.APPOINTMENT_CONFIRMED, appointment))
     
-    return appointment
+    return await NAMES.resolve_one(db, appointment, APPOINTMENT_NAMES)
 
 
 # ========== 5. DELETE /api/appointments/{appointment_id} - Отменить запись ==========
@@ -563,7 +1051,8 @@ async def confirm_appointment(appointment_id: int):
 )
 async def cancel_appointment(
     appointment_id: int,
-    cancelled_by: str = "patient"  # "patient" или "clinic"
+    cancelled_by: str = "patient",  # "patient" или "clinic"
+    db: AsyncStorage = Depends(get_db)
 ):
     """
     Отменить запись на приём.
@@ -573,14 +1062,13 @@ async def cancel_appointment(
     - **appointment_id**: ID записи
     - **cancelled_by**: Кто отменяет запись (patient/clinic)
     """
-    if appointment_id not in MOCK_APPOINTMENTS:
+    appointment = await db.get_appointment(appointment_id)
+    if appointment is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Запись с ID {appointment_id} не найдена"
         )
     
-    appointment = MOCK_APPOINTMENTS[appointment_id]
-    
     # Проверка: можно ли отменить
     if appointment["status"] in [AppointmentStatus.COMPLETED, 
                                   AppointmentStatus.CANCELLED_BY_PATIENT,
@@ -600,13 +1088,17 @@ async def cancel_appointment(
     
     # Отменяем запись
     if cancelled_by == "patient":
-        appointment["status"] = AppointmentStatus.CANCELLED_BY_PATIENT
+        new_status = AppointmentStatus.CANCELLED_BY_PATIENT
     else:
-        appointment["status"] = AppointmentStatus.CANCELLED_BY_CLINIC
+        new_status = AppointmentStatus.CANCELLED_BY_CLINIC
     
-    appointment["updated_at"] = datetime.now()
+    appointment = await db.update_appointment(appointment_id, status=new_status, updated_at=datetime.now())
     
-    # В реальной системе здесь отправляется уведомление врачу/пациенту
+    # Уведомление пациенту создаётся фоновым обработчиком
+    EVENTS.publish(appointment_event(
+        NotificationType.APPOINTMENT_CANCELLED, appointment, cancelled_by=cancelled_by
+    ))
+    EVENTS.publish(slot_event(SLOT_RELEASED, appointment))
     
     return SuccessResponse(
         success=True,
@@ -625,30 +1117,45 @@ async def cancel_appointment(
 )
 async def get_medical_results(
     patient_id: int,
-    result_type: Optional[ResultType] = None
+    response: Response,
+    result_type: Optional[ResultType] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncStorage = Depends(get_db)
 ):
     """
     Получить список результатов обследований для конкретного пациента.
     
     - **patient_id**: ID пациента
     - **result_type**: Фильтр по типу результата (опционально)
+    - **limit**: Размер страницы (без него возвращаются все результаты)
+    - **cursor**: Курсор следующей страницы из заголовка X-Next-Cursor
     """
-    if patient_id not in MOCK_PATIENTS:
+    if await db.get_patient(patient_id) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Пациент с ID {patient_id} не найден"
         )
     
-    # Фильтрация результатов
-    results = [r for r in MOCK_RESULTS.values() if r["patient_id"] == patient_id]
+    after = decode_cursor(cursor, datetime.fromisoformat, int) if cursor else None
     
-    if result_type:
-        results = [r for r in results if r["result_type"] == result_type]
+    # Результаты пациента (новые сверху)
+    results = await db.query_results(
+        patient_id,
+        result_type=result_type,
+        after=after,
+        limit=lookahead(limit)
+    )
+    
+    page = paginate(
+        results, limit,
+        lambda r: (r["created_at"].isoformat(), r["id"]),
+        response
+    )
     
-    # Сортировка по дате создания (новые сверху)
-    results.sort(key=lambda x: x["created_at"], reverse=True)
+    page = await NAMES.resolve(db, page, RESULT_NAMES)
     
-    return results
+    return records_response(page, RESULT_JSON, response)
 
 
 # ========== 7. POST /api/results - Загрузить результат обследования ==========
@@ -660,36 +1167,34 @@ async def get_medical_results(
     tags=["Medical Results"],
     summary="Загрузить результат обследования (Врач)"
 )
-async def upload_medical_result(result_data: MedicalResultCreate):
+async def upload_medical_result(
+    result_data: MedicalResultCreate,
+    db: AsyncStorage = Depends(get_db)
+):
     """
     Загрузить новый результат обследования для пациента.
     
     Используется врачом после проведения обследования.
     После загрузки пациент получает уведомление.
     """
-    global result_counter
-    
     # Валидация
-    if result_data.patient_id not in MOCK_PATIENTS:
+    if await db.get_patient(result_data.patient_id) is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Пациент с ID {result_data.patient_id} не найден"
         )
     
-    if result_data.doctor_id not in MOCK_DOCTORS:
+    doctor = await db.get_doctor(result_data.doctor_id)
+    if doctor is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Врач с ID {result_data.doctor_id} не найден"
         )
     
-    doctor = MOCK_DOCTORS[result_data.doctor_id]
-    
     # Создание нового результата
     new_result = {
-        "id": result_counter,
         "patient_id": result_data.patient_id,
         "doctor_id": result_data.doctor_id,
-        "doctor_name": f"{doctor['first_name']} {doctor['last_name']}",
         "result_type": result_data.result_type,
         "title": result_data.title,
         "description": result_data.description,
@@ -697,12 +1202,12 @@ async def upload_medical_result(result_data: MedicalResultCreate):
         "created_at": datetime.now()
     }
     
-    MOCK_RESULTS[result_counter] = new_result
-    result_counter += 1
+    new_result = await db.add_result(new_result)
     
-    # В реальной системе здесь отправляется уведомление пациенту
+    # Уведомление пациенту создаётся фоновым обработчиком
+    EVENTS.publish(result_event(new_result))
     
-    return new_result
+    return await NAMES.resolve_one(db, new_result, RESULT_NAMES)
 
 
 # ========== 8. GET /api/patients/{patient_id} - Получить информацию о пациенте ==========
@@ -713,19 +1218,24 @@ async def upload_medical_result(result_data: MedicalResultCreate):
     tags=["Patients"],
     summary="Получить информацию о пациенте"
 )
-async def get_patient(patient_id: int):
+async def get_patient(patient_id: int, request: Request, db: AsyncStorage = Depends(get_db)):
     """
     Получить подробную информацию о пациенте.
     
     Используется врачом для просмотра карточки пациента.
+    Ответ содержит ETag: при совпадении If-None-Match возвращается 304.
     """
-    if patient_id not in MOCK_PATIENTS:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Пациент с ID {patient_id} не найден"
-        )
+    async def build():
+        patient = await db.get_patient(patient_id)
+        if patient is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Пациент с ID {patient_id} не найден"
+            )
+        return PatientBase.model_validate(patient).model_dump_json().encode(), {}
     
-    return MOCK_PATIENTS[patient_id]
+    version = await db.table_version("patients")
+    return await cached_json(request, ("patient", patient_id), version, build)
 
 
 # ========== 9. PATCH /api/appointments/{appointment_id}/complete - Завершить приём ==========
@@ -736,7 +1246,11 @@ async def get_patient(patient_id: int):
     tags=["Appointments"],
     summary="Завершить приём и добавить заключение (Врач)"
 )
-async def complete_appointment(appointment_id: int, completion_data: AppointmentComplete):
+async def complete_appointment(
+    appointment_id: int,
+    completion_data: AppointmentComplete,
+    db: AsyncStorage = Depends(get_db)
+):
     """
     Отметить приём как проведённый и добавить медицинское заключение.
     
@@ -749,14 +1263,13 @@ async def complete_appointment(appointment_id: int, completion_data: Appointment
     **User Story:** Как врач, я хочу отмечать приём как проведённый, 
     чтобы закрыть запись и обновить статус в системе.
     """
-    if appointment_id not in MOCK_APPOINTMENTS:
+    appointment = await db.get_appointment(appointment_id)
+    if appointment is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Запись с ID {appointment_id} не найдена"
         )
     
-    appointment = MOCK_APPOINTMENTS[appointment_id]
-    
     # Проверка: приём должен быть подтверждён
     if appointment["status"] != AppointmentStatus.CONFIRMED:
         raise HTTPException(
@@ -772,17 +1285,21 @@ async def complete_appointment(appointment_id: int, completion_data: Appointment
         )
     
     # Обновляем запись
-    appointment["status"] = AppointmentStatus.COMPLETED
-    appointment["diagnosis"] = completion_data.diagnosis
-    appointment["treatment"] = completion_data.treatment
-    appointment["recommendations"] = completion_data.recommendations
+    changes = {
+        "status": AppointmentStatus.COMPLETED,
+        "diagnosis": completion_data.diagnosis,
+        "treatment": completion_data.treatment,
+        "recommendations": completion_data.recommendations,
+        "updated_at": datetime.now()
+    }
     if completion_data.notes:
-        appointment["notes"] = completion_data.notes
-    appointment["updated_at"] = datetime.now()
+        changes["notes"] = completion_data.notes
+    appointment = await db.update_appointment(appointment_id, **changes)
     
-    # В реальной системе здесь отправляется уведомление пациенту
+    # Уведомление пациенту создаётся фоновым обработчиком
+    EVENTS.publish(appointment_event(NotificationType.APPOINTMENT_COMPLETED, appointment))
     
-    return appointment
+    return await NAMES.resolve_one(db, appointment, APPOINTMENT_NAMES)
 
 
 # ========== 10. PATCH /api/appointments/{appointment_id}/reschedule - Перенести запись ==========
@@ -793,7 +1310,11 @@ async def complete_appointment(appointment_id: int, completion_data: Appointment
     tags=["Appointments"],
     summary="Перенести запись на другое время (Администратор)"
 )
-async def reschedule_appointment(appointment_id: int, new_time: datetime):
+async def reschedule_appointment(
+    appointment_id: int,
+    new_time: datetime,
+    db: AsyncStorage = Depends(get_db)
+):
     """
     Перенести запись на другое время.
     
@@ -805,14 +1326,13 @@ async def reschedule_appointment(appointment_id: int, new_time: datetime):
     - Новый слот должен быть свободен
     - Отправляется уведомление об изменении
     """
-    if appointment_id not in MOCK_APPOINTMENTS:
+    appointment = await db.get_appointment(appointment_id)
+    if appointment is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Запись с ID {appointment_id} не найдена"
         )
     
-    appointment = MOCK_APPOINTMENTS[appointment_id]
-    
     # Проверка: нельзя переносить завершённые или отменённые записи
     if appointment["status"] in [AppointmentStatus.COMPLETED, 
                                   AppointmentStatus.CANCELLED_BY_PATIENT,
@@ -823,31 +1343,32 @@ async def reschedule_appointment(appointment_id: int, new_time: datetime):
         )
     
     # Валидация нового времени
-    validate_appointment_time(new_time)
-    
-    # Проверка: новый слот должен быть свободен
-    is_slot_available = all(
-        (apt_id == appointment_id) or  # Исключаем текущую запись
-        (apt["doctor_id"] != appointment["doctor_id"]) or
-        (apt["appointment_time"] != new_time) or
-        (apt["status"] in [AppointmentStatus.CANCELLED_BY_PATIENT, AppointmentStatus.CANCELLED_BY_CLINIC])
-        for apt_id, apt in MOCK_APPOINTMENTS.items()
-    )
+    doctor = await db.get_doctor(appointment["doctor_id"])
+    validate_appointment_time(new_time, WorkingHours.from_doctor(doctor), appointment.get("duration_minutes"))
     
-    if not is_slot_available:
+    # Переносим запись (новый слот должен быть свободен, бронирование переносится атомарно)
+    old_time = appointment["appointment_time"]
+    try:
+        appointment = await db.update_appointment(
+            appointment_id,
+            appointment_time=new_time,
+            reminded_at=None,  # напоминание отправится заново к новому времени
+            updated_at=datetime.now()
+        )
+    except SlotConflictError:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Новое время уже занято"
         )
     
-    # Переносим запись
-    old_time = appointment["appointment_time"]
-    appointment["appointment_time"] = new_time
-    appointment["updated_at"] = datetime.now()
+    # Уведомление пациенту создаётся фоновым обработчиком
+    EVENTS.publish(appointment_event(
+        NotificationType.APPOINTMENT_RESCHEDULED, appointment, old_time=old_time
+    ))
+    EVENTS.publish(slot_event(SLOT_RELEASED, appointment, old_time))
+    EVENTS.publish(slot_event(SLOT_BOOKED, appointment))
     
-    # В реальной системе здесь отправляется уведомление пациенту и врачу
-    
-    return appointment
+    return await NAMES.resolve_one(db, appointment, APPOINTMENT_NAMES)
 
 
 # ========== 11. GET /api/patients/{patient_id}/history - История пациента ==========
@@ -858,7 +1379,7 @@ async def reschedule_appointment(appointment_id: int, new_time: datetime):
     tags=["Patients"],
     summary="Получить полную историю пациента"
 )
-async def get_patient_history(patient_id: int):
+async def get_patient_history(patient_id: int, db: AsyncStorage = Depends(get_db)):
     """
     Получить полную историю пациента: приёмы и результаты обследований.
     
@@ -871,50 +1392,54 @@ async def get_patient_history(patient_id: int):
     **User Story:** Как врач, я хочу открывать карточку пациента, 
     чтобы ознакомиться с его историей посещений и результатами обследований.
     """
-    if patient_id not in MOCK_PATIENTS:
+    # Версии читаем до данных: если они изменятся во время сборки,
+    # следующий запрос увидит новую версию и соберёт историю заново.
+    # История содержит имена, поэтому зависит и от версий имён
+    now = datetime.now()
+    version = (await db.patient_version(patient_id), *await NAMES.versions(db, APPOINTMENT_NAMES))
+    cached = PATIENT_HISTORY_CACHE.get(patient_id, version, now)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    # Получаем данные пациента
+    patient = await db.get_patient(patient_id)
+    if patient is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Пациент с ID {patient_id} не найден"
         )
     
-    # Получаем данные пациента
-    patient = MOCK_PATIENTS[patient_id]
-    
-    # Получаем все приёмы пациента
-    appointments = [
-        apt for apt in MOCK_APPOINTMENTS.values() 
-        if apt["patient_id"] == patient_id
-    ]
-    appointments.sort(key=lambda x: x["appointment_time"], reverse=True)
-    
-    # Получаем все результаты обследований
-    results = [
-        res for res in MOCK_RESULTS.values() 
-        if res["patient_id"] == patient_id
-    ]
-    results.sort(key=lambda x: x["created_at"], reverse=True)
-    
-    # Вычисляем статистику
-    now = datetime.now()
-    total_appointments = len(appointments)
-    completed_appointments = sum(
-        1 for apt in appointments 
-        if apt["status"] == AppointmentStatus.COMPLETED
-    )
-    upcoming_appointments = sum(
-        1 for apt in appointments 
-        if apt["appointment_time"] > now and 
-        apt["status"] in [AppointmentStatus.PENDING, AppointmentStatus.CONFIRMED]
+    # Получаем все приёмы пациента (новые сверху)
+    appointments = await db.query_appointments(patient_id=patient_id)
+    appointments.reverse()
+    
+    # Получаем все результаты обследований (новые сверху)
+    results = await db.query_results(patient_id)
+    
+    # Вычисляем статистику за один проход; ближайший предстоящий приём
+    # ограничивает срок жизни кэша - после него меняется upcoming_appointments
+    completed_appointments = 0
+    upcoming_appointments = 0
+    next_upcoming = None
+    for apt in appointments:
+        if apt["status"] == AppointmentStatus.COMPLETED:
+            completed_appointments += 1
+        elif apt["appointment_time"] > now and apt["status"] in UPCOMING_STATUSES:
+            upcoming_appointments += 1
+            next_upcoming = apt["appointment_time"]
+    
+    history = PatientHistoryResponse(
+        patient=patient,
+        appointments=await NAMES.resolve(db, appointments, APPOINTMENT_NAMES),
+        medical_results=await NAMES.resolve(db, results, RESULT_NAMES),
+        total_appointments=len(appointments),
+        completed_appointments=completed_appointments,
+        upcoming_appointments=upcoming_appointments
     )
+    body = history.model_dump_json().encode()
+    PATIENT_HISTORY_CACHE.put(patient_id, version, body, valid_until=next_upcoming)
     
-    return {
-        "patient": patient,
-        "appointments": appointments,
-        "medical_results": results,
-        "total_appointments": total_appointments,
-        "completed_appointments": completed_appointments,
-        "upcoming_appointments": upcoming_appointments
-    }
+    return Response(content=body, media_type="application/json")
 
 
 # ========== BONUS: Статистика ==========
@@ -924,30 +1449,60 @@ async def get_patient_history(patient_id: int):
     tags=["Statistics"],
     summary="Получить статистику системы"
 )
-async def get_stats():
+async def get_stats(db: AsyncStorage = Depends(get_db)):
     """
     Получить общую статистику системы (для демонстрации).
     """
-    total_appointments = len(MOCK_APPOINTMENTS)
-    pending_appointments = sum(
-        1 for a in MOCK_APPOINTMENTS.values() 
-        if a["status"] == AppointmentStatus.PENDING
-    )
-    confirmed_appointments = sum(
-        1 for a in MOCK_APPOINTMENTS.values() 
-        if a["status"] == AppointmentStatus.CONFIRMED
-    )
-    
     return {
-        "total_doctors": len(MOCK_DOCTORS),
-        "total_patients": len(MOCK_PATIENTS),
-        "total_appointments": total_appointments,
-        "pending_appointments": pending_appointments,
-        "confirmed_appointments": confirmed_appointments,
-        "total_results": len(MOCK_RESULTS)
+        "total_doctors": await db.count_doctors(),
+        "total_patients": await db.count_patients(),
+        "total_appointments": await db.count_appointments(),
+        "pending_appointments": await db.count_appointments(AppointmentStatus.PENDING),
+        "confirmed_appointments": await db.count_appointments(AppointmentStatus.CONFIRMED),
+        "total_results": await db.count_results(),
+        "latency_ms": LATENCY.percentiles(),
+        "db_pool": {"size": database.pool_size, "in_use": database.in_use},
+        "patient_history_cache": PATIENT_HISTORY_CACHE.stats(),
+        "response_cache": RESPONSE_CACHE.stats(),
+        "events": EVENTS.stats(),
+        "streams": STREAMS.stats(),
+        "reminders": REMINDERS.stats(),
+        "notifications": NOTIFICATION_WORKER.stats()
     }
 
 
+@app.get(
+    "/api/stats/consistency",
+    tags=["Statistics"],
+    summary="Проверить согласованность счётчиков статистики"
+)
+async def check_stats_consistency(db: AsyncStorage = Depends(get_db)):
+    """
+    Сверить счётчики статистики врачей с исходными записями и отзывами.
+    
+    Возвращает расхождения по врачам: для каждого поля - значение счётчика
+    (stored) и пересчитанное значение (actual). Пустой словарь - расхождений нет.
+    """
+    mismatches = await db.check_doctor_statistics()
+    return {"consistent": not mismatches, "doctor_statistics": mismatches}
+
+
+@app.post(
+    "/api/stats/consistency/rebuild",
+    tags=["Statistics"],
+    summary="Пересчитать счётчики статистики"
+)
+async def rebuild_stats(db: AsyncStorage = Depends(get_db)):
+    """
+    Пересчитать счётчики статистики врачей по исходным данным.
+    
+    Возвращает расхождения, которые были исправлены.
+    """
+    mismatches = await db.check_doctor_statistics()
+    await db.rebuild_doctor_statistics()
+    return {"rebuilt": True, "doctor_statistics": mismatches}
+
+
 # ========== 12. GET /api/notifications/{user_id} - Получить уведомления ==========
 
 @app.get(
@@ -958,7 +1513,11 @@ async def get_stats():
 )
 async def get_notifications(
     user_id: int,
-    unread_only: bool = False
+    response: Response,
+    unread_only: bool = False,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncStorage = Depends(get_db)
 ):
     """
     Получить список уведомлений для пользователя.
@@ -976,21 +1535,118 @@ async def get_notifications(
     
     - **user_id**: ID пользователя (пациента или врача)
     - **unread_only**: Показать только непрочитанные (по умолчанию false)
+    - **limit**: Размер страницы (без него возвращаются все уведомления)
+    - **cursor**: Курсор следующей страницы из заголовка X-Next-Cursor
     """
-    # Получаем все уведомления пользователя
-    notifications = [
-        notif for notif in MOCK_NOTIFICATIONS.values()
-        if notif["user_id"] == user_id
-    ]
+    after = decode_cursor(cursor, datetime.fromisoformat, int) if cursor else None
+    
+    # Уведомления пользователя (новые сверху), при необходимости только непрочитанные
+    notifications = await db.query_notifications(
+        user_id,
+        unread_only=unread_only,
+        after=after,
+        limit=lookahead(limit)
+    )
+    
+    page = paginate(
+        notifications, limit,
+        lambda n: (n["created_at"].isoformat(), n["id"]),
+        response
+    )
+    
+    return records_response(page, NOTIFICATION_JSON, response)
+
+
+# ========== GET /api/notifications/{user_id}/unread_count - Счётчик непрочитанных ==========
+
+@app.get(
+    "/api/notifications/{user_id}/unread_count",
+    response_model=UnreadCountResponse,
+    tags=["Notifications"],
+    summary="Количество непрочитанных уведомлений"
+)
+async def get_unread_count(user_id: int, db: AsyncStorage = Depends(get_db)):
+    """
+    Получить количество непрочитанных уведомлений пользователя (для значка в приложении).
+    
+    Счётчик поддерживается хранилищем, уведомления не просматриваются.
+    """
+    return {"user_id": user_id, "unread_count": await db.count_unread_notifications(user_id)}
+
+
+# ========== GET /api/notifications/{user_id}/stream - Поток уведомлений ==========
+
+@app.get(
+    "/api/notifications/{user_id}/stream",
+    response_class=StreamingResponse,
+    tags=["Notifications"],
+    summary="Поток новых уведомлений пользователя (SSE)"
+)
+async def stream_notifications(
+    user_id: int,
+    last_event_id: Optional[int] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Поток Server-Sent Events с новыми уведомлениями пользователя вместо опроса
+    `GET /api/notifications/{user_id}`.
+    
+    - событие `notification_created` - новое уведомление (данные в формате NotificationResponse);
+    - событие `reset` - пропущенные уведомления недоступны, список нужно загрузить заново.
     
-    # Фильтр только непрочитанные
-    if unread_only:
-        notifications = [n for n in notifications if not n["is_read"]]
+    При переподключении клиент передаёт заголовок Last-Event-ID и получает пропущенные события.
+    """
+    return sse_response(STREAMS.connect(user_channel(user_id), last_event_id))
+
+
+# ========== PUT /api/notifications/{user_id}/read - Прочитать все уведомления ==========
+
+@app.put(
+    "/api/notifications/{user_id}/read",
+    response_model=MarkReadResponse,
+    tags=["Notifications"],
+    summary="Отметить все уведомления прочитанными"
+)
+async def mark_all_notifications_read(user_id: int, db: AsyncStorage = Depends(get_db)):
+    """
+    Отметить все непрочитанные уведомления пользователя прочитанными.
+    """
+    marked = await db.mark_notifications_read(user_id)
+    
+    return {
+        "user_id": user_id,
+        "marked_count": marked,
+        "unread_count": await db.count_unread_notifications(user_id)
+    }
+
+
+# ========== PUT /api/notifications/{user_id}/{notification_id}/read - Прочитать уведомление ==========
+
+@app.put(
+    "/api/notifications/{user_id}/{notification_id}/read",
+    response_model=MarkReadResponse,
+    tags=["Notifications"],
+    summary="Отметить уведомление прочитанным"
+)
+async def mark_notification_read(user_id: int, notification_id: int, db: AsyncStorage = Depends(get_db)):
+    """
+    Отметить одно уведомление пользователя прочитанным.
+    
+    Повторная отметка уже прочитанного уведомления не является ошибкой.
+    """
+    notification = await db.get_notification(notification_id)
+    if notification is None or notification["user_id"] != user_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Уведомление с ID {notification_id} не найдено"
+        )
     
-    # Сортировка по дате (новые сверху)
-    notifications.sort(key=lambda x: x["created_at"], reverse=True)
+    marked = await db.mark_notifications_read(user_id, [notification_id])
     
-    return notifications
+    return {
+        "user_id": user_id,
+        "marked_count": marked,
+        "unread_count": await db.count_unread_notifications(user_id)
+    }
 
 
 # ========== 13. GET /api/services - Получить прайс-лист услуг ==========
@@ -1001,7 +1657,13 @@ async def get_notifications(
     tags=["Services"],
     summary="Получить прайс-лист услуг клиники"
 )
-async def get_services(specialization: Optional[DoctorSpecialization] = None):
+async def get_services(
+    request: Request,
+    specialization: Optional[DoctorSpecialization] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncStorage = Depends(get_db)
+):
     """
     Получить список услуг клиники с ценами.
     
@@ -1009,17 +1671,27 @@ async def get_services(specialization: Optional[DoctorSpecialization] = None):
     для планирования лечения.
     
     - **specialization**: Фильтр по специализации врача (опционально)
-    """
-    services = list(MOCK_SERVICES.values())
+    - **limit**: Размер страницы (без него возвращаются все услуги)
+    - **cursor**: Курсор следующей страницы из заголовка X-Next-Cursor
     
-    # Фильтрация по специализации
-    if specialization:
-        services = [s for s in services if s["specialization"] == specialization]
-    
-    # Сортировка по цене
-    services.sort(key=lambda x: x["price"])
+    Ответ содержит ETag: при совпадении If-None-Match возвращается 304.
+    """
+    after = decode_cursor(cursor, float, int) if cursor else None
+    
+    async def build():
+        # Фильтрация по специализации (услуги отсортированы по цене)
+        services = await db.query_services(
+            specialization=specialization,
+            after=after,
+            limit=lookahead(limit)
+        )
+        page = Response()
+        services = paginate(services, limit, lambda s: (s["price"], s["id"]), page)
+        headers = {NEXT_CURSOR_HEADER: page.headers[NEXT_CURSOR_HEADER]} if NEXT_CURSOR_HEADER in page.headers else {}
+        return SERVICE_LIST.dump_json(SERVICE_LIST.validate_python(services)), headers
     
-    return services
+    version = await db.table_version("services")
+    return await cached_json(request, ("services", specialization, after, limit), version, build)
 
 
 # ========== 14. POST /api/reviews - Оставить отзыв о приёме ==========
@@ -1031,7 +1703,7 @@ async def get_services(specialization: Optional[DoctorSpecialization] = None):
     tags=["Reviews"],
     summary="Оставить отзыв о приёме"
 )
-async def create_review(review_data: ReviewCreate):
+async def create_review(review_data: ReviewCreate, db: AsyncStorage = Depends(get_db)):
     """
     Оставить отзыв о приёме и оценить работу врача.
     
@@ -1041,19 +1713,17 @@ async def create_review(review_data: ReviewCreate):
     **Validation:**
     - Приём должен существовать и быть завершённым
     - Пациент должен быть участником приёма
+    - Отзыв оставляется врачу, который проводил приём
     - Можно оставить только один отзыв на приём
     """
-    global review_counter
-    
     # Валидация: проверка существования приёма
-    if review_data.appointment_id not in MOCK_APPOINTMENTS:
+    appointment = await db.get_appointment(review_data.appointment_id)
+    if appointment is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Приём с ID {review_data.appointment_id} не найден"
         )
     
-    appointment = MOCK_APPOINTMENTS[review_data.appointment_id]
-    
     # Проверка: приём должен быть завершён
     if appointment["status"] != AppointmentStatus.COMPLETED:
         raise HTTPException(
@@ -1068,24 +1738,16 @@ async def create_review(review_data: ReviewCreate):
             detail="Вы не можете оставить отзыв для чужого приёма"
         )
     
-    # Проверка: уже есть отзыв на этот приём
-    existing_review = any(
-        r["appointment_id"] == review_data.appointment_id
-        for r in MOCK_REVIEWS.values()
-    )
-    if existing_review:
+    # Проверка: отзыв относится к врачу, который проводил приём
+    if appointment["doctor_id"] != review_data.doctor_id:
         raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Вы уже оставили отзыв для этого приёма"
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Приём проводил другой врач"
         )
     
-    patient = MOCK_PATIENTS[review_data.patient_id]
-    
     # Создание отзыва
     new_review = {
-        "id": review_counter,
         "patient_id": review_data.patient_id,
-        "patient_name": f"{patient['first_name']} {patient['last_name']}",
         "doctor_id": review_data.doctor_id,
         "appointment_id": review_data.appointment_id,
         "rating": review_data.rating,
@@ -1093,14 +1755,66 @@ async def create_review(review_data: ReviewCreate):
         "created_at": datetime.now()
     }
     
-    MOCK_REVIEWS[review_counter] = new_review
-    review_counter += 1
+    # Проверка "один отзыв на приём" выполняется атомарно с сохранением;
+    # рейтинг врача обновляется хранилищем в той же операции
+    try:
+        new_review = await db.add_review(new_review)
+    except DuplicateReviewError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Вы уже оставили отзыв для этого приёма"
+        )
+    except UnknownDoctorError as exc:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Врач с ID {exc.doctor_id} не найден"
+        )
+    
+    return await NAMES.resolve_one(db, new_review, REVIEW_NAMES)
+
+
+# ========== GET /api/reviews - Получить отзывы ==========
+
+@app.get(
+    "/api/reviews",
+    response_model=List[ReviewResponse],
+    tags=["Reviews"],
+    summary="Получить отзывы о враче или отзывы пациента"
+)
+async def get_reviews(
+    response: Response,
+    doctor_id: Optional[int] = None,
+    patient_id: Optional[int] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    db: AsyncStorage = Depends(get_db)
+):
+    """
+    Получить список отзывов (новые сверху).
     
-    # Обновляем рейтинг врача (в реальной системе пересчитываем среднее)
-    doctor = MOCK_DOCTORS[review_data.doctor_id]
-    doctor["reviews_count"] = doctor.get("reviews_count", 0) + 1
+    - **doctor_id**: Фильтр по врачу (опционально)
+    - **patient_id**: Фильтр по пациенту (опционально)
+    - **limit**: Размер страницы (без него возвращаются все отзывы)
+    - **cursor**: Курсор следующей страницы из заголовка X-Next-Cursor
+    """
+    after = decode_cursor(cursor, datetime.fromisoformat, int) if cursor else None
+    
+    reviews = await db.query_reviews(
+        doctor_id=doctor_id,
+        patient_id=patient_id,
+        after=after,
+        limit=lookahead(limit)
+    )
+    
+    page = paginate(
+        reviews, limit,
+        lambda r: (r["created_at"].isoformat(), r["id"]),
+        response
+    )
+    
+    page = await NAMES.resolve(db, page, REVIEW_NAMES)
     
-    return new_review
+    return records_response(page, REVIEW_JSON, response)
 
 
 # ========== 15. GET /api/doctors/{doctor_id}/statistics - Статистика врача ==========
@@ -1111,7 +1825,7 @@ async def create_review(review_data: ReviewCreate):
     tags=["Doctors"],
     summary="Получить статистику работы врача"
 )
-async def get_doctor_statistics(doctor_id: int):
+async def get_doctor_statistics(doctor_id: int, db: AsyncStorage = Depends(get_db)):
     """
     Получить подробную статистику работы врача.
     
@@ -1126,60 +1840,93 @@ async def get_doctor_statistics(doctor_id: int):
     - Количество отзывов
     - Количество уникальных пациентов
     """
-    if doctor_id not in MOCK_DOCTORS:
+    doctor = await db.get_doctor(doctor_id)
+    if doctor is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Врач с ID {doctor_id} не найден"
         )
     
-    doctor = MOCK_DOCTORS[doctor_id]
-    
-    # Получаем все приёмы врача
-    doctor_appointments = [
-        apt for apt in MOCK_APPOINTMENTS.values()
-        if apt["doctor_id"] == doctor_id
-    ]
-    
-    now = datetime.now()
-    
-    # Вычисляем статистику
-    total_appointments = len(doctor_appointments)
-    completed_appointments = sum(
-        1 for apt in doctor_appointments
-        if apt["status"] == AppointmentStatus.COMPLETED
-    )
-    upcoming_appointments = sum(
-        1 for apt in doctor_appointments
-        if apt["appointment_time"] > now and
-        apt["status"] in [AppointmentStatus.PENDING, AppointmentStatus.CONFIRMED]
-    )
-    cancelled_appointments = sum(
-        1 for apt in doctor_appointments
-        if apt["status"] in [AppointmentStatus.CANCELLED_BY_PATIENT, AppointmentStatus.CANCELLED_BY_CLINIC]
-    )
-    
-    # Уникальные пациенты
-    unique_patients = len(set(apt["patient_id"] for apt in doctor_appointments))
-    
-    # Рейтинг
-    doctor_reviews = [r for r in MOCK_REVIEWS.values() if r["doctor_id"] == doctor_id]
-    average_rating = None
-    if doctor_reviews:
-        average_rating = round(sum(r["rating"] for r in doctor_reviews) / len(doctor_reviews), 2)
+    # Счётчики поддерживаются хранилищем при каждом изменении записи и отзыва
+    stats = await db.doctor_statistics(doctor_id, datetime.now())
     
     return {
-        "doctor_id": doctor_id,
+        "doctor_id": doctor["id"],
         "doctor_name": f"{doctor['first_name']} {doctor['last_name']}",
-        "total_appointments": total_appointments,
-        "completed_appointments": completed_appointments,
-        "upcoming_appointments": upcoming_appointments,
-        "cancelled_appointments": cancelled_appointments,
-        "average_rating": average_rating or doctor.get("rating"),
-        "total_reviews": len(doctor_reviews),
-        "patients_served": unique_patients
+        "total_appointments": stats["total_appointments"],
+        "completed_appointments": stats["completed_appointments"],
+        "upcoming_appointments": stats["upcoming_appointments"],
+        "cancelled_appointments": stats["cancelled_appointments"],
+        "average_rating": doctor.get("rating"),
+        "total_reviews": doctor.get("reviews_count") or 0,
+        "patients_served": stats["patients_served"]
     }
 
 
+# ========== GET /api/export/{entity} - Выгрузить таблицу ==========
+
+@app.get(
+    "/api/export/{entity}",
+    response_class=StreamingResponse,
+    tags=["Import/Export"],
+    summary="Выгрузить таблицу потоком (NDJSON или CSV)"
+)
+async def export_data(entity: DataEntity, fmt: DataFormat = Query(DataFormat.NDJSON, alias="format")):
+    """
+    Выгрузить все записи таблицы в порядке ID.
+    
+    - `ndjson` - JSON-объект в каждой строке;
+    - `csv` - строка заголовков, затем строки значений (пустое значение - null).
+    
+    Строки отдаются порциями по мере чтения из хранилища, поэтому выгрузка
+    таблицы любого размера не накапливается в памяти сервера. Выгрузку можно
+    передать без изменений в `POST /api/import/{entity}`; строки, нарушающие
+    правила импорта (например, отзыв на незавершённый приём), будут отклонены
+    и перечислены в ответе.
+    """
+    return StreamingResponse(
+        export_rows(database, entity, fmt),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{entity.value}.{fmt.value}"'}
+    )
+
+
+# ========== POST /api/import/{entity} - Загрузить таблицу ==========
+
+@app.post(
+    "/api/import/{entity}",
+    response_model=ImportSummary,
+    tags=["Import/Export"],
+    summary="Загрузить записи таблицы из NDJSON или CSV"
+)
+async def import_data(
+    entity: DataEntity,
+    request: Request,
+    fmt: DataFormat = Query(DataFormat.NDJSON, alias="format")
+):
+    """
+    Загрузить записи таблицы из тела запроса (формат как у выгрузки).
+    
+    **Правила:**
+    - ID записей сохраняются; записи с уже существующим ID отклоняются
+    - Строки со ссылками на несуществующих врачей, пациентов или приёмы отклоняются:
+      загружайте таблицы по порядку (doctors, patients, appointments, results, reviews)
+    - Время предстоящей записи на приём должно быть в рабочих часах врача и на сетке слотов;
+      прошедшие, завершённые и отменённые записи загружаются как есть
+    - Отзыв должен относиться к завершённому приёму того же пациента и врача
+    - Рейтинг врача не переносится: его пересчитывают загружаемые отзывы
+    - Рабочие часы врача (`work_start`, `work_end` в формате HH:MM) должны образовывать
+      непустой день из целого числа слотов сетки
+    - Записи на приём не могут занимать уже занятый слот врача
+    
+    Тело читается потоком и сохраняется порциями; строки с ошибками
+    пропускаются и перечисляются в ответе (первые 100 по номеру строки файла).
+    """
+    # Подтверждённые предстоящие записи попадают в очередь напоминаний по мере сохранения
+    on_saved = REMINDERS.schedule_appointments if entity == DataEntity.APPOINTMENTS else None
+    return await Importer(database, entity, on_saved=on_saved).run(request.stream(), fmt)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
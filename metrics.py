@@ -0,0 +1,31 @@
+"""
+Метрики задержек запросов DentalCare App API
+"""
+from collections import deque
+
+
+class LatencyTracker:
+    """
+    Скользящее окно длительностей последних запросов.
+
+    Хранит не больше size замеров, поэтому память ограничена, а перцентили
+    отражают текущую нагрузку.
+    """
+
+    def __init__(self, size: int = 10000):
+        self._samples = deque(maxlen=size)
+
+    def observe(self, seconds: float) -> None:
+        """Добавить замер длительности запроса"""
+        self._samples.append(seconds)
+
+    def percentiles(self) -> dict:
+        """Перцентили p50/p95/p99 в миллисекундах"""
+        samples = sorted(self._samples)
+        if not samples:
+            return {"p50": 0.0, "p95": 0.0, "p99": 0.0, "count": 0}
+
+        def at(q: float) -> float:
+            return round(samples[min(len(samples) - 1, int(q * len(samples)))] * 1000, 2)
+
+        return {"p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "count": len(samples)}
@@ -1,11 +1,13 @@
 """
 Pydantic модели данных для DentalCare App API
 """
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_serializer, model_validator
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime, time
 from enum import Enum
 
+from availability import DEFAULT_WORKING_HOURS, SLOT_MINUTES
+
 
 class AppointmentStatus(str, Enum):
     """Статусы записи на приём"""
@@ -52,6 +54,13 @@ class DoctorWithSchedule(DoctorBase):
     available_slots: List[datetime] = []
 
 
+class AvailableSlotResponse(BaseModel):
+    """Свободный слот конкретного врача"""
+    doctor_id: int
+    doctor_name: str
+    slot_time: datetime
+
+
 # ========== Patient Models ==========
 
 class PatientBase(BaseModel):
@@ -72,9 +81,47 @@ class AppointmentCreate(BaseModel):
     doctor_id: int
     appointment_time: datetime
     service_type: str = Field(..., example="Консультация ортодонта")
+    service_id: Optional[int] = Field(None, description="Услуга - приём занимает слоты на всю её длительность")
     notes: Optional[str] = None
 
 
+class AppointmentBatchCreate(BaseModel):
+    """Модель пакетного создания записей (визиты плана лечения)"""
+    appointments: List[AppointmentCreate] = Field(..., min_length=1, max_length=50)
+
+
+class BatchItemError(BaseModel):
+    """Ошибка отдельной записи пакета"""
+    index: int = Field(..., description="Номер записи в пакете (с 0)")
+    detail: str
+    conflicting_appointment_id: Optional[int] = Field(None, description="Запись, занимающая слот")
+
+
+class AppointmentIdsRequest(BaseModel):
+    """Модель массовой операции над записями"""
+    appointment_ids: List[int] = Field(..., min_length=1, max_length=500)
+
+
+class DoctorRangeCancel(BaseModel):
+    """Модель отмены записей врача за период"""
+    start: datetime = Field(..., description="Начало периода (включительно)")
+    end: datetime = Field(..., description="Конец периода (не включительно)")
+
+
+class BulkSkippedItem(BaseModel):
+    """Запись, пропущенная массовой операцией"""
+    id: int
+    status: Optional[AppointmentStatus] = Field(None, description="Текущий статус записи (null - запись не найдена)")
+
+
+class BulkTransitionResponse(BaseModel):
+    """Сводка массовой смены статуса записей"""
+    status: AppointmentStatus
+    updated_count: int
+    updated_ids: List[int]
+    skipped: List[BulkSkippedItem] = []
+
+
 class AppointmentResponse(BaseModel):
     """Модель ответа с информацией о записи"""
     id: int
@@ -91,6 +138,7 @@ class AppointmentResponse(BaseModel):
     recommendations: Optional[str] = None
     created_at: datetime
     updated_at: datetime
+    duration_minutes: Optional[int] = Field(None, description="Длительность приёма (null - один слот сетки)")
 
 
 class AppointmentUpdate(BaseModel):
@@ -192,6 +240,17 @@ class NotificationResponse(BaseModel):
     created_at: datetime
 
 
+class UnreadCountResponse(BaseModel):
+    """Количество непрочитанных уведомлений пользователя"""
+    user_id: int
+    unread_count: int
+
+
+class MarkReadResponse(UnreadCountResponse):
+    """Результат отметки уведомлений прочитанными"""
+    marked_count: int
+
+
 # ========== Response Models ==========
 
 class SuccessResponse(BaseModel):
@@ -234,3 +293,110 @@ class DoctorStatisticsResponse(BaseModel):
     total_reviews: int = 0
     patients_served: int = 0  # Уникальных пациентов
 
+
+# ========== Import/Export Models ==========
+
+class DataEntity(str, Enum):
+    """Таблицы, доступные для импорта и экспорта"""
+    DOCTORS = "doctors"
+    PATIENTS = "patients"
+    APPOINTMENTS = "appointments"
+    RESULTS = "results"
+    REVIEWS = "reviews"
+
+
+class DataFormat(str, Enum):
+    """Форматы импорта и экспорта"""
+    NDJSON = "ndjson"  # JSON-объект в каждой строке
+    CSV = "csv"  # Строка заголовков, затем строки значений
+
+
+class DoctorTransfer(BaseModel):
+    """
+    Врач при импорте и экспорте (с рабочими часами).
+
+    Рейтинг не переносится: его заново накапливают загружаемые отзывы.
+    """
+    id: int
+    first_name: str
+    last_name: str
+    specialization: DoctorSpecialization
+    experience_years: int
+    photo_url: Optional[str] = None
+    work_start: Optional[time] = Field(None, example="09:00", description="Начало рабочего дня (по умолчанию 9:00)")
+    work_end: Optional[time] = Field(None, example="18:00", description="Конец рабочего дня (по умолчанию 18:00)")
+
+    @model_validator(mode="after")
+    def check_working_hours(self) -> "DoctorTransfer":
+        """Рабочий день не пустой и делится на целое число слотов сетки"""
+        start = self.work_start or DEFAULT_WORKING_HOURS.start
+        end = self.work_end or DEFAULT_WORKING_HOURS.end
+        if start.second or start.microsecond or end.second or end.microsecond:
+            raise ValueError("Рабочие часы задаются с точностью до минуты (HH:MM)")
+        if start >= end:
+            raise ValueError("Начало рабочего дня должно быть раньше его конца")
+        length = datetime.combine(date.min, end) - datetime.combine(date.min, start)
+        if length.total_seconds() % (SLOT_MINUTES * 60):
+            raise ValueError(f"Рабочий день должен делиться на слоты по {SLOT_MINUTES} минут")
+        return self
+
+    @field_serializer("work_start", "work_end")
+    def serialize_hours(self, value: Optional[time]) -> Optional[str]:
+        # Хранилище держит рабочие часы строками "HH:MM"
+        return value.strftime("%H:%M") if value is not None else None
+
+
+class AppointmentTransfer(BaseModel):
+    """Запись на приём при импорте и экспорте"""
+    id: int
+    patient_id: int
+    doctor_id: int
+    appointment_time: datetime
+    service_type: str
+    status: AppointmentStatus
+    notes: Optional[str] = None
+    diagnosis: Optional[str] = None
+    treatment: Optional[str] = None
+    recommendations: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+    reminded_at: Optional[datetime] = None
+    duration_minutes: Optional[int] = Field(None, ge=1)
+
+
+class MedicalResultTransfer(BaseModel):
+    """Результат обследования при импорте и экспорте"""
+    id: int
+    patient_id: int
+    doctor_id: int
+    result_type: ResultType
+    title: str
+    description: Optional[str] = None
+    file_url: str
+    created_at: datetime
+
+
+class ReviewTransfer(BaseModel):
+    """Отзыв при импорте и экспорте"""
+    id: int
+    patient_id: int
+    doctor_id: int
+    appointment_id: int
+    rating: int = Field(..., ge=1, le=5)
+    comment: Optional[str] = Field(None, max_length=1000)
+    created_at: datetime
+
+
+class ImportRowError(BaseModel):
+    """Отклонённая строка импорта"""
+    line: int  # Номер строки файла (с 1)
+    detail: str
+
+
+class ImportSummary(BaseModel):
+    """Итог импорта"""
+    entity: DataEntity
+    imported: int = 0
+    rejected: int = 0
+    errors: List[ImportRowError] = []  # Первые MAX_REPORTED_ERRORS отклонённых строк
+
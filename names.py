@@ -0,0 +1,98 @@
+"""
+Имена пациентов и врачей в ответах DentalCare App API
+
+Записи на приём, результаты обследований и отзывы хранят только ID пациента
+и врача. Имена подставляются при формировании ответа из кэша имён по ID,
+а отсутствующие в кэше загружаются из хранилища. Кэш справочника
+сбрасывается, когда меняется версия имён в хранилище (table_version
+doctor_names / patient_names), поэтому после изменения профиля ответы сразу
+содержат новое имя, а сами записи переписывать не нужно.
+"""
+from typing import Dict, List, Optional, Tuple
+
+from database import AsyncStorage
+
+
+# Поле имени в ответе -> (версия имён в хранилище, поле ID в записи, метод загрузки)
+NAME_FIELDS: Dict[str, Tuple[str, str, str]] = {
+    "patient_name": ("patient_names", "patient_id", "get_patient"),
+    "doctor_name": ("doctor_names", "doctor_id", "get_doctor"),
+}
+
+# Поля имён в ответах по типам записей
+APPOINTMENT_NAMES = ("patient_name", "doctor_name")
+RESULT_NAMES = ("doctor_name",)
+REVIEW_NAMES = ("patient_name",)
+
+
+def full_name(person: dict) -> str:
+    """Имя и фамилия пациента или врача"""
+    return f"{person['first_name']} {person['last_name']}"
+
+
+class NameCache:
+    """Кэш имён пациентов и врачей по ID с инвалидацией по версии имён"""
+
+    def __init__(self, max_entries: int = 100_000):
+        self.max_entries = max_entries
+        self._versions: Dict[str, int] = {}
+        self._names: Dict[str, Dict[int, str]] = {}
+
+    def sync(self, kind: str, version: int) -> None:
+        """Сбросить имена справочника, если версия имён изменилась"""
+        if self._versions.get(kind) != version:
+            self._names[kind] = {}
+            self._versions[kind] = version
+
+    def get(self, kind: str, person_id: int) -> Optional[str]:
+        """Имя из кэша или None"""
+        return self._names.get(kind, {}).get(person_id)
+
+    def put(self, kind: str, person_id: int, name: str) -> None:
+        """Сохранить имя (самые давние записи вытесняются)"""
+        names = self._names.setdefault(kind, {})
+        names[person_id] = name
+        if len(names) > self.max_entries:
+            del names[next(iter(names))]
+
+    async def versions(self, db: AsyncStorage, fields: Tuple[str, ...]) -> Tuple[int, ...]:
+        """Текущие версии имён для полей fields (сверяет с ними кэш)"""
+        versions = []
+        for field in fields:
+            kind = NAME_FIELDS[field][0]
+            version = await db.table_version(kind)
+            self.sync(kind, version)
+            versions.append(version)
+        return tuple(versions)
+
+    async def resolve(self, db: AsyncStorage, records: List[dict], fields: Tuple[str, ...]) -> List[dict]:
+        """
+        Записи с подставленными именами.
+
+        Возвращает новые словари; записи хранилища не изменяются. Каждое
+        отсутствующее в кэше имя загружается из хранилища один раз.
+        """
+        await self.versions(db, fields)
+        resolved: Dict[str, Dict[int, str]] = {}
+        for field in fields:
+            kind, id_field, method = NAME_FIELDS[field]
+            names = resolved[field] = {}
+            for record in records:
+                person_id = record[id_field]
+                if person_id in names:
+                    continue
+                name = self.get(kind, person_id)
+                if name is None:
+                    person = await getattr(db, method)(person_id)
+                    name = full_name(person) if person else ""
+                    self.put(kind, person_id, name)
+                names[person_id] = name
+
+        return [
+            dict(record, **{field: resolved[field][record[NAME_FIELDS[field][1]]] for field in fields})
+            for record in records
+        ]
+
+    async def resolve_one(self, db: AsyncStorage, record: dict, fields: Tuple[str, ...]) -> dict:
+        """Одна запись с подставленными именами"""
+        return (await self.resolve(db, [record], fields))[0]
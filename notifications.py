@@ -0,0 +1,184 @@
+"""
+Доставка уведомлений DentalCare App API
+
+Эндпоинты публикуют в шину событий переходы статусов записей и загрузку
+результатов (см. events.py). Фоновый NotificationWorker забирает события
+пачками, превращает их в уведомления, сохраняет пачку в хранилище одной
+операцией и передаёт её отправителю push-уведомлений. Всё это происходит
+вне обработки запроса, поэтому задержка ответа не зависит от рассылки.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from database import AsyncStorage, Database
+from events import NOTIFICATION_CREATED, Event, EventBus, Subscription
+from models import NotificationType
+from names import full_name
+
+
+logger = logging.getLogger(__name__)
+
+
+# Заголовок и текст уведомления по типу события; в текст подставляются
+# doctor (имя врача), time и old_time (время приёма), title (название результата)
+TEMPLATES: Dict[NotificationType, Tuple[str, str]] = {
+    NotificationType.APPOINTMENT_CONFIRMED: (
+        "Запись подтверждена",
+        "Ваша запись к врачу {doctor} на {time:%d.%m.%Y %H:%M} подтверждена",
+    ),
+    NotificationType.APPOINTMENT_REMINDER: (
+        "Напоминание о приёме",
+        "Напоминаем о приёме к врачу {doctor} {time:%d.%m.%Y} в {time:%H:%M}",
+    ),
+    NotificationType.APPOINTMENT_CANCELLED: (
+        "Запись отменена",
+        "Ваша запись к врачу {doctor} на {time:%d.%m.%Y %H:%M} отменена",
+    ),
+    NotificationType.APPOINTMENT_RESCHEDULED: (
+        "Запись перенесена",
+        "Ваша запись к врачу {doctor} перенесена с {old_time:%d.%m.%Y %H:%M} на {time:%d.%m.%Y %H:%M}",
+    ),
+    NotificationType.RESULT_UPLOADED: (
+        "Загружен результат обследования",
+        "Доктор {doctor} загрузил результат: {title}",
+    ),
+    NotificationType.APPOINTMENT_COMPLETED: (
+        "Приём завершён",
+        "Приём у врача {doctor} завершён. Рекомендации доступны в истории",
+    ),
+}
+
+
+def appointment_event(event_type: NotificationType, appointment: dict, **data) -> Event:
+    """Событие перехода записи на приём (адресовано пациенту)"""
+    return Event(
+        type=event_type,
+        user_id=appointment["patient_id"],
+        related_id=appointment["id"],
+        data={"doctor_id": appointment["doctor_id"], "time": appointment["appointment_time"], **data},
+        created_at=datetime.now(),
+    )
+
+
+def result_event(result: dict) -> Event:
+    """Событие загрузки результата обследования (адресовано пациенту)"""
+    return Event(
+        type=NotificationType.RESULT_UPLOADED,
+        user_id=result["patient_id"],
+        related_id=result["id"],
+        data={"doctor_id": result["doctor_id"], "title": result["title"]},
+        created_at=datetime.now(),
+    )
+
+
+def render(event: Event, doctor_name: str) -> dict:
+    """Запись уведомления по событию"""
+    title, message = TEMPLATES[event.type]
+    return {
+        "user_id": event.user_id,
+        "notification_type": event.type,
+        "title": title,
+        "message": message.format(doctor=doctor_name, **event.data),
+        "is_read": False,
+        "related_id": event.related_id,
+        "created_at": event.created_at,
+    }
+
+
+async def load_doctor_names(db: AsyncStorage, events: List[Event]) -> Dict[int, str]:
+    """Имена врачей, упомянутых в событиях (каждый врач загружается один раз)"""
+    names = {}
+    for doctor_id in {event.data["doctor_id"] for event in events}:
+        doctor = await db.get_doctor(doctor_id)
+        names[doctor_id] = full_name(doctor) if doctor else ""
+    return names
+
+
+class PushSender:
+    """
+    Локальная заглушка отправки push-уведомлений.
+
+    Пишет уведомления в лог и считает отправленные; в рабочей системе
+    здесь вызывается сервис push-уведомлений.
+    """
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, notifications: List[dict]) -> None:
+        """Отправить пачку уведомлений"""
+        for notification in notifications:
+            logger.info("push user=%s: %s", notification["user_id"], notification["message"])
+        self.sent += len(notifications)
+
+
+class NotificationWorker:
+    """Фоновый обработчик: события шины -> уведомления в хранилище -> push"""
+
+    def __init__(self, bus: EventBus, database: Database, sender: PushSender, batch_size: int = 100):
+        self.bus = bus
+        self.database = database
+        self.sender = sender
+        self.batch_size = batch_size
+        self.created = 0
+        self.failed = 0
+        self._subscription: Optional[Subscription] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Подписаться на события и запустить обработку"""
+        self._subscription = self.bus.subscribe(maxsize=10_000, types=TEMPLATES)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Отписаться от шины и дождаться обработки уже полученных событий"""
+        if self._task is None:
+            return
+        self._subscription.close()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._subscription.next_batch(self.batch_size)
+            if not batch:
+                return
+            try:
+                await self.process(batch)
+            except Exception:
+                self.failed += len(batch)
+                logger.exception("Не удалось обработать пачку из %d событий", len(batch))
+
+    async def process(self, batch: List[Event]) -> List[dict]:
+        """Сохранить уведомления по пачке событий одной операцией и отправить их"""
+        async with self.database.session() as db:
+            doctor_names = await load_doctor_names(db, batch)
+            notifications = await db.add_notifications([
+                render(event, doctor_names[event.data["doctor_id"]]) for event in batch
+            ])
+        self.created += len(notifications)
+        await self.deliver(notifications)
+        return notifications
+
+    async def deliver(self, notifications: List[dict]) -> None:
+        """Передать сохранённые уведомления в потоки событий пользователей (см. streams.py) и на отправку"""
+        for notification in notifications:
+            self.bus.publish(Event(
+                type=NOTIFICATION_CREATED,
+                user_id=notification["user_id"],
+                related_id=notification["id"],
+                data=dict(notification),
+                created_at=notification["created_at"],
+            ))
+        await self.sender.send(notifications)
+
+    def stats(self) -> dict:
+        """Счётчики обработчика"""
+        return {
+            "created": self.created,
+            "sent": self.sender.sent,
+            "failed": self.failed,
+            "pending": self._subscription.pending if self._subscription else 0,
+        }
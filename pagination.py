@@ -0,0 +1,73 @@
+"""
+Keyset-пагинация списков DentalCare App API
+
+Курсор - непрозрачная строка (base64url от JSON), содержащая ключ сортировки
+последнего элемента страницы. Следующая страница начинается строго после этого
+ключа, поэтому стоимость любой страницы не зависит от её номера.
+"""
+import base64
+import json
+from itertools import islice
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, Response, status
+
+
+# Заголовок ответа с курсором следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Максимальный размер страницы
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(*key: Any) -> str:
+    """Закодировать ключ сортировки в непрозрачный курсор"""
+    raw = json.dumps(list(key), default=str, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *parsers: Callable[[Any], Any]) -> Tuple:
+    """
+    Раскодировать курсор в ключ сортировки.
+
+    Каждая часть ключа приводится соответствующим парсером
+    (например, datetime.fromisoformat для времени).
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        parts = json.loads(raw)
+        if not isinstance(parts, list) or len(parts) != len(parsers):
+            raise ValueError(cursor)
+        return tuple(parse(part) for parse, part in zip(parsers, parts))
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор пагинации"
+        )
+
+
+def lookahead(limit: Optional[int]) -> Optional[int]:
+    """Сколько элементов запросить у хранилища: на один больше страницы, чтобы узнать, есть ли следующая"""
+    return None if limit is None else limit + 1
+
+
+def paginate(
+    items: Iterable[dict],
+    limit: Optional[int],
+    cursor_key: Callable[[dict], Tuple],
+    response: Response
+) -> List[dict]:
+    """
+    Взять одну страницу из упорядоченного потока элементов.
+
+    Если страница не последняя, курсор следующей страницы передаётся
+    в заголовке X-Next-Cursor. Без limit возвращаются все элементы.
+    """
+    if limit is None:
+        return list(items)
+
+    page = list(islice(items, limit + 1))
+    if len(page) > limit:
+        page = page[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*cursor_key(page[-1]))
+    return page
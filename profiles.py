@@ -0,0 +1,90 @@
+"""
+Снимки профилей врачей DentalCare App API
+
+Список врачей меняется редко (новый отзыв, правка профиля), а читается на
+каждом открытии приложения. Поэтому профили собираются в неизменяемый снимок:
+каждый профиль один раз проверяется моделью DoctorBase и сериализуется в JSON.
+Снимок перестраивается только при изменении версии врачей в хранилище;
+запросы не изменяют ни снимок, ни записи хранилища, а расписание добавляется
+к готовому JSON профиля.
+"""
+import json
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from models import DoctorBase, DoctorSpecialization
+
+
+class DoctorProfile:
+    """Неизменяемый профиль врача с заранее сериализованным JSON"""
+
+    __slots__ = ("id", "specialization", "rating", "_json_prefix", "json")
+
+    def __init__(self, doctor: dict):
+        profile = DoctorBase.model_validate(doctor)
+        encoded = profile.model_dump_json().encode()
+        object.__setattr__(self, "id", profile.id)
+        object.__setattr__(self, "specialization", profile.specialization)
+        object.__setattr__(self, "rating", profile.rating)
+        # JSON профиля без закрывающей скобки - к нему дописывается расписание
+        object.__setattr__(self, "_json_prefix", encoded[:-1] + b',"available_slots":')
+        object.__setattr__(self, "json", self._json_prefix + b"[]}")
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Профиль врача неизменяем")
+
+    def with_slots(self, slots: Sequence[datetime]) -> bytes:
+        """JSON профиля с доступными слотами"""
+        return self._json_prefix + json.dumps([slot.isoformat() for slot in slots], separators=(",", ":")).encode() + b"}"
+
+
+class DoctorSnapshot:
+    """Неизменяемый снимок всех профилей врачей для одной версии хранилища"""
+
+    def __init__(self, version: int, doctors: Iterable[dict]):
+        self.version = version
+        self._by_id: Tuple[DoctorProfile, ...] = tuple(
+            sorted((DoctorProfile(doctor) for doctor in doctors), key=lambda p: p.id)
+        )
+        # Как в хранилище: по убыванию рейтинга, врачи без рейтинга в конце
+        self._by_rating: Tuple[DoctorProfile, ...] = tuple(
+            sorted(self._by_id, key=lambda p: (p.rating is None, -(p.rating or 0), p.id))
+        )
+
+    def select(
+        self,
+        specialization: Optional[DoctorSpecialization] = None,
+        by_rating: bool = False
+    ) -> List[DoctorProfile]:
+        """Профили с фильтром по специализации (по ID или по убыванию рейтинга)"""
+        profiles = self._by_rating if by_rating else self._by_id
+        if specialization:
+            return [p for p in profiles if p.specialization == specialization]
+        return list(profiles)
+
+    def body(self, specialization: Optional[DoctorSpecialization] = None, by_rating: bool = False) -> bytes:
+        """JSON списка врачей без расписания из готовых JSON профилей"""
+        return join_json(p.json for p in self.select(specialization, by_rating))
+
+
+class DoctorDirectory:
+    """Текущий снимок профилей врачей процесса"""
+
+    def __init__(self):
+        self._snapshot: Optional[DoctorSnapshot] = None
+
+    def get(self, version: int) -> Optional[DoctorSnapshot]:
+        """Снимок для версии version или None, если его нужно перестроить"""
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None and snapshot.version == version else None
+
+    def rebuild(self, version: int, doctors: Iterable[dict]) -> DoctorSnapshot:
+        """Построить снимок по записям врачей и сделать его текущим"""
+        snapshot = DoctorSnapshot(version, doctors)
+        self._snapshot = snapshot
+        return snapshot
+
+
+def join_json(items: Iterable[bytes]) -> bytes:
+    """JSON-массив из уже сериализованных элементов"""
+    return b"[" + b",".join(items) + b"]"
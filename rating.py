@@ -0,0 +1,74 @@
+"""
+Рейтинг врачей DentalCare App API
+
+Рейтинг ведётся инкрементально прямо в записи врача: хранится взвешенная
+сумма оценок (rating_sum), суммарный вес (rating_weight) и время самого
+свежего отзыва (rated_at). Новый отзыв обновляет их за O(1), поэтому список
+врачей и статистика читают готовый rating без прохода по отзывам.
+
+Если задана переменная окружения DENTAL_RATING_HALF_LIFE_DAYS, вес старых
+оценок убывает вдвое за каждый такой период, и свежие отзывы влияют на
+рейтинг сильнее. Без неё рейтинг - обычное среднее всех оценок.
+
+Агрегат приведён к моменту rated_at: более свежий отзыв сначала состаривает
+агрегат до своего времени, а более старый (например, при импорте истории)
+входит в него с уже уменьшенным весом. Поэтому рейтинг не зависит от порядка,
+в котором поступили отзывы.
+"""
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+
+# Период полураспада веса оценки в днях (None - без затухания)
+RATING_HALF_LIFE_DAYS = (
+    float(os.environ["DENTAL_RATING_HALF_LIFE_DAYS"])
+    if os.environ.get("DENTAL_RATING_HALF_LIFE_DAYS") else None
+)
+
+
+def apply_review(
+    doctor: dict,
+    rating: int,
+    reviewed_at: datetime,
+    half_life_days: Optional[float] = RATING_HALF_LIFE_DAYS
+) -> dict:
+    """
+    Изменения полей врача после нового отзыва.
+
+    Для врача без накопленного агрегата (например, из тестовых данных)
+    исходной точкой служат его rating и reviews_count.
+    """
+    reviews_count = doctor.get("reviews_count") or 0
+    rating_sum = doctor.get("rating_sum")
+    rating_weight = doctor.get("rating_weight")
+    if rating_sum is None or rating_weight is None:
+        rating_weight = float(reviews_count)
+        rating_sum = (doctor.get("rating") or 0) * rating_weight
+
+    rated_at = doctor.get("rated_at")
+    weight = 1.0
+    if half_life_days and rated_at:
+        if reviewed_at > rated_at:
+            # Агрегат стареет до времени нового отзыва
+            decay = _decay(reviewed_at - rated_at, half_life_days)
+            rating_sum *= decay
+            rating_weight *= decay
+        else:
+            # Отзыв старше агрегата входит в него с весом на момент rated_at
+            weight = _decay(rated_at - reviewed_at, half_life_days)
+
+    rating_sum += rating * weight
+    rating_weight += weight
+    return {
+        "rating": round(rating_sum / rating_weight, 2),
+        "reviews_count": reviews_count + 1,
+        "rating_sum": rating_sum,
+        "rating_weight": rating_weight,
+        "rated_at": max(rated_at, reviewed_at) if rated_at else reviewed_at,
+    }
+
+
+def _decay(age: timedelta, half_life_days: float) -> float:
+    """Множитель веса оценки возраста age"""
+    return 0.5 ** (age.total_seconds() / (half_life_days * 86400))
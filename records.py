@@ -0,0 +1,123 @@
+"""
+Компактные записи in-memory хранилища DentalCare App API
+
+Запись-словарь с полутора десятками ключей вместе с хэш-таблицей занимает
+сотни байт, и при миллионах записей память ограничивает объём истории,
+которую можно держать в процессе. Поэтому записи на приём, результаты
+обследований и уведомления хранятся в классах со __slots__ (без __dict__):
+- поля-перечисления (статус, тип) хранятся небольшими целыми - номером
+  члена перечисления;
+- повторяющиеся строки (тип услуги, заголовки) интернируются
+  и разделяются между записями.
+
+Имена пациентов и врачей в записях не хранятся (см. names.py).
+
+Снаружи запись ведёт себя как словарь (MutableMapping): индексы, хранилище
+и эндпоинты работают с ней так же, как с dict, а перечисления при чтении
+возвращаются членами Enum.
+"""
+import sys
+from collections.abc import MutableMapping
+from enum import Enum
+from typing import Any, Dict, FrozenSet, Iterator, Mapping, Tuple, Type
+
+from models import AppointmentStatus, NotificationType, ResultType
+
+
+class CompactRecord(MutableMapping):
+    """
+    Базовый класс компактной записи.
+
+    Подкласс перечисляет поля в FIELDS (и в __slots__), поля-перечисления
+    в ENUMS и интернируемые строковые поля в INTERNED. Набор полей
+    фиксирован: неизвестный ключ вызывает KeyError.
+    """
+
+    __slots__ = ()
+
+    FIELDS: Tuple[str, ...] = ()
+    ENUMS: Dict[str, Type[Enum]] = {}
+    INTERNED: FrozenSet[str] = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+        cls._members = {field: tuple(enum) for field, enum in cls.ENUMS.items()}
+        cls._codes = {
+            field: {member: code for code, member in enumerate(members)}
+            for field, members in cls._members.items()
+        }
+
+    def __init__(self, record: Mapping[str, Any] = (), **fields: Any):
+        for field in self.FIELDS:
+            object.__setattr__(self, field, None)
+        self.update(record, **fields)
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._field_set:
+            raise KeyError(key)
+        value = getattr(self, key)
+        members = self._members.get(key)
+        return members[value] if members is not None and value is not None else value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in self._field_set:
+            raise KeyError(key)
+        if value is not None:
+            if key in self._codes:
+                value = self._codes[key][self.ENUMS[key](value)]
+            elif key in self.INTERNED:
+                value = sys.intern(value)
+        object.__setattr__(self, key, value)
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("Поля компактной записи нельзя удалять")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._field_set
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+class AppointmentRecord(CompactRecord):
+    """Запись на приём"""
+
+    FIELDS = (
+        "id", "patient_id", "doctor_id",
+        "appointment_time", "service_type", "status", "notes",
+        "diagnosis", "treatment", "recommendations", "created_at", "updated_at",
+        "reminded_at", "duration_minutes",
+    )
+    __slots__ = FIELDS
+    ENUMS = {"status": AppointmentStatus}
+    INTERNED = frozenset({"service_type"})
+
+
+class ResultRecord(CompactRecord):
+    """Результат обследования"""
+
+    FIELDS = (
+        "id", "patient_id", "doctor_id", "result_type",
+        "title", "description", "file_url", "created_at",
+    )
+    __slots__ = FIELDS
+    ENUMS = {"result_type": ResultType}
+
+
+class NotificationRecord(CompactRecord):
+    """Уведомление"""
+
+    FIELDS = (
+        "id", "user_id", "notification_type", "title", "message",
+        "is_read", "related_id", "created_at",
+    )
+    __slots__ = FIELDS
+    ENUMS = {"notification_type": NotificationType}
+    INTERNED = frozenset({"title"})
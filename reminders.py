@@ -0,0 +1,266 @@
+"""
+Напоминания о приёме DentalCare App API
+
+ReminderScheduler держит в памяти кучу (min-heap) подтверждённых записей,
+упорядоченную по времени напоминания (время приёма - REMINDER_LEAD), и на
+каждом шаге забирает из неё только наступившие напоминания - без перебора
+всех записей. Куча следует за переходами записей через шину событий:
+подтверждение добавляет запись, перенос - переставляет, отмена и
+завершение - убирают. Записи, загруженные импортом, добавляются по мере
+сохранения порций (schedule_appointments). Устаревшие элементы кучи не
+удаляются сразу, а пропускаются при извлечении (сверяются с текущим
+временем записи).
+
+Отправка "ровно один раз": напоминания сохраняются пачкой через
+Storage.add_reminders, который в той же операции отмечает запись
+напомненной (reminded_at) и пропускает уже напомненные, отменённые и
+перенесённые записи. При запуске куча восстанавливается из хранилища по
+записям без reminded_at, поэтому после перезапуска напоминания не теряются
+и не повторяются.
+
+Настройки (переменные окружения):
+- DENTAL_REMINDER_HOURS - за сколько часов до приёма напоминать (по умолчанию 24)
+"""
+import asyncio
+import heapq
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from database import Database
+from events import Event, EventBus, Subscription
+from models import AppointmentStatus, NotificationType
+from notifications import NotificationWorker, appointment_event, load_doctor_names, render
+
+
+logger = logging.getLogger(__name__)
+
+# За сколько до приёма отправляется напоминание
+REMINDER_LEAD = timedelta(hours=int(os.environ.get("DENTAL_REMINDER_HOURS", "24")))
+
+# События, по которым меняется набор запланированных напоминаний
+SCHEDULE_EVENTS = (
+    NotificationType.APPOINTMENT_CONFIRMED,
+    NotificationType.APPOINTMENT_RESCHEDULED,
+    NotificationType.APPOINTMENT_CANCELLED,
+    NotificationType.APPOINTMENT_COMPLETED,
+)
+
+
+class Reminder(NamedTuple):
+    """Запланированное напоминание (элемент кучи)"""
+
+    remind_at: datetime
+    appointment_id: int
+    appointment_time: datetime
+    patient_id: int
+    doctor_id: int
+
+
+class ReminderScheduler:
+    """Планировщик напоминаний о приёме"""
+
+    def __init__(
+        self,
+        bus: EventBus,
+        database: Database,
+        worker: NotificationWorker,
+        lead: timedelta = REMINDER_LEAD,
+        batch_size: int = 500,
+        poll_seconds: float = 60.0,
+        clock: Callable[[], datetime] = datetime.now
+    ):
+        self.bus = bus
+        self.database = database
+        self.worker = worker
+        self.lead = lead
+        self.batch_size = batch_size
+        self.poll_seconds = poll_seconds
+        self.clock = clock
+        self.sent = 0
+        self.skipped = 0
+        self._heap: List[Reminder] = []
+        # ID записи -> время приёма, для которого запланировано напоминание
+        self._scheduled: Dict[int, datetime] = {}
+        self._subscription: Optional[Subscription] = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+
+    # ----- Куча напоминаний -----
+
+    def schedule(self, appointment_id: int, appointment_time: datetime, patient_id: int, doctor_id: int) -> None:
+        """Запланировать (или переставить) напоминание о записи"""
+        if self._scheduled.get(appointment_id) == appointment_time:
+            return
+        self._scheduled[appointment_id] = appointment_time
+        reminder = Reminder(appointment_time - self.lead, appointment_id, appointment_time, patient_id, doctor_id)
+        heapq.heappush(self._heap, reminder)
+        if self._heap[0] is reminder:
+            self._wakeup.set()
+        self._compact()
+
+    def unschedule(self, appointment_id: int) -> None:
+        """Снять напоминание о записи (элемент кучи пропустится при извлечении)"""
+        self._scheduled.pop(appointment_id, None)
+        self._compact()
+
+    def _compact(self) -> None:
+        # Устаревших элементов стало больше, чем актуальных, - перестраиваем кучу
+        if len(self._heap) > 2 * len(self._scheduled) + 1000:
+            self._heap = [r for r in self._heap if self._scheduled.get(r.appointment_id) == r.appointment_time]
+            heapq.heapify(self._heap)
+
+    def due(self, now: datetime, limit: int) -> List[Reminder]:
+        """Извлечь наступившие напоминания (не больше limit)"""
+        reminders = []
+        while self._heap and len(reminders) < limit and self._heap[0].remind_at <= now:
+            reminder = heapq.heappop(self._heap)
+            if self._scheduled.get(reminder.appointment_id) != reminder.appointment_time:
+                continue  # запись перенесена, отменена или напоминание уже отправлено
+            del self._scheduled[reminder.appointment_id]
+            if reminder.appointment_time <= now:
+                self.skipped += 1  # приём уже прошёл - напоминать поздно
+                continue
+            reminders.append(reminder)
+        return reminders
+
+    def next_due(self) -> Optional[datetime]:
+        """Время ближайшего напоминания (с учётом устаревших элементов) или None"""
+        return self._heap[0].remind_at if self._heap else None
+
+    def handle(self, event: Event) -> None:
+        """Поправить кучу по событию перехода записи"""
+        if event.type in (NotificationType.APPOINTMENT_CONFIRMED, NotificationType.APPOINTMENT_RESCHEDULED):
+            # Перенесённая неподтверждённая запись тоже попадает в кучу: при отправке
+            # хранилище проверит статус и пропустит её
+            self.schedule(event.related_id, event.data["time"], event.user_id, event.data["doctor_id"])
+        else:
+            self.unschedule(event.related_id)
+
+    def schedule_appointments(self, appointments: Iterable[dict]) -> int:
+        """
+        Запланировать напоминания о записях, сохранённых в обход переходов
+        (импорт): подтверждённых, предстоящих и ещё не напомненных.
+        Возвращает количество запланированных.
+        """
+        now = self.clock()
+        scheduled = 0
+        for appointment in appointments:
+            if (
+                appointment["status"] == AppointmentStatus.CONFIRMED
+                and appointment.get("reminded_at") is None
+                and appointment["appointment_time"] > now
+            ):
+                self.schedule(
+                    appointment["id"], appointment["appointment_time"],
+                    appointment["patient_id"], appointment["doctor_id"]
+                )
+                scheduled += 1
+        return scheduled
+
+    # ----- Отправка -----
+
+    async def load(self) -> int:
+        """Заполнить кучу записями без отправленного напоминания из хранилища"""
+        async with self.database.session() as db:
+            candidates = await db.reminder_candidates(self.clock())
+        for appointment in candidates:
+            self.schedule(
+                appointment["id"], appointment["appointment_time"],
+                appointment["patient_id"], appointment["doctor_id"]
+            )
+        return len(candidates)
+
+    async def tick(self, now: Optional[datetime] = None) -> int:
+        """Отправить наступившие напоминания пачками; возвращает количество отправленных"""
+        now = now or self.clock()
+        sent = 0
+        while True:
+            batch = self.due(now, self.batch_size)
+            if not batch:
+                return sent
+            try:
+                sent += await self.send(batch)
+            except Exception:
+                # Вернуть пачку в кучу: повторим на следующем шаге
+                for reminder in batch:
+                    self.schedule(*reminder[1:])
+                raise
+
+    async def send(self, batch: List[Reminder]) -> int:
+        """Сохранить напоминания пачки одной операцией и передать на отправку"""
+        events = [
+            appointment_event(NotificationType.APPOINTMENT_REMINDER, {
+                "id": r.appointment_id,
+                "patient_id": r.patient_id,
+                "doctor_id": r.doctor_id,
+                "appointment_time": r.appointment_time,
+            })
+            for r in batch
+        ]
+        async with self.database.session() as db:
+            doctor_names = await load_doctor_names(db, events)
+            notifications = await db.add_reminders([
+                (reminder.appointment_time, render(event, doctor_names[reminder.doctor_id]))
+                for reminder, event in zip(batch, events)
+            ])
+        self.sent += len(notifications)
+        self.skipped += len(batch) - len(notifications)
+        await self.worker.deliver(notifications)
+        return len(notifications)
+
+    # ----- Фоновая работа -----
+
+    async def start(self) -> None:
+        """Подписаться на переходы записей, загрузить кучу и запустить отправку"""
+        self._subscription = self.bus.subscribe(maxsize=10_000, types=SCHEDULE_EVENTS)
+        await self.load()
+        self._tasks = [asyncio.create_task(self._listen()), asyncio.create_task(self._run())]
+
+    async def stop(self) -> None:
+        """Остановить планировщик"""
+        if not self._tasks:
+            return
+        self._subscription.close()
+        listen, run = self._tasks
+        await listen
+        run.cancel()
+        await asyncio.gather(run, return_exceptions=True)
+        self._tasks = []
+
+    async def _listen(self) -> None:
+        while True:
+            batch = await self._subscription.next_batch(1000)
+            if not batch:
+                return
+            for event in batch:
+                self.handle(event)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            delay = self.poll_seconds
+            try:
+                await self.tick()
+            except Exception:
+                # Пачка возвращена в кучу; повторяем не раньше чем через poll_seconds
+                logger.exception("Не удалось отправить напоминания")
+            else:
+                next_due = self.next_due()
+                if next_due is not None:
+                    delay = min(delay, max((next_due - self.clock()).total_seconds(), 0.0))
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def stats(self) -> dict:
+        """Счётчики планировщика"""
+        return {
+            "scheduled": len(self._scheduled),
+            "heap": len(self._heap),
+            "sent": self.sent,
+            "skipped": self.skipped,
+            "next_due": self.next_due(),
+        }
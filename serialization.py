@@ -0,0 +1,88 @@
+"""
+Быстрая сериализация списков DentalCare App API
+
+По умолчанию FastAPI проверяет каждый элемент списка моделью ответа
+(response_model) и кодирует результат через jsonable_encoder. Записи
+хранилища уже соответствуют схеме, поэтому для больших списков это лишняя
+работа. RecordEncoder знает поля модели ответа и их порядок и кодирует
+записи прямо в байты без повторной проверки - ответ совпадает с обычным
+побайтно. Для кодирования используется orjson, если он установлен, иначе -
+кодировщик pydantic (им FastAPI кодирует и обычные ответы). Модели с полями
+float всегда кодируются pydantic: orjson пишет большие числа иначе (1e16
+вместо 1e+16). Совпадение проверяет tests/test_serialization.py.
+
+Настройки (переменные окружения):
+- DENTAL_FAST_JSON - включить быстрый режим (1/true)
+"""
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Type, Union
+
+from fastapi import Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson необязателен
+    orjson = None
+
+
+# Быстрый режим сериализации списков
+FAST_JSON = os.environ.get("DENTAL_FAST_JSON", "").lower() in ("1", "true", "yes")
+
+
+def dumps(value: Any) -> bytes:
+    """JSON в том же виде, что и у FastAPI (компактный, UTF-8 без экранирования)"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return to_json(value)
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """Разобрать JSON (ошибка разбора - ValueError)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class RecordEncoder:
+    """Кодирование записей хранилища по полям модели ответа без её проверки"""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self._defaults: Dict[str, Any] = {
+            name: None if field.is_required() else field.get_default(call_default_factory=True)
+            for name, field in model.model_fields.items()
+        }
+        # Поля float: целое значение из хранилища модель превратила бы в 1.0
+        self._floats = [
+            name for name, field in model.model_fields.items()
+            if field.annotation in (float, Optional[float])
+        ]
+        self._dumps = to_json if self._floats else dumps
+
+    def row(self, record: dict) -> dict:
+        """Поля записи в порядке модели (служебные поля хранилища отбрасываются)"""
+        row = {name: record.get(name, default) for name, default in self._defaults.items()}
+        for name in self._floats:
+            if row[name] is not None:
+                row[name] = float(row[name])
+        return row
+
+    def encode(self, records: Iterable[dict]) -> bytes:
+        """JSON-массив записей"""
+        return self._dumps([self.row(record) for record in records])
+
+
+def records_response(records: List[dict], encoder: RecordEncoder, response: Response) -> Union[List[dict], Response]:
+    """
+    Ответ со списком записей.
+
+    В быстром режиме записи кодируются напрямую (заголовки из response, например
+    курсор пагинации, переносятся в ответ), иначе список возвращается FastAPI
+    для обычной сериализации через response_model.
+    """
+    if not FAST_JSON:
+        return records
+    return Response(content=encoder.encode(records), media_type="application/json", headers=dict(response.headers))
@@ -0,0 +1,2094 @@
+"""
+Хранилище данных DentalCare App API
+
+Эндпоинты работают с данными только через интерфейс Storage. Реализации:
+- InMemoryStorage - словари в памяти процесса с индексами из indexes.py
+- SQLiteStorage - сессия поверх соединения с файлом SQLite в режиме WAL,
+  общим для нескольких воркеров uvicorn
+
+Асинхронный доступ и пул соединений - в database.py.
+"""
+import heapq
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from enum import Enum
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from availability import SLOT_MINUTES, AvailabilityCalendar, DoctorCalendar, WorkingHours, occupied_slots
+from indexes import (
+    CANCELLED_STATUSES,
+    DOCTOR_COUNTER_FIELDS,
+    UPCOMING_STATUSES,
+    AppointmentIndex,
+    BookingLedger,
+    DoctorStatsIndex,
+    InboxIndex,
+    KeyOrder,
+    ReviewIndex,
+    SortedIndex,
+    UniqueIndex,
+)
+from models import AppointmentStatus, DoctorSpecialization, NotificationType, ResultType
+from rating import apply_review
+from records import AppointmentRecord, NotificationRecord, ResultRecord
+
+
+# Таблицы справочников -> версия их имён в table_versions (см. names.py)
+NAME_VERSIONS = {"doctors": "doctor_names", "patients": "patient_names"}
+
+
+class SlotConflictError(Exception):
+    """Слот врача уже занят другой записью"""
+
+    def __init__(self, appointment_id: int):
+        super().__init__(appointment_id)
+        self.appointment_id = appointment_id
+
+
+class BatchConflictError(Exception):
+    """Часть слотов пакета записей уже занята"""
+
+    def __init__(self, conflicts: Dict[int, Optional[int]]):
+        super().__init__(conflicts)
+        self.conflicts = conflicts  # номер записи в пакете -> ID записи, занимающей слот (None - запись пакета)
+
+
+class StatusTransition(NamedTuple):
+    """Результат массовой смены статуса записей"""
+
+    updated: List[dict]
+    skipped: Dict[int, Optional[AppointmentStatus]]  # ID -> текущий статус (None - записи нет)
+
+
+class ImportConflictError(Exception):
+    """Порция импорта конфликтует с данными хранилища (ID, слот врача или отзыв уже заняты)"""
+
+    def __init__(self, detail: str):
+        super().__init__(detail)
+        self.detail = detail
+
+
+class DuplicateReviewError(Exception):
+    """На приём уже оставлен отзыв"""
+
+    def __init__(self, review_id: int):
+        super().__init__(review_id)
+        self.review_id = review_id
+
+
+class UnknownDoctorError(Exception):
+    """Врача, к которому относится запись, нет в хранилище"""
+
+    def __init__(self, doctor_id: int):
+        super().__init__(doctor_id)
+        self.doctor_id = doctor_id
+
+
+class IdAllocator:
+    """
+    Потокобезопасная выдача последовательных ID.
+
+    Используется in-memory хранилищем; в SQLite ID назначает база внутри
+    транзакции записи, что корректно и для нескольких процессов.
+    """
+
+    def __init__(self, start: int = 1):
+        self._next = start
+        self._lock = threading.Lock()
+
+    def allocate(self) -> int:
+        """Выдать следующий ID"""
+        with self._lock:
+            value = self._next
+            self._next += 1
+        return value
+
+    def advance(self, used_id: int) -> None:
+        """Учесть ID, назначенный снаружи (импорт): следующие ID будут больше него"""
+        with self._lock:
+            self._next = max(self._next, used_id + 1)
+
+
+def _diff_statistics(
+    stored: Dict[int, dict],
+    actual: Dict[int, dict]
+) -> Dict[int, Dict[str, Dict[str, Any]]]:
+    """
+    Сравнить поддерживаемую статистику врачей с пересчитанной по исходным данным.
+
+    Возвращает расхождения {doctor_id: {поле: {"stored": ..., "actual": ...}}};
+    пустой словарь означает, что счётчики согласованы.
+    """
+    mismatches = {}
+    for doctor_id in sorted(set(stored) | set(actual)):
+        stored_stats = stored.get(doctor_id, {})
+        actual_stats = actual.get(doctor_id, {})
+        fields = {
+            field: {"stored": stored_stats.get(field, 0), "actual": actual_stats.get(field, 0)}
+            for field in set(stored_stats) | set(actual_stats)
+            if stored_stats.get(field, 0) != actual_stats.get(field, 0)
+        }
+        if fields:
+            mismatches[doctor_id] = fields
+    return mismatches
+
+
+def _appointment_slots(appointment: Optional[dict]) -> Set[datetime]:
+    """Слоты сетки, которые занимает запись (отменённая запись слоты не занимает)"""
+    if appointment is None or appointment["status"] in CANCELLED_STATUSES:
+        return set()
+    return set(occupied_slots(appointment["appointment_time"], appointment.get("duration_minutes")))
+
+
+def _slot_change(before: Optional[dict], after: dict) -> Tuple[List[datetime], List[datetime]]:
+    """
+    Как изменение записи меняет занятость слотов врача.
+
+    Возвращает (освобождённые слоты, занятые слоты); пустые списки - слоты не менялись.
+    """
+    before_slots, after_slots = _appointment_slots(before), _appointment_slots(after)
+    return sorted(before_slots - after_slots), sorted(after_slots - before_slots)
+
+
+class Storage(ABC):
+    """Интерфейс хранилища (репозиторий) DentalCare App"""
+
+    # Вызовы выполняют блокирующий ввод-вывод и должны уходить в пул потоков
+    blocking = False
+
+    # Календари доступности врачей (см. availability.py)
+    calendar: AvailabilityCalendar
+
+    @abstractmethod
+    def table_version(self, table: str) -> int:
+        """
+        Версия данных справочника (doctors, patients, services).
+
+        Растёт при каждом изменении записи справочника (для врачей - в том числе
+        рейтинга); по ней перестраиваются снимки и кэши ответов. Версии
+        doctor_names и patient_names растут только при изменении имён.
+        """
+
+    # ----- Врачи -----
+
+    @abstractmethod
+    def get_doctor(self, doctor_id: int) -> Optional[dict]:
+        """Врач по ID или None"""
+
+    @abstractmethod
+    def list_doctors(
+        self,
+        specialization: Optional[DoctorSpecialization] = None,
+        by_rating: bool = False
+    ) -> List[dict]:
+        """Список врачей с фильтром по специализации (по ID или по убыванию рейтинга)"""
+
+    @abstractmethod
+    def update_doctor(self, doctor_id: int, **changes) -> dict:
+        """Обновить поля врача"""
+
+    @abstractmethod
+    def doctor_statistics(self, doctor_id: int, now: datetime) -> dict:
+        """
+        Статистика врача по поддерживаемым счётчикам.
+
+        Поля: DOCTOR_COUNTER_FIELDS и upcoming_appointments (предстоящие после now).
+        """
+
+    @abstractmethod
+    def check_doctor_statistics(self) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        """Сверить счётчики статистики врачей с исходными данными (пустой словарь - расхождений нет)"""
+
+    @abstractmethod
+    def rebuild_doctor_statistics(self) -> None:
+        """Пересчитать счётчики статистики врачей по исходным данным"""
+
+    # ----- Пациенты -----
+
+    @abstractmethod
+    def get_patient(self, patient_id: int) -> Optional[dict]:
+        """Пациент по ID или None"""
+
+    @abstractmethod
+    def patient_version(self, patient_id: int) -> int:
+        """Версия данных пациента: растёт при каждом изменении его записей и результатов"""
+
+    # ----- Записи на приём -----
+
+    @abstractmethod
+    def get_appointment(self, appointment_id: int) -> Optional[dict]:
+        """Запись по ID или None"""
+
+    @abstractmethod
+    def query_appointments(
+        self,
+        patient_id: Optional[int] = None,
+        doctor_id: Optional[int] = None,
+        status: Optional[AppointmentStatus] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        """Записи по фильтрам в порядке appointment_time, начиная после ключа after"""
+
+    @abstractmethod
+    def booked_slots(self, doctor_id: int, start: datetime, end: datetime) -> Set[datetime]:
+        """Занятые слоты врача в интервале [start, end)"""
+
+    @abstractmethod
+    def reminder_candidates(self, after: datetime) -> List[dict]:
+        """
+        Подтверждённые записи с приёмом после after, по которым ещё не отправлено
+        напоминание (поля id, patient_id, doctor_id, appointment_time)
+        """
+
+    @abstractmethod
+    def add_reminders(self, reminders: List[Tuple[datetime, dict]]) -> List[dict]:
+        """
+        Сохранить напоминания о приёме одной операцией.
+
+        Для каждой пары (время приёма, уведомление) запись related_id отмечается
+        напомненной (reminded_at), если она подтверждена, время приёма совпадает
+        и напоминание ещё не отправлялось, - и только тогда сохраняется
+        уведомление. Поэтому напоминание отправляется не больше одного раза,
+        в том числе после перезапуска и при нескольких процессах. Возвращает
+        сохранённые уведомления.
+        """
+
+    @abstractmethod
+    def booking_version(self, doctor_id: int) -> int:
+        """Версия бронирований врача: растёт при каждом занятии или освобождении его слота"""
+
+    def free_slots(
+        self,
+        doctor_id: int,
+        after: datetime,
+        count: int,
+        duration_minutes: int = SLOT_MINUTES,
+        until: Optional[datetime] = None
+    ) -> List[datetime]:
+        """Ближайшие свободные начала приёмов врача после after (по календарю доступности)"""
+        return self._doctor_calendar(doctor_id).next_free(after, count, duration_minutes, until)
+
+    def earliest_free_slots(
+        self,
+        doctor_ids: List[int],
+        after: datetime,
+        count: int,
+        duration_minutes: int = SLOT_MINUTES,
+        until: Optional[datetime] = None
+    ) -> List[Tuple[datetime, int]]:
+        """
+        Ближайшие свободные пары (слот, doctor_id) среди нескольких врачей.
+
+        Ленивые потоки слотов каждого врача сливаются через кучу (k-way merge),
+        поэтому из календарей читается только count слотов плюс по одному
+        на врача для инициализации кучи.
+        """
+        streams = [
+            self._tagged_free_slots(doctor_id, after, duration_minutes, until)
+            for doctor_id in doctor_ids
+        ]
+        return list(islice(heapq.merge(*streams), count))
+
+    def _tagged_free_slots(
+        self,
+        doctor_id: int,
+        after: datetime,
+        duration_minutes: int,
+        until: Optional[datetime]
+    ) -> Iterator[Tuple[datetime, int]]:
+        for slot_time in self._doctor_calendar(doctor_id).iter_free(after, duration_minutes, until):
+            yield slot_time, doctor_id
+
+    def _doctor_calendar(self, doctor_id: int) -> DoctorCalendar:
+        """Актуальный календарь врача (строится по занятым слотам, если устарел)"""
+        version = self.booking_version(doctor_id)
+
+        def build(start_day: date) -> DoctorCalendar:
+            start = datetime.combine(start_day, time())
+            end = start + timedelta(days=self.calendar.horizon_days)
+            return DoctorCalendar(
+                WorkingHours.from_doctor(self.get_doctor(doctor_id)),
+                self.booked_slots(doctor_id, start, end),
+                version,
+                start_day,
+                self.calendar.horizon_days
+            )
+
+        return self.calendar.get(doctor_id, version, build)
+
+    @abstractmethod
+    def add_appointment(self, appointment: dict) -> dict:
+        """
+        Сохранить новую запись, назначив ей ID.
+
+        Слот бронируется атомарно вместе с сохранением; если он занят,
+        выбрасывается SlotConflictError.
+        """
+
+    @abstractmethod
+    def add_appointments(self, appointments: List[dict]) -> List[dict]:
+        """
+        Сохранить пакет новых записей одной операцией.
+
+        Записи сохраняются все или ни одной: если часть слотов занята,
+        выбрасывается BatchConflictError со всеми конфликтами пакета.
+        Слоты внутри пакета не должны повторяться.
+        """
+
+    @abstractmethod
+    def update_appointment(self, appointment_id: int, **changes) -> dict:
+        """
+        Обновить поля записи.
+
+        При изменении appointment_time бронирование переносится атомарно;
+        если новый слот занят, выбрасывается SlotConflictError.
+        """
+
+    @abstractmethod
+    def transition_appointments(
+        self,
+        appointment_ids: List[int],
+        status: AppointmentStatus,
+        from_statuses: Iterable[AppointmentStatus],
+        updated_at: datetime
+    ) -> StatusTransition:
+        """
+        Перевести записи в статус status одной операцией.
+
+        Меняются только записи со статусом из from_statuses; отсутствующие
+        и записи в других статусах попадают в skipped.
+        """
+
+    @abstractmethod
+    def transition_doctor_appointments(
+        self,
+        doctor_id: int,
+        start: datetime,
+        end: datetime,
+        status: AppointmentStatus,
+        from_statuses: Iterable[AppointmentStatus],
+        updated_at: datetime
+    ) -> List[dict]:
+        """
+        Перевести в статус status записи врача с приёмом в [start, end) и статусом
+        из from_statuses одной операцией. Возвращает изменённые записи.
+        """
+
+    @abstractmethod
+    def count_appointments(self, status: Optional[AppointmentStatus] = None) -> int:
+        """Количество записей (с фильтром по статусу)"""
+
+    # ----- Результаты обследований -----
+
+    @abstractmethod
+    def query_results(
+        self,
+        patient_id: int,
+        result_type: Optional[ResultType] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        """Результаты пациента, новые сверху, начиная после ключа after"""
+
+    @abstractmethod
+    def add_result(self, result: dict) -> dict:
+        """Сохранить новый результат, назначив ему ID"""
+
+    @abstractmethod
+    def count_results(self) -> int:
+        """Количество результатов обследований"""
+
+    # ----- Услуги -----
+
+    @abstractmethod
+    def get_service(self, service_id: int) -> Optional[dict]:
+        """Услуга по ID или None"""
+
+    @abstractmethod
+    def query_services(
+        self,
+        specialization: Optional[DoctorSpecialization] = None,
+        after: Optional[Tuple[float, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        """Услуги по возрастанию цены, начиная после ключа after"""
+
+    # ----- Отзывы -----
+
+    @abstractmethod
+    def find_review(self, appointment_id: int) -> Optional[dict]:
+        """Отзыв на приём или None"""
+
+    @abstractmethod
+    def query_reviews(
+        self,
+        doctor_id: Optional[int] = None,
+        patient_id: Optional[int] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        """Отзывы по фильтрам, новые сверху, начиная после ключа after"""
+
+    @abstractmethod
+    def add_review(self, review: dict) -> dict:
+        """
+        Сохранить новый отзыв, назначив ему ID.
+
+        На приём допускается один отзыв: проверка выполняется атомарно вместе
+        с сохранением, при повторе выбрасывается DuplicateReviewError.
+        Рейтинг врача обновляется в той же операции (см. rating.py); если
+        врача нет, выбрасывается UnknownDoctorError и ничего не сохраняется.
+        """
+
+    # ----- Уведомления -----
+
+    @abstractmethod
+    def query_notifications(
+        self,
+        user_id: int,
+        unread_only: bool = False,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        """Уведомления пользователя, новые сверху, начиная после ключа after"""
+
+    @abstractmethod
+    def get_notification(self, notification_id: int) -> Optional[dict]:
+        """Уведомление по ID или None"""
+
+    @abstractmethod
+    def add_notifications(self, notifications: List[dict]) -> List[dict]:
+        """Сохранить пачку уведомлений одной операцией (ID назначаются хранилищем)"""
+
+    @abstractmethod
+    def count_unread_notifications(self, user_id: int) -> int:
+        """Количество непрочитанных уведомлений пользователя (поддерживаемый счётчик)"""
+
+    @abstractmethod
+    def mark_notifications_read(self, user_id: int, notification_ids: Optional[List[int]] = None) -> int:
+        """
+        Отметить уведомления пользователя прочитанными.
+
+        Без notification_ids отмечаются все непрочитанные. Уведомления других
+        пользователей и уже прочитанные пропускаются. Возвращает количество
+        отмеченных уведомлений; стоимость пропорциональна их числу.
+        """
+
+    # ----- Импорт и экспорт -----
+
+    @abstractmethod
+    def export_records(self, table: str, after_id: int, limit: int) -> List[dict]:
+        """Порция выгрузки: записи таблицы с ID больше after_id в порядке ID (не больше limit)"""
+
+    @abstractmethod
+    def get_records(self, table: str, ids: Iterable[int]) -> Dict[int, dict]:
+        """Записи таблицы с указанными ID одним запросом: {ID: запись} (отсутствующие ID пропускаются)"""
+
+    @abstractmethod
+    def import_records(self, table: str, records: List[dict]) -> None:
+        """
+        Сохранить порцию записей с заданными ID одной операцией (все или ни одной).
+
+        Ссылки на врачей, пациентов и приёмы хранилище не проверяет - это делает
+        импорт (transfer.Importer) через get_records. Отзывы обновляют рейтинг
+        врача так же, как add_review. Если ID уже занят, слот врача занят или на
+        приём уже оставлен отзыв, вызывается ImportConflictError.
+        """
+
+    # ----- Счётчики -----
+
+    @abstractmethod
+    def count_doctors(self) -> int:
+        """Количество врачей"""
+
+    @abstractmethod
+    def count_patients(self) -> int:
+        """Количество пациентов"""
+
+
+# ========== In-Memory ==========
+
+class InMemoryStorage(Storage):
+    """
+    Хранилище в памяти процесса.
+
+    Данные живут в словарях {id: запись}, выборки обслуживаются индексами.
+    Записи на приём, результаты и уведомления хранятся компактными записями
+    (см. records.py).
+    Подходит для демонстрации и одного воркера: состояние теряется при перезапуске
+    и не разделяется между процессами. Для нескольких воркеров uvicorn
+    используйте SQLiteStorage.
+    """
+
+    def __init__(self, seed: Dict[str, Dict[int, dict]]):
+        self.doctors = seed["doctors"]
+        self.patients = seed["patients"]
+        self.appointments = {key: AppointmentRecord(record) for key, record in seed["appointments"].items()}
+        self.results = {key: ResultRecord(record) for key, record in seed["results"].items()}
+        self.services = seed["services"]
+        self.reviews = seed["reviews"]
+        self.notifications = {key: NotificationRecord(record) for key, record in seed["notifications"].items()}
+
+        # Реестр бронирований слотов и вторичные индексы
+        self._ledger = BookingLedger()
+        self._appointment_index = AppointmentIndex()
+        self._result_index = SortedIndex("patient_id", sort_field="created_at")
+        self._inbox = InboxIndex()
+        self._service_index = SortedIndex(sort_field="price")
+        self._review_index = ReviewIndex()
+        self._review_by_appointment = UniqueIndex("appointment_id")
+        self._doctor_stats = self._build_doctor_stats()
+        self._patient_versions: Dict[int, int] = defaultdict(int)
+        self._booking_versions: Dict[int, int] = defaultdict(int)
+        self._table_versions: Dict[str, int] = defaultdict(int)
+        self.calendar = AvailabilityCalendar()
+
+        for appointment in self.appointments.values():
+            self._ledger.add(appointment)
+            self._appointment_index.add(appointment)
+        for result in self.results.values():
+            self._result_index.add(result)
+        for notification in self.notifications.values():
+            self._inbox.add(notification)
+        for service in self.services.values():
+            self._service_index.add(service)
+        for review in self.reviews.values():
+            self._review_index.add(review)
+            self._review_by_appointment.add(review)
+
+        # Генераторы ID
+        self._ids = {
+            name: IdAllocator(max(table, default=0) + 1)
+            for name, table in (
+                ("doctors", self.doctors),
+                ("patients", self.patients),
+                ("appointments", self.appointments),
+                ("results", self.results),
+                ("reviews", self.reviews),
+                ("notifications", self.notifications),
+            )
+        }
+        # Порядок ID таблиц для выгрузки
+        self._export_order = {
+            name: KeyOrder(getattr(self, name))
+            for name in ("doctors", "patients", "appointments", "results", "reviews")
+        }
+
+    def table_version(self, table: str) -> int:
+        return self._table_versions.get(table, 0)
+
+    # ----- Врачи -----
+
+    def get_doctor(self, doctor_id: int) -> Optional[dict]:
+        return self.doctors.get(doctor_id)
+
+    def list_doctors(
+        self,
+        specialization: Optional[DoctorSpecialization] = None,
+        by_rating: bool = False
+    ) -> List[dict]:
+        doctors = list(self.doctors.values())
+        if specialization:
+            doctors = [d for d in doctors if d["specialization"] == specialization]
+        if by_rating:
+            # Как в SQLite: врачи без рейтинга в конце
+            doctors.sort(key=lambda d: (d.get("rating") is None, -(d.get("rating") or 0), d["id"]))
+        return doctors
+
+    def update_doctor(self, doctor_id: int, **changes) -> dict:
+        doctor = self.doctors[doctor_id]
+        doctor.update(changes)
+        self._table_versions["doctors"] += 1
+        if changes.keys() & {"first_name", "last_name"}:
+            self._table_versions["doctor_names"] += 1
+        return doctor
+
+    def _build_doctor_stats(self) -> DoctorStatsIndex:
+        """Посчитать статистику врачей с нуля по записям и отзывам"""
+        stats = DoctorStatsIndex()
+        for appointment in self.appointments.values():
+            stats.add(appointment)
+        for review in self.reviews.values():
+            stats.add_review(review)
+        return stats
+
+    def doctor_statistics(self, doctor_id: int, now: datetime) -> dict:
+        return self._doctor_stats.get(doctor_id, now)
+
+    def check_doctor_statistics(self) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        now = datetime.now()
+        actual = self._build_doctor_stats()
+        return _diff_statistics(
+            {doctor_id: self._doctor_stats.get(doctor_id, now) for doctor_id in self._doctor_stats.doctor_ids()},
+            {doctor_id: actual.get(doctor_id, now) for doctor_id in actual.doctor_ids()}
+        )
+
+    def rebuild_doctor_statistics(self) -> None:
+        self._doctor_stats = self._build_doctor_stats()
+
+    # ----- Пациенты -----
+
+    def get_patient(self, patient_id: int) -> Optional[dict]:
+        return self.patients.get(patient_id)
+
+    def patient_version(self, patient_id: int) -> int:
+        return self._patient_versions.get(patient_id, 0)
+
+    # ----- Записи на приём -----
+
+    def get_appointment(self, appointment_id: int) -> Optional[dict]:
+        return self.appointments.get(appointment_id)
+
+    def query_appointments(
+        self,
+        patient_id: Optional[int] = None,
+        doctor_id: Optional[int] = None,
+        status: Optional[AppointmentStatus] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        appointments = self._appointment_index.query(
+            self.appointments,
+            after=after,
+            patient_id=patient_id,
+            doctor_id=doctor_id,
+            status=status
+        )
+        return list(islice(appointments, limit))
+
+    def booked_slots(self, doctor_id: int, start: datetime, end: datetime) -> Set[datetime]:
+        # Пробегаем только по записям врача в нужном интервале
+        booked = set()
+        for appointment_time, appointment_id in self._appointment_index.index("doctor_id").iter_bucket(
+            doctor_id, after=(start, 0)
+        ):
+            if appointment_time >= end:
+                break
+            if self._ledger.owner(doctor_id, appointment_time) == appointment_id:
+                booked.update(_appointment_slots(self.appointments[appointment_id]))
+        return booked
+
+    def reminder_candidates(self, after: datetime) -> List[dict]:
+        return [
+            {field: appointment[field] for field in ("id", "patient_id", "doctor_id", "appointment_time")}
+            for appointment in self._appointment_index.query(
+                self.appointments, after=(after, 0), status=AppointmentStatus.CONFIRMED
+            )
+            if appointment["reminded_at"] is None and appointment["appointment_time"] > after
+        ]
+
+    def add_reminders(self, reminders: List[Tuple[datetime, dict]]) -> List[dict]:
+        created = []
+        for appointment_time, notification in reminders:
+            appointment = self.appointments.get(notification["related_id"])
+            if (
+                appointment is None
+                or appointment["status"] != AppointmentStatus.CONFIRMED
+                or appointment["appointment_time"] != appointment_time
+                or appointment["reminded_at"] is not None
+            ):
+                continue
+            # reminded_at не входит в индексы и ответы - меняется на месте
+            appointment["reminded_at"] = notification["created_at"]
+            created.append(notification)
+        return self.add_notifications(created)
+
+    def booking_version(self, doctor_id: int) -> int:
+        return self._booking_versions.get(doctor_id, 0)
+
+    def _bookings_changed(self, before: Optional[dict], after: dict) -> None:
+        """Увеличить версию бронирований врача и поправить его календарь"""
+        released, booked = _slot_change(before, after)
+        if not released and not booked:
+            return
+        doctor_id = after["doctor_id"]
+        self._booking_versions[doctor_id] += 1
+        self.calendar.patch(doctor_id, self._booking_versions[doctor_id], booked=booked, released=released)
+
+    def add_appointment(self, appointment: dict) -> dict:
+        appointment = AppointmentRecord(appointment)
+        conflict = self._ledger.reserve(appointment, self._ids["appointments"].allocate)
+        if conflict:
+            raise SlotConflictError(conflict)
+
+        self.appointments[appointment["id"]] = appointment
+        self._appointment_index.add(appointment)
+        self._doctor_stats.add(appointment)
+        self._patient_versions[appointment["patient_id"]] += 1
+        self._bookings_changed(None, appointment)
+        return appointment
+
+    def add_appointments(self, appointments: List[dict]) -> List[dict]:
+        appointments = [AppointmentRecord(appointment) for appointment in appointments]
+        conflicts = self._ledger.reserve_many(appointments, self._ids["appointments"].allocate)
+        if conflicts:
+            raise BatchConflictError(conflicts)
+
+        for appointment in appointments:
+            self.appointments[appointment["id"]] = appointment
+            self._appointment_index.add(appointment)
+            self._doctor_stats.add(appointment)
+            self._patient_versions[appointment["patient_id"]] += 1
+            self._bookings_changed(None, appointment)
+        return appointments
+
+    def update_appointment(self, appointment_id: int, **changes) -> dict:
+        appointment = self.appointments[appointment_id]
+        new_time = changes.get("appointment_time", appointment["appointment_time"])
+        if new_time != appointment["appointment_time"]:
+            conflict = self._ledger.move(appointment, new_time)
+            if conflict:
+                raise SlotConflictError(conflict)
+
+        before = dict(appointment)
+        self._ledger.remove(appointment)
+        self._appointment_index.remove(appointment)
+        self._doctor_stats.remove(appointment)
+        appointment.update(changes)
+        self._ledger.add(appointment)
+        self._appointment_index.add(appointment)
+        self._doctor_stats.add(appointment)
+        self._patient_versions[appointment["patient_id"]] += 1
+        self._bookings_changed(before, appointment)
+        return appointment
+
+    def transition_appointments(
+        self,
+        appointment_ids: List[int],
+        status: AppointmentStatus,
+        from_statuses: Iterable[AppointmentStatus],
+        updated_at: datetime
+    ) -> StatusTransition:
+        from_statuses = set(from_statuses)
+        updated, skipped = [], {}
+        for appointment_id in dict.fromkeys(appointment_ids):
+            appointment = self.appointments.get(appointment_id)
+            if appointment is None or appointment["status"] not in from_statuses:
+                skipped[appointment_id] = appointment["status"] if appointment else None
+                continue
+            updated.append(self.update_appointment(appointment_id, status=status, updated_at=updated_at))
+        return StatusTransition(updated, skipped)
+
+    def transition_doctor_appointments(
+        self,
+        doctor_id: int,
+        start: datetime,
+        end: datetime,
+        status: AppointmentStatus,
+        from_statuses: Iterable[AppointmentStatus],
+        updated_at: datetime
+    ) -> List[dict]:
+        from_statuses = set(from_statuses)
+        # Пробегаем только по записям врача в нужном интервале
+        appointment_ids = []
+        for appointment_time, appointment_id in self._appointment_index.index("doctor_id").iter_bucket(
+            doctor_id, after=(start, 0)
+        ):
+            if appointment_time >= end:
+                break
+            if self.appointments[appointment_id]["status"] in from_statuses:
+                appointment_ids.append(appointment_id)
+        return self.transition_appointments(appointment_ids, status, from_statuses, updated_at).updated
+
+    def count_appointments(self, status: Optional[AppointmentStatus] = None) -> int:
+        if status:
+            return len(self._appointment_index.index("status").bucket(status))
+        return len(self.appointments)
+
+    # ----- Результаты обследований -----
+
+    def query_results(
+        self,
+        patient_id: int,
+        result_type: Optional[ResultType] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        results = (
+            self.results[result_id]
+            for _, result_id in self._result_index.iter_bucket(patient_id, after=after, reverse=True)
+        )
+        if result_type:
+            results = (r for r in results if r["result_type"] == result_type)
+        return list(islice(results, limit))
+
+    def add_result(self, result: dict) -> dict:
+        result = ResultRecord(result, id=self._ids["results"].allocate())
+        self.results[result["id"]] = result
+        self._result_index.add(result)
+        self._patient_versions[result["patient_id"]] += 1
+        return result
+
+    def count_results(self) -> int:
+        return len(self.results)
+
+    # ----- Услуги -----
+
+    def get_service(self, service_id: int) -> Optional[dict]:
+        return self.services.get(service_id)
+
+    def query_services(
+        self,
+        specialization: Optional[DoctorSpecialization] = None,
+        after: Optional[Tuple[float, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        services = (
+            self.services[service_id]
+            for _, service_id in self._service_index.iter_bucket(after=after)
+        )
+        if specialization:
+            services = (s for s in services if s["specialization"] == specialization)
+        return list(islice(services, limit))
+
+    # ----- Отзывы -----
+
+    def find_review(self, appointment_id: int) -> Optional[dict]:
+        review_id = self._review_by_appointment.get(appointment_id)
+        return None if review_id is None else self.reviews[review_id]
+
+    def query_reviews(
+        self,
+        doctor_id: Optional[int] = None,
+        patient_id: Optional[int] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        reviews = self._review_index.query(
+            self.reviews,
+            after=after,
+            reverse=True,
+            doctor_id=doctor_id,
+            patient_id=patient_id
+        )
+        return list(islice(reviews, limit))
+
+    def add_review(self, review: dict) -> dict:
+        doctor = self.doctors.get(review["doctor_id"])
+        if doctor is None:
+            raise UnknownDoctorError(review["doctor_id"])
+        review = dict(review)
+        conflict = self._review_by_appointment.reserve(review, self._ids["reviews"].allocate)
+        if conflict is not None:
+            raise DuplicateReviewError(conflict)
+
+        self.reviews[review["id"]] = review
+        self._review_index.add(review)
+        self._doctor_stats.add_review(review)
+        doctor.update(apply_review(doctor, review["rating"], review["created_at"]))
+        self._table_versions["doctors"] += 1
+        return review
+
+    # ----- Уведомления -----
+
+    def query_notifications(
+        self,
+        user_id: int,
+        unread_only: bool = False,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        notifications = (
+            self.notifications[notification_id]
+            for _, notification_id in self._inbox.iter_latest(user_id, unread_only=unread_only, after=after)
+        )
+        return list(islice(notifications, limit))
+
+    def get_notification(self, notification_id: int) -> Optional[dict]:
+        return self.notifications.get(notification_id)
+
+    def add_notifications(self, notifications: List[dict]) -> List[dict]:
+        created = []
+        for notification in notifications:
+            notification = NotificationRecord(notification, id=self._ids["notifications"].allocate())
+            self.notifications[notification["id"]] = notification
+            self._inbox.add(notification)
+            created.append(notification)
+        return created
+
+    def count_unread_notifications(self, user_id: int) -> int:
+        return self._inbox.unread_count(user_id)
+
+    def mark_notifications_read(self, user_id: int, notification_ids: Optional[List[int]] = None) -> int:
+        if notification_ids is None:
+            # Корзина непрочитанных снимается целиком
+            unread_ids = self._inbox.take_unread(user_id)
+            for notification_id in unread_ids:
+                self.notifications[notification_id]["is_read"] = True
+            return len(unread_ids)
+
+        marked = 0
+        for notification_id in notification_ids:
+            notification = self.notifications.get(notification_id)
+            if notification is None or notification["user_id"] != user_id or notification["is_read"]:
+                continue
+            self._inbox.mark_read(notification)
+            notification["is_read"] = True
+            marked += 1
+        return marked
+
+    # ----- Импорт и экспорт -----
+
+    def export_records(self, table: str, after_id: int, limit: int) -> List[dict]:
+        records = getattr(self, table)
+        return [records[record_id] for record_id in self._export_order[table].after(after_id, limit)]
+
+    def get_records(self, table: str, ids: Iterable[int]) -> Dict[int, dict]:
+        records = getattr(self, table)
+        return {record_id: records[record_id] for record_id in ids if record_id in records}
+
+    def import_records(self, table: str, records: List[dict]) -> None:
+        existing = getattr(self, table)
+        seen: Set[int] = set()
+        for record in records:
+            if record["id"] in existing or record["id"] in seen:
+                raise ImportConflictError(f"Запись с ID {record['id']} уже существует")
+            seen.add(record["id"])
+
+        if table == "appointments":
+            records = [AppointmentRecord(record) for record in records]
+            conflicts = self._ledger.reserve_many([
+                record for record in records if record["status"] not in CANCELLED_STATUSES
+            ])
+            if conflicts:
+                raise ImportConflictError(
+                    f"Слот врача уже занят записью {next(iter(conflicts.values()))}"
+                )
+        elif table == "results":
+            records = [ResultRecord(record) for record in records]
+        elif table == "reviews":
+            claimed: Set[int] = set()
+            for review in records:
+                appointment_id = review["appointment_id"]
+                if self._review_by_appointment.get(appointment_id) is not None or appointment_id in claimed:
+                    raise ImportConflictError(f"На приём {appointment_id} уже оставлен отзыв")
+                claimed.add(appointment_id)
+            records = [dict(record) for record in records]
+
+        # Порция принята: следующие ID выдаются после загруженных
+        self._ids[table].advance(max(seen))
+        for record in records:
+            existing[record["id"]] = record
+            if table == "appointments":
+                self._appointment_index.add(record)
+                self._doctor_stats.add(record)
+                self._patient_versions[record["patient_id"]] += 1
+                self._bookings_changed(None, record)
+            elif table == "results":
+                self._result_index.add(record)
+                self._patient_versions[record["patient_id"]] += 1
+            elif table == "reviews":
+                self._review_index.add(record)
+                self._review_by_appointment.add(record)
+                self._doctor_stats.add_review(record)
+                doctor = self.doctors[record["doctor_id"]]
+                doctor.update(apply_review(doctor, record["rating"], record["created_at"]))
+        if table == "reviews":
+            self._table_versions["doctors"] += 1
+        if table in NAME_VERSIONS:
+            # Имена новых ID могли быть закэшированы пустыми
+            self._table_versions[table] += 1
+            self._table_versions[NAME_VERSIONS[table]] += 1
+
+    # ----- Счётчики -----
+
+    def count_doctors(self) -> int:
+        return len(self.doctors)
+
+    def count_patients(self) -> int:
+        return len(self.patients)
+
+
+# ========== SQLite ==========
+
+# Схема базы: таблицы повторяют поля моделей, индексы соответствуют фильтрам эндпоинтов
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS doctors (
+    id INTEGER PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    specialization TEXT NOT NULL,
+    experience_years INTEGER NOT NULL,
+    photo_url TEXT,
+    rating REAL,
+    reviews_count INTEGER,
+    rating_sum REAL,
+    rating_weight REAL,
+    rated_at TEXT,
+    work_start TEXT,
+    work_end TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_doctors_specialization ON doctors (specialization);
+CREATE INDEX IF NOT EXISTS ix_doctors_rating ON doctors (rating DESC, id);
+
+CREATE TABLE IF NOT EXISTS patients (
+    id INTEGER PRIMARY KEY,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    email TEXT,
+    birth_date TEXT
+);
+
+CREATE TABLE IF NOT EXISTS appointments (
+    id INTEGER PRIMARY KEY,
+    patient_id INTEGER NOT NULL,
+    doctor_id INTEGER NOT NULL,
+    appointment_time TEXT NOT NULL,
+    service_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    notes TEXT,
+    diagnosis TEXT,
+    treatment TEXT,
+    recommendations TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    reminded_at TEXT,
+    duration_minutes INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_appointments_time ON appointments (appointment_time, id);
+CREATE INDEX IF NOT EXISTS ix_appointments_patient ON appointments (patient_id, appointment_time, id);
+CREATE INDEX IF NOT EXISTS ix_appointments_doctor ON appointments (doctor_id, appointment_time, id);
+CREATE INDEX IF NOT EXISTS ix_appointments_status ON appointments (status, appointment_time, id);
+-- Подтверждённые записи без отправленного напоминания (загрузка планировщика напоминаний)
+CREATE INDEX IF NOT EXISTS ix_appointments_reminders ON appointments (appointment_time, id)
+    WHERE status = 'confirmed' AND reminded_at IS NULL;
+-- Слот врача может занимать только одна неотменённая запись (гарантия базы для всех воркеров)
+CREATE UNIQUE INDEX IF NOT EXISTS ux_appointments_slot ON appointments (doctor_id, appointment_time)
+    WHERE status NOT IN ('cancelled_by_patient', 'cancelled_by_clinic');
+
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    patient_id INTEGER NOT NULL,
+    doctor_id INTEGER NOT NULL,
+    result_type TEXT NOT NULL,
+    title TEXT NOT NULL,
+    description TEXT,
+    file_url TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_results_patient ON results (patient_id, created_at, id);
+
+CREATE TABLE IF NOT EXISTS services (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT,
+    price REAL NOT NULL,
+    duration_minutes INTEGER NOT NULL,
+    specialization TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_services_price ON services (price, id);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    id INTEGER PRIMARY KEY,
+    patient_id INTEGER NOT NULL,
+    doctor_id INTEGER NOT NULL,
+    appointment_id INTEGER NOT NULL,
+    rating INTEGER NOT NULL,
+    comment TEXT,
+    created_at TEXT NOT NULL
+);
+-- На приём допускается один отзыв (гарантия базы для всех воркеров)
+DROP INDEX IF EXISTS ix_reviews_appointment;
+CREATE UNIQUE INDEX IF NOT EXISTS ux_reviews_appointment ON reviews (appointment_id);
+DROP INDEX IF EXISTS ix_reviews_doctor;
+CREATE INDEX IF NOT EXISTS ix_reviews_doctor_created ON reviews (doctor_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_reviews_patient_created ON reviews (patient_id, created_at, id);
+
+CREATE TABLE IF NOT EXISTS notifications (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    notification_type TEXT NOT NULL,
+    title TEXT NOT NULL,
+    message TEXT NOT NULL,
+    is_read INTEGER NOT NULL DEFAULT 0,
+    related_id INTEGER,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_notifications_user ON notifications (user_id, created_at, id);
+CREATE INDEX IF NOT EXISTS ix_notifications_unread ON notifications (user_id, created_at, id) WHERE is_read = 0;
+
+-- Счётчики непрочитанных уведомлений пользователей, поддерживаемые триггерами
+CREATE TABLE IF NOT EXISTS notification_unread (
+    user_id INTEGER PRIMARY KEY,
+    unread INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS tr_notifications_unread_insert AFTER INSERT ON notifications
+WHEN NEW.is_read = 0
+BEGIN
+    INSERT INTO notification_unread (user_id, unread) VALUES (NEW.user_id, 1)
+        ON CONFLICT (user_id) DO UPDATE SET unread = unread + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_notifications_unread_update AFTER UPDATE OF is_read ON notifications
+WHEN OLD.is_read != NEW.is_read
+BEGIN
+    INSERT INTO notification_unread (user_id, unread) VALUES (NEW.user_id, CASE WHEN NEW.is_read = 0 THEN 1 ELSE 0 END)
+        ON CONFLICT (user_id) DO UPDATE SET unread = unread + CASE WHEN NEW.is_read = 0 THEN 1 ELSE -1 END;
+END;
+
+-- Счётчики статистики врачей, поддерживаемые триггерами при каждой записи
+CREATE TABLE IF NOT EXISTS doctor_stats (
+    doctor_id INTEGER PRIMARY KEY,
+    total_appointments INTEGER NOT NULL DEFAULT 0,
+    completed_appointments INTEGER NOT NULL DEFAULT 0,
+    cancelled_appointments INTEGER NOT NULL DEFAULT 0,
+    patients_served INTEGER NOT NULL DEFAULT 0,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    rating_count INTEGER NOT NULL DEFAULT 0
+);
+
+-- Количество записей пациента к врачу (для подсчёта уникальных пациентов)
+CREATE TABLE IF NOT EXISTS doctor_patients (
+    doctor_id INTEGER NOT NULL,
+    patient_id INTEGER NOT NULL,
+    appointments INTEGER NOT NULL,
+    PRIMARY KEY (doctor_id, patient_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS tr_appointments_stats_insert AFTER INSERT ON appointments
+BEGIN
+    INSERT OR IGNORE INTO doctor_stats (doctor_id) VALUES (NEW.doctor_id);
+    UPDATE doctor_stats SET
+        total_appointments = total_appointments + 1,
+        completed_appointments = completed_appointments + (NEW.status = 'completed'),
+        cancelled_appointments = cancelled_appointments
+            + (NEW.status IN ('cancelled_by_patient', 'cancelled_by_clinic')),
+        patients_served = patients_served + NOT EXISTS (
+            SELECT 1 FROM doctor_patients WHERE doctor_id = NEW.doctor_id AND patient_id = NEW.patient_id
+        )
+    WHERE doctor_id = NEW.doctor_id;
+    INSERT INTO doctor_patients (doctor_id, patient_id, appointments) VALUES (NEW.doctor_id, NEW.patient_id, 1)
+        ON CONFLICT (doctor_id, patient_id) DO UPDATE SET appointments = appointments + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_appointments_stats_status AFTER UPDATE OF status ON appointments
+WHEN OLD.status <> NEW.status
+BEGIN
+    UPDATE doctor_stats SET
+        completed_appointments = completed_appointments
+            + (NEW.status = 'completed') - (OLD.status = 'completed'),
+        cancelled_appointments = cancelled_appointments
+            + (NEW.status IN ('cancelled_by_patient', 'cancelled_by_clinic'))
+            - (OLD.status IN ('cancelled_by_patient', 'cancelled_by_clinic'))
+    WHERE doctor_id = NEW.doctor_id;
+END;
+
+-- Версии данных пациентов для инвалидации кэша истории (общие для всех воркеров)
+CREATE TABLE IF NOT EXISTS patient_versions (
+    patient_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS tr_appointments_version_insert AFTER INSERT ON appointments
+BEGIN
+    INSERT INTO patient_versions (patient_id, version) VALUES (NEW.patient_id, 1)
+        ON CONFLICT (patient_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_appointments_version_update AFTER UPDATE ON appointments
+BEGIN
+    INSERT INTO patient_versions (patient_id, version) VALUES (NEW.patient_id, 1)
+        ON CONFLICT (patient_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_results_version_insert AFTER INSERT ON results
+BEGIN
+    INSERT INTO patient_versions (patient_id, version) VALUES (NEW.patient_id, 1)
+        ON CONFLICT (patient_id) DO UPDATE SET version = version + 1;
+END;
+
+-- Версии таблиц-справочников (например, врачей) для снимков в памяти воркеров
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS tr_doctors_version_insert AFTER INSERT ON doctors
+BEGIN
+    INSERT INTO table_versions (name, version) VALUES ('doctors', 1)
+        ON CONFLICT (name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_doctors_version_update AFTER UPDATE ON doctors
+BEGIN
+    INSERT INTO table_versions (name, version) VALUES ('doctors', 1)
+        ON CONFLICT (name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_patients_version_insert AFTER INSERT ON patients
+BEGIN
+    INSERT INTO table_versions (name, version) VALUES ('patients', 1)
+        ON CONFLICT (name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_patients_version_update AFTER UPDATE ON patients
+BEGIN
+    INSERT INTO table_versions (name, version) VALUES ('patients', 1)
+        ON CONFLICT (name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_doctors_names_version AFTER UPDATE OF first_name, last_name ON doctors
+BEGIN
+    INSERT INTO table_versions (name, version) VALUES ('doctor_names', 1)
+        ON CONFLICT (name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_patients_names_version AFTER UPDATE OF first_name, last_name ON patients
+BEGIN
+    INSERT INTO table_versions (name, version) VALUES ('patient_names', 1)
+        ON CONFLICT (name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_services_version_insert AFTER INSERT ON services
+BEGIN
+    INSERT INTO table_versions (name, version) VALUES ('services', 1)
+        ON CONFLICT (name) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_services_version_update AFTER UPDATE ON services
+BEGIN
+    INSERT INTO table_versions (name, version) VALUES ('services', 1)
+        ON CONFLICT (name) DO UPDATE SET version = version + 1;
+END;
+
+-- Версии бронирований врачей для календаря доступности (общие для всех воркеров)
+CREATE TABLE IF NOT EXISTS booking_versions (
+    doctor_id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+
+CREATE TRIGGER IF NOT EXISTS tr_appointments_booking_insert AFTER INSERT ON appointments
+WHEN NEW.status NOT IN ('cancelled_by_patient', 'cancelled_by_clinic')
+BEGIN
+    INSERT INTO booking_versions (doctor_id, version) VALUES (NEW.doctor_id, 1)
+        ON CONFLICT (doctor_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_appointments_booking_update AFTER UPDATE OF appointment_time, status ON appointments
+WHEN OLD.appointment_time <> NEW.appointment_time
+    OR (OLD.status IN ('cancelled_by_patient', 'cancelled_by_clinic'))
+        <> (NEW.status IN ('cancelled_by_patient', 'cancelled_by_clinic'))
+BEGIN
+    INSERT INTO booking_versions (doctor_id, version) VALUES (NEW.doctor_id, 1)
+        ON CONFLICT (doctor_id) DO UPDATE SET version = version + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS tr_reviews_stats_insert AFTER INSERT ON reviews
+BEGIN
+    INSERT OR IGNORE INTO doctor_stats (doctor_id) VALUES (NEW.doctor_id);
+    UPDATE doctor_stats SET rating_sum = rating_sum + NEW.rating, rating_count = rating_count + 1
+    WHERE doctor_id = NEW.doctor_id;
+END;
+"""
+
+# Столбцы, добавленные после первой версии схемы: в старых базах создаются при запуске
+SQLITE_ADDED_COLUMNS = {
+    "appointments": {
+        "reminded_at": "TEXT",
+        "duration_minutes": "INTEGER",
+    },
+    "doctors": {
+        "rating_sum": "REAL",
+        "rating_weight": "REAL",
+        "rated_at": "TEXT",
+        "work_start": "TEXT",
+        "work_end": "TEXT",
+    },
+}
+
+# Сколько параметров передавать в одном запросе вида id IN (...)
+SQLITE_BATCH_SIZE = 500
+
+# Столбцы, удалённые из схемы: в базах старых версий они удаляются при открытии
+SQLITE_DROPPED_COLUMNS = {
+    "appointments": ("patient_name", "doctor_name"),
+    "results": ("doctor_name",),
+    "reviews": ("patient_name",),
+}
+
+# Поля, которые хранятся в SQLite как текст и восстанавливаются при чтении
+DATETIME_FIELDS = {"appointment_time", "created_at", "updated_at", "rated_at", "reminded_at"}
+ENUM_FIELDS = {
+    "status": AppointmentStatus,
+    "specialization": DoctorSpecialization,
+    "result_type": ResultType,
+    "notification_type": NotificationType,
+}
+
+# Условие "запись занимает слот" в SQL
+ACTIVE_SLOT_SQL = "status NOT IN ({})".format(
+    ", ".join(f"'{s.value}'" for s in CANCELLED_STATUSES)
+)
+
+# Условие "запись предстоит" в SQL
+UPCOMING_SQL = "status IN ({})".format(
+    ", ".join(f"'{s.value}'" for s in UPCOMING_STATUSES)
+)
+
+# Статистика врачей, пересчитанная по исходным данным (для сверки и перестроения счётчиков)
+DOCTOR_APPOINTMENT_STATS_SQL = f"""
+SELECT
+    doctor_id,
+    COUNT(*) AS total_appointments,
+    SUM(status = 'completed') AS completed_appointments,
+    SUM(NOT {ACTIVE_SLOT_SQL}) AS cancelled_appointments,
+    COUNT(DISTINCT patient_id) AS patients_served
+FROM appointments
+GROUP BY doctor_id
+"""
+DOCTOR_RATING_STATS_SQL = """
+SELECT doctor_id, SUM(rating) AS rating_sum, COUNT(*) AS rating_count
+FROM reviews
+GROUP BY doctor_id
+"""
+
+
+def _to_sql(value):
+    """Значение поля -> значение для SQLite"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def _from_row(row: sqlite3.Row) -> dict:
+    """Строка SQLite -> словарь записи"""
+    record = dict(row)
+    for field, value in record.items():
+        if value is None:
+            continue
+        if field in DATETIME_FIELDS:
+            record[field] = datetime.fromisoformat(value)
+        elif field in ENUM_FIELDS:
+            record[field] = ENUM_FIELDS[field](value)
+        elif field == "is_read":
+            record[field] = bool(value)
+    return record
+
+
+def _import_conflict_detail(table: str, message: str) -> str:
+    """Описание нарушения уникальности при импорте"""
+    if message.endswith(f"{table}.id"):
+        return "Запись с таким ID уже существует"
+    if table == "appointments":
+        return "Слот врача уже занят другой записью"
+    if table == "reviews":
+        return "На приём уже оставлен отзыв"
+    return f"Конфликт с данными базы: {message}"
+
+
+class SQLiteStorage(Storage):
+    """
+    Сессия хранилища SQLite поверх одного соединения.
+
+    База открывается в режиме WAL: читатели не блокируют писателя, и несколько
+    воркеров uvicorn работают с одним файлом. Запросы параметризованы и
+    переиспользуются из кэша подготовленных выражений соединения. Запись
+    выполняется в транзакциях BEGIN IMMEDIATE, поэтому проверка слота и
+    бронирование атомарны и между процессами.
+
+    Сессия не потокобезопасна: в каждый момент ей пользуется один запрос
+    (см. пул соединений в database.py). Календарь доступности общий для всех
+    сессий процесса и сверяется с версиями бронирований в базе.
+    """
+
+    blocking = True
+
+    def __init__(self, conn: sqlite3.Connection, calendar: Optional[AvailabilityCalendar] = None):
+        self._conn = conn
+        self.calendar = calendar or AvailabilityCalendar()
+
+    @classmethod
+    def connect(cls, path: str, calendar: Optional[AvailabilityCalendar] = None) -> "SQLiteStorage":
+        """Открыть новое соединение с базой"""
+        conn = sqlite3.connect(
+            path,
+            isolation_level=None,  # транзакции управляются вручную
+            check_same_thread=False,  # соединение переходит между потоками пула
+            cached_statements=256
+        )
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return cls(conn, calendar)
+
+    @classmethod
+    def initialize(cls, path: str, seed: Optional[Dict[str, Dict[int, dict]]] = None) -> None:
+        """Создать схему базы и заполнить пустую базу тестовыми данными"""
+        storage = cls.connect(path)
+        try:
+            storage._add_missing_columns()
+            storage._drop_obsolete_columns()
+            storage._conn.executescript(SQLITE_SCHEMA)
+            if seed:
+                storage._seed(seed)
+            # База могла быть создана до появления счётчиков статистики
+            if storage.check_doctor_statistics():
+                storage.rebuild_doctor_statistics()
+            storage._rebuild_unread_counters()
+        finally:
+            storage.close()
+
+    def close(self) -> None:
+        """Закрыть соединение"""
+        self._conn.close()
+
+    def _add_missing_columns(self) -> None:
+        """Добавить в таблицы существующей базы столбцы из SQLITE_ADDED_COLUMNS"""
+        for table, columns in SQLITE_ADDED_COLUMNS.items():
+            existing = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            if not existing:
+                continue  # таблицы ещё нет - её создаст схема
+            for column, column_type in columns.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    def _drop_obsolete_columns(self) -> None:
+        """Удалить из таблиц существующей базы столбцы из SQLITE_DROPPED_COLUMNS"""
+        for table, columns in SQLITE_DROPPED_COLUMNS.items():
+            existing = {row["name"] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+            for column in columns:
+                if column in existing:
+                    self._conn.execute(f"ALTER TABLE {table} DROP COLUMN {column}")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Транзакция записи: все изменения внутри фиксируются одним COMMIT"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield self._conn
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _fetch_all(self, sql: str, params: tuple = ()) -> List[dict]:
+        return [_from_row(row) for row in self._conn.execute(sql, params)]
+
+    def _fetch_one(self, sql: str, params: tuple = ()) -> Optional[dict]:
+        row = self._conn.execute(sql, params).fetchone()
+        return _from_row(row) if row else None
+
+    def _scalar(self, sql: str, params: tuple = ()):
+        return self._conn.execute(sql, params).fetchone()[0]
+
+    def _insert(self, conn: sqlite3.Connection, table: str, record: dict) -> int:
+        fields = [f for f in record if f != "id" or record[f] is not None]
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(
+            table, ", ".join(fields), ", ".join("?" * len(fields))
+        )
+        return conn.execute(sql, [_to_sql(record[f]) for f in fields]).lastrowid
+
+    def _update(self, conn: sqlite3.Connection, table: str, record_id: int, changes: dict) -> None:
+        sql = "UPDATE {} SET {} WHERE id = ?".format(
+            table, ", ".join(f"{field} = ?" for field in changes)
+        )
+        conn.execute(sql, [_to_sql(v) for v in changes.values()] + [record_id])
+
+    def _seed(self, seed: Dict[str, Dict[int, dict]]) -> None:
+        """Заполнить пустую базу тестовыми данными одной транзакцией"""
+        with self._transaction() as conn:
+            if conn.execute("SELECT COUNT(*) FROM doctors").fetchone()[0]:
+                return
+            for table, records in seed.items():
+                for record in records.values():
+                    self._insert(conn, table, record)
+
+    def table_version(self, table: str) -> int:
+        row = self._conn.execute("SELECT version FROM table_versions WHERE name = ?", (table,)).fetchone()
+        return row[0] if row else 0
+
+    # ----- Врачи -----
+
+    def get_doctor(self, doctor_id: int) -> Optional[dict]:
+        return self._fetch_one("SELECT * FROM doctors WHERE id = ?", (doctor_id,))
+
+    def list_doctors(
+        self,
+        specialization: Optional[DoctorSpecialization] = None,
+        by_rating: bool = False
+    ) -> List[dict]:
+        order = "rating DESC, id" if by_rating else "id"
+        if specialization:
+            return self._fetch_all(
+                f"SELECT * FROM doctors WHERE specialization = ? ORDER BY {order}", (specialization.value,)
+            )
+        return self._fetch_all(f"SELECT * FROM doctors ORDER BY {order}")
+
+    def update_doctor(self, doctor_id: int, **changes) -> dict:
+        with self._transaction() as conn:
+            self._update(conn, "doctors", doctor_id, changes)
+        return self.get_doctor(doctor_id)
+
+
+    def doctor_statistics(self, doctor_id: int, now: datetime) -> dict:
+        row = self._conn.execute("SELECT * FROM doctor_stats WHERE doctor_id = ?", (doctor_id,)).fetchone()
+        stats = {field: row[field] if row else 0 for field in DOCTOR_COUNTER_FIELDS}
+        # Предстоящие записи зависят от текущего времени: считаем по индексу врача
+        stats["upcoming_appointments"] = self._scalar(
+            f"SELECT COUNT(*) FROM appointments WHERE doctor_id = ? AND appointment_time > ? AND {UPCOMING_SQL}",
+            (doctor_id, now.isoformat())
+        )
+        return stats
+
+    def _actual_doctor_statistics(self, conn: sqlite3.Connection) -> Dict[int, dict]:
+        """Статистика врачей, пересчитанная по записям и отзывам"""
+        actual: Dict[int, dict] = {}
+        for sql in (DOCTOR_APPOINTMENT_STATS_SQL, DOCTOR_RATING_STATS_SQL):
+            for row in conn.execute(sql):
+                actual.setdefault(row["doctor_id"], dict.fromkeys(DOCTOR_COUNTER_FIELDS, 0)).update(
+                    (field, row[field]) for field in row.keys() if field != "doctor_id"
+                )
+        return actual
+
+    def check_doctor_statistics(self) -> Dict[int, Dict[str, Dict[str, Any]]]:
+        # Читаем счётчики и исходные данные в одной транзакции, чтобы сравнивать один снимок
+        with self._transaction() as conn:
+            stored = {
+                row["doctor_id"]: {field: row[field] for field in DOCTOR_COUNTER_FIELDS}
+                for row in conn.execute("SELECT * FROM doctor_stats")
+            }
+            actual = self._actual_doctor_statistics(conn)
+        return _diff_statistics(stored, actual)
+
+    def rebuild_doctor_statistics(self) -> None:
+        with self._transaction() as conn:
+            actual = self._actual_doctor_statistics(conn)
+            conn.execute("DELETE FROM doctor_stats")
+            conn.execute("DELETE FROM doctor_patients")
+            conn.executemany(
+                "INSERT INTO doctor_stats (doctor_id, {}) VALUES (?, {})".format(
+                    ", ".join(DOCTOR_COUNTER_FIELDS), ", ".join("?" * len(DOCTOR_COUNTER_FIELDS))
+                ),
+                [
+                    [doctor_id] + [stats[field] for field in DOCTOR_COUNTER_FIELDS]
+                    for doctor_id, stats in actual.items()
+                ]
+            )
+            conn.execute(
+                "INSERT INTO doctor_patients (doctor_id, patient_id, appointments) "
+                "SELECT doctor_id, patient_id, COUNT(*) FROM appointments GROUP BY doctor_id, patient_id"
+            )
+
+    # ----- Пациенты -----
+
+    def get_patient(self, patient_id: int) -> Optional[dict]:
+        return self._fetch_one("SELECT * FROM patients WHERE id = ?", (patient_id,))
+
+    def patient_version(self, patient_id: int) -> int:
+        row = self._conn.execute(
+            "SELECT version FROM patient_versions WHERE patient_id = ?", (patient_id,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    # ----- Записи на приём -----
+
+    def get_appointment(self, appointment_id: int) -> Optional[dict]:
+        return self._fetch_one("SELECT * FROM appointments WHERE id = ?", (appointment_id,))
+
+    def query_appointments(
+        self,
+        patient_id: Optional[int] = None,
+        doctor_id: Optional[int] = None,
+        status: Optional[AppointmentStatus] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        conditions, params = [], []
+        for field, value in (("patient_id", patient_id), ("doctor_id", doctor_id), ("status", status)):
+            if value is not None:
+                conditions.append(f"{field} = ?")
+                params.append(_to_sql(value))
+        if after:
+            conditions.append("(appointment_time, id) > (?, ?)")
+            params.extend(_to_sql(v) for v in after)
+
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        params.append(-1 if limit is None else limit)
+        return self._fetch_all(
+            f"SELECT * FROM appointments {where} ORDER BY appointment_time, id LIMIT ?",
+            tuple(params)
+        )
+
+    def booked_slots(self, doctor_id: int, start: datetime, end: datetime) -> Set[datetime]:
+        rows = self._conn.execute(
+            "SELECT appointment_time, duration_minutes FROM appointments "
+            f"WHERE doctor_id = ? AND appointment_time >= ? AND appointment_time < ? AND {ACTIVE_SLOT_SQL}",
+            (doctor_id, start.isoformat(), end.isoformat())
+        ).fetchall()
+        booked = set()
+        for appointment_time, duration_minutes in rows:
+            booked.update(occupied_slots(datetime.fromisoformat(appointment_time), duration_minutes))
+        return booked
+
+    def reminder_candidates(self, after: datetime) -> List[dict]:
+        # Частичный индекс ix_appointments_reminders
+        return self._fetch_all(
+            "SELECT id, patient_id, doctor_id, appointment_time FROM appointments "
+            "WHERE status = 'confirmed' AND reminded_at IS NULL AND appointment_time > ? "
+            "ORDER BY appointment_time, id",
+            (after.isoformat(),)
+        )
+
+    def add_reminders(self, reminders: List[Tuple[datetime, dict]]) -> List[dict]:
+        created = []
+        with self._transaction() as conn:
+            for appointment_time, notification in reminders:
+                claimed = conn.execute(
+                    "UPDATE appointments SET reminded_at = ? "
+                    "WHERE id = ? AND status = 'confirmed' AND appointment_time = ? AND reminded_at IS NULL",
+                    (_to_sql(notification["created_at"]), notification["related_id"], appointment_time.isoformat())
+                ).rowcount
+                if claimed:
+                    created.append(dict(notification, id=self._insert(conn, "notifications", notification)))
+        return created
+
+    def _slot_owner(self, conn: sqlite3.Connection, appointment: dict) -> Optional[int]:
+        """Другая неотменённая запись врача, занимающая слоты записи appointment, или None"""
+        slots = occupied_slots(appointment["appointment_time"], appointment.get("duration_minutes"))
+        start, end = slots[0], slots[-1] + timedelta(minutes=SLOT_MINUTES)
+        params = (appointment["doctor_id"], appointment.get("id") or 0)
+        # Записи врача не пересекаются, поэтому достаточно проверить записи,
+        # начинающиеся внутри интервала, и последнюю запись, начавшуюся раньше него
+        row = conn.execute(
+            "SELECT id FROM appointments WHERE doctor_id = ? AND id != ? "
+            f"AND appointment_time >= ? AND appointment_time < ? AND {ACTIVE_SLOT_SQL} "
+            "ORDER BY appointment_time LIMIT 1",
+            (*params, start.isoformat(), end.isoformat())
+        ).fetchone()
+        if row:
+            return row[0]
+        row = conn.execute(
+            "SELECT id, appointment_time, duration_minutes FROM appointments WHERE doctor_id = ? AND id != ? "
+            f"AND appointment_time < ? AND {ACTIVE_SLOT_SQL} "
+            "ORDER BY appointment_time DESC LIMIT 1",
+            (*params, start.isoformat())
+        ).fetchone()
+        if row and occupied_slots(datetime.fromisoformat(row[1]), row[2])[-1] >= start:
+            return row[0]
+        return None
+
+    @contextmanager
+    def _slot_guard(self, conn: sqlite3.Connection, appointment: Optional[dict]) -> Iterator[None]:
+        """Превратить нарушение уникальности слота в SlotConflictError"""
+        try:
+            yield
+        except sqlite3.IntegrityError:
+            conflict = None if appointment is None else self._slot_owner(conn, appointment)
+            if conflict is None:
+                raise
+            raise SlotConflictError(conflict)
+
+    def booking_version(self, doctor_id: int) -> int:
+        return self._booking_version(self._conn, doctor_id)
+
+    def _booking_version(self, conn: sqlite3.Connection, doctor_id: int) -> int:
+        row = conn.execute("SELECT version FROM booking_versions WHERE doctor_id = ?", (doctor_id,)).fetchone()
+        return row[0] if row else 0
+
+    def add_appointment(self, appointment: dict) -> dict:
+        doctor_id = appointment["doctor_id"]
+        _, booked = _slot_change(None, appointment)
+        with self._transaction() as conn:
+            conflict = self._slot_owner(conn, appointment)
+            if conflict:
+                raise SlotConflictError(conflict)
+            with self._slot_guard(conn, appointment):
+                appointment_id = self._insert(conn, "appointments", appointment)
+            version = self._booking_version(conn, doctor_id)
+        # Календарь правится после фиксации транзакции
+        if booked:
+            self.calendar.patch(doctor_id, version, booked=booked)
+        return dict(appointment, id=appointment_id)
+
+    def add_appointments(self, appointments: List[dict]) -> List[dict]:
+        created = []
+        with self._transaction() as conn:
+            conflicts = {}
+            for index, appointment in enumerate(appointments):
+                owner = self._slot_owner(conn, appointment)
+                if owner:
+                    conflicts[index] = owner
+            if conflicts:
+                raise BatchConflictError(conflicts)
+            for appointment in appointments:
+                with self._slot_guard(conn, appointment):
+                    created.append(dict(appointment, id=self._insert(conn, "appointments", appointment)))
+            versions = self._booking_versions(conn, created)
+        self._patch_calendar(versions, [(None, appointment) for appointment in created])
+        return created
+
+    def _booking_versions(self, conn: sqlite3.Connection, appointments: List[dict]) -> Dict[int, int]:
+        return {
+            doctor_id: self._booking_version(conn, doctor_id)
+            for doctor_id in {appointment["doctor_id"] for appointment in appointments}
+        }
+
+    def _patch_calendar(self, versions: Dict[int, int], changes: List[Tuple[Optional[dict], dict]]) -> None:
+        """
+        Поправить календарь после транзакции с несколькими изменениями записей (до, после).
+
+        versions - версии бронирований врачей после транзакции; каждое изменение
+        слота увеличило версию своего врача на 1, поэтому календарь правится по шагам.
+        """
+        steps: Dict[int, List[Tuple[List[datetime], List[datetime]]]] = defaultdict(list)
+        for before, after in changes:
+            released, booked = _slot_change(before, after)
+            if released or booked:
+                steps[after["doctor_id"]].append((booked, released))
+        for doctor_id, doctor_steps in steps.items():
+            version = versions[doctor_id] - len(doctor_steps)
+            for booked, released in doctor_steps:
+                version += 1
+                self.calendar.patch(doctor_id, version, booked=booked, released=released)
+
+    def update_appointment(self, appointment_id: int, **changes) -> dict:
+        with self._transaction() as conn:
+            before = _from_row(
+                conn.execute("SELECT * FROM appointments WHERE id = ?", (appointment_id,)).fetchone()
+            )
+            doctor_id = before["doctor_id"]
+            moved = dict(before, **changes) if "appointment_time" in changes else None
+            if moved is not None:
+                conflict = self._slot_owner(conn, moved)
+                if conflict:
+                    raise SlotConflictError(conflict)
+            with self._slot_guard(conn, moved):
+                self._update(conn, "appointments", appointment_id, changes)
+            version = self._booking_version(conn, doctor_id)
+        released, booked = _slot_change(before, dict(before, **changes))
+        if released or booked:
+            self.calendar.patch(doctor_id, version, booked=booked, released=released)
+        return self.get_appointment(appointment_id)
+
+    def transition_appointments(
+        self,
+        appointment_ids: List[int],
+        status: AppointmentStatus,
+        from_statuses: Iterable[AppointmentStatus],
+        updated_at: datetime
+    ) -> StatusTransition:
+        from_statuses = set(from_statuses)
+        appointment_ids = list(dict.fromkeys(appointment_ids))
+        with self._transaction() as conn:
+            found = {}
+            for i in range(0, len(appointment_ids), SQLITE_BATCH_SIZE):
+                chunk = appointment_ids[i:i + SQLITE_BATCH_SIZE]
+                rows = conn.execute(
+                    f"SELECT * FROM appointments WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                )
+                found.update((row["id"], _from_row(row)) for row in rows)
+            selected, skipped = [], {}
+            for appointment_id in appointment_ids:
+                appointment = found.get(appointment_id)
+                if appointment is None or appointment["status"] not in from_statuses:
+                    skipped[appointment_id] = appointment["status"] if appointment else None
+                else:
+                    selected.append(appointment)
+            updated, versions = self._set_status(conn, selected, status, updated_at)
+        self._patch_calendar(versions, list(zip(selected, updated)))
+        return StatusTransition(updated, skipped)
+
+    def transition_doctor_appointments(
+        self,
+        doctor_id: int,
+        start: datetime,
+        end: datetime,
+        status: AppointmentStatus,
+        from_statuses: Iterable[AppointmentStatus],
+        updated_at: datetime
+    ) -> List[dict]:
+        from_statuses = [_to_sql(s) for s in from_statuses]
+        with self._transaction() as conn:
+            # Индекс ix_appointments_doctor
+            selected = [_from_row(row) for row in conn.execute(
+                "SELECT * FROM appointments "
+                "WHERE doctor_id = ? AND appointment_time >= ? AND appointment_time < ? "
+                f"AND status IN ({', '.join('?' * len(from_statuses))}) "
+                "ORDER BY appointment_time, id",
+                (doctor_id, start.isoformat(), end.isoformat(), *from_statuses)
+            )]
+            updated, versions = self._set_status(conn, selected, status, updated_at)
+        self._patch_calendar(versions, list(zip(selected, updated)))
+        return updated
+
+    def _set_status(
+        self,
+        conn: sqlite3.Connection,
+        appointments: List[dict],
+        status: AppointmentStatus,
+        updated_at: datetime
+    ) -> Tuple[List[dict], Dict[int, int]]:
+        """Сменить статус записей в открытой транзакции; возвращает записи и версии бронирований врачей"""
+        ids = [appointment["id"] for appointment in appointments]
+        for i in range(0, len(ids), SQLITE_BATCH_SIZE):
+            chunk = ids[i:i + SQLITE_BATCH_SIZE]
+            conn.execute(
+                f"UPDATE appointments SET status = ?, updated_at = ? WHERE id IN ({', '.join('?' * len(chunk))})",
+                (status.value, updated_at.isoformat(), *chunk)
+            )
+        updated = [dict(appointment, status=status, updated_at=updated_at) for appointment in appointments]
+        return updated, self._booking_versions(conn, updated)
+
+    def count_appointments(self, status: Optional[AppointmentStatus] = None) -> int:
+        if status:
+            return self._scalar("SELECT COUNT(*) FROM appointments WHERE status = ?", (status.value,))
+        return self._scalar("SELECT COUNT(*) FROM appointments")
+
+    # ----- Результаты обследований -----
+
+    def query_results(
+        self,
+        patient_id: int,
+        result_type: Optional[ResultType] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        conditions, params = ["patient_id = ?"], [patient_id]
+        if result_type:
+            conditions.append("result_type = ?")
+            params.append(result_type.value)
+        if after:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(_to_sql(v) for v in after)
+        params.append(-1 if limit is None else limit)
+        return self._fetch_all(
+            "SELECT * FROM results WHERE {} ORDER BY created_at DESC, id DESC LIMIT ?".format(
+                " AND ".join(conditions)
+            ),
+            tuple(params)
+        )
+
+    def add_result(self, result: dict) -> dict:
+        with self._transaction() as conn:
+            result_id = self._insert(conn, "results", result)
+        return dict(result, id=result_id)
+
+    def count_results(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM results")
+
+    # ----- Услуги -----
+
+    def get_service(self, service_id: int) -> Optional[dict]:
+        return self._fetch_one("SELECT * FROM services WHERE id = ?", (service_id,))
+
+    def query_services(
+        self,
+        specialization: Optional[DoctorSpecialization] = None,
+        after: Optional[Tuple[float, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        conditions, params = [], []
+        if specialization:
+            conditions.append("specialization = ?")
+            params.append(specialization.value)
+        if after:
+            conditions.append("(price, id) > (?, ?)")
+            params.extend(after)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        params.append(-1 if limit is None else limit)
+        return self._fetch_all(
+            f"SELECT * FROM services {where} ORDER BY price, id LIMIT ?", tuple(params)
+        )
+
+    # ----- Отзывы -----
+
+    def find_review(self, appointment_id: int) -> Optional[dict]:
+        return self._fetch_one("SELECT * FROM reviews WHERE appointment_id = ?", (appointment_id,))
+
+    def query_reviews(
+        self,
+        doctor_id: Optional[int] = None,
+        patient_id: Optional[int] = None,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        conditions, params = [], []
+        for field, value in (("doctor_id", doctor_id), ("patient_id", patient_id)):
+            if value is not None:
+                conditions.append(f"{field} = ?")
+                params.append(value)
+        if after:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(_to_sql(v) for v in after)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        params.append(-1 if limit is None else limit)
+        return self._fetch_all(
+            f"SELECT * FROM reviews {where} ORDER BY created_at DESC, id DESC LIMIT ?", tuple(params)
+        )
+
+    def add_review(self, review: dict) -> dict:
+        with self._transaction() as conn:
+            existing = conn.execute(
+                "SELECT id FROM reviews WHERE appointment_id = ?", (review["appointment_id"],)
+            ).fetchone()
+            if existing:
+                raise DuplicateReviewError(existing[0])
+            row = conn.execute("SELECT * FROM doctors WHERE id = ?", (review["doctor_id"],)).fetchone()
+            if row is None:
+                raise UnknownDoctorError(review["doctor_id"])
+            doctor = _from_row(row)
+            review_id = self._insert(conn, "reviews", review)
+            self._update(
+                conn, "doctors", doctor["id"], apply_review(doctor, review["rating"], review["created_at"])
+            )
+        return dict(review, id=review_id)
+
+    # ----- Уведомления -----
+
+    def query_notifications(
+        self,
+        user_id: int,
+        unread_only: bool = False,
+        after: Optional[Tuple[datetime, int]] = None,
+        limit: Optional[int] = None
+    ) -> List[dict]:
+        conditions, params = ["user_id = ?"], [user_id]
+        if unread_only:
+            conditions.append("is_read = 0")
+        if after:
+            conditions.append("(created_at, id) < (?, ?)")
+            params.extend(_to_sql(v) for v in after)
+        params.append(-1 if limit is None else limit)
+        return self._fetch_all(
+            "SELECT * FROM notifications WHERE {} ORDER BY created_at DESC, id DESC LIMIT ?".format(
+                " AND ".join(conditions)
+            ),
+            tuple(params)
+        )
+
+    def get_notification(self, notification_id: int) -> Optional[dict]:
+        return self._fetch_one("SELECT * FROM notifications WHERE id = ?", (notification_id,))
+
+    def add_notifications(self, notifications: List[dict]) -> List[dict]:
+        with self._transaction() as conn:
+            return [
+                dict(notification, id=self._insert(conn, "notifications", notification))
+                for notification in notifications
+            ]
+
+    def count_unread_notifications(self, user_id: int) -> int:
+        row = self._conn.execute("SELECT unread FROM notification_unread WHERE user_id = ?", (user_id,)).fetchone()
+        return row[0] if row else 0
+
+    def mark_notifications_read(self, user_id: int, notification_ids: Optional[List[int]] = None) -> int:
+        # Частичный индекс ix_notifications_unread: обновляются только непрочитанные
+        sql = "UPDATE notifications SET is_read = 1 WHERE user_id = ? AND is_read = 0"
+        with self._transaction() as conn:
+            if notification_ids is None:
+                return conn.execute(sql, (user_id,)).rowcount
+            marked = 0
+            for i in range(0, len(notification_ids), SQLITE_BATCH_SIZE):
+                chunk = notification_ids[i:i + SQLITE_BATCH_SIZE]
+                marked += conn.execute(
+                    f"{sql} AND id IN ({', '.join('?' * len(chunk))})", (user_id, *chunk)
+                ).rowcount
+            return marked
+
+    def _rebuild_unread_counters(self) -> None:
+        """Пересчитать счётчики непрочитанных уведомлений (для баз, созданных до их появления)"""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM notification_unread")
+            conn.execute(
+                "INSERT INTO notification_unread (user_id, unread) "
+                "SELECT user_id, COUNT(*) FROM notifications WHERE is_read = 0 GROUP BY user_id"
+            )
+
+    # ----- Импорт и экспорт -----
+
+    def export_records(self, table: str, after_id: int, limit: int) -> List[dict]:
+        # Порция по первичному ключу: каждый запрос начинается с позиции в индексе
+        return self._fetch_all(f"SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit))
+
+    def get_records(self, table: str, ids: Iterable[int]) -> Dict[int, dict]:
+        ids = list(ids)
+        found = {}
+        # Не больше 500 параметров в запросе (ограничение старых версий SQLite - 999)
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            rows = self._fetch_all(
+                "SELECT * FROM {} WHERE id IN ({})".format(table, ", ".join("?" * len(part))), tuple(part)
+            )
+            found.update((row["id"], row) for row in rows)
+        return found
+
+    @staticmethod
+    def _check_import_ids(conn: sqlite3.Connection, table: str, records: List[dict]) -> None:
+        """Отклонить порцию с ID, уже занятым в таблице или более ранней записью порции"""
+        ids = [record["id"] for record in records]
+        existing = set()
+        for start in range(0, len(ids), 500):
+            part = ids[start:start + 500]
+            existing.update(row[0] for row in conn.execute(
+                "SELECT id FROM {} WHERE id IN ({})".format(table, ", ".join("?" * len(part))), part
+            ))
+        seen: Set[int] = set()
+        for record_id in ids:
+            if record_id in existing or record_id in seen:
+                raise ImportConflictError(f"Запись с ID {record_id} уже существует")
+            seen.add(record_id)
+
+    def import_records(self, table: str, records: List[dict]) -> None:
+        fields = list(records[0])
+        sql = "INSERT INTO {} ({}) VALUES ({})".format(table, ", ".join(fields), ", ".join("?" * len(fields)))
+        try:
+            with self._transaction() as conn:
+                self._check_import_ids(conn, table, records)
+                # Счётчики статистики и версии поддерживают триггеры схемы
+                if table == "appointments":
+                    # Приём может занимать несколько слотов - пересечения проверяются
+                    # по каждой записи (с учётом уже вставленных записей порции)
+                    for record in records:
+                        if record["status"] not in CANCELLED_STATUSES and self._slot_owner(conn, record):
+                            raise ImportConflictError("Слот врача уже занят другой записью")
+                        conn.execute(sql, [_to_sql(record[f]) for f in fields])
+                else:
+                    conn.executemany(sql, ([_to_sql(record[f]) for f in fields] for record in records))
+                if table == "reviews":
+                    self._apply_reviews(conn, records)
+                if table in NAME_VERSIONS:
+                    # Имена новых ID могли быть закэшированы пустыми
+                    conn.execute(
+                        "INSERT INTO table_versions (name, version) VALUES (?, 1) "
+                        "ON CONFLICT (name) DO UPDATE SET version = version + 1",
+                        (NAME_VERSIONS[table],)
+                    )
+                versions = self._booking_versions(conn, records) if table == "appointments" else {}
+        except sqlite3.IntegrityError as exc:
+            raise ImportConflictError(_import_conflict_detail(table, str(exc)))
+        if versions:
+            self._patch_calendar(versions, [(None, record) for record in records])
+
+    def _apply_reviews(self, conn: sqlite3.Connection, reviews: List[dict]) -> None:
+        """Обновить рейтинг врачей по отзывам (одна запись врача на порцию)"""
+        doctors: Dict[int, dict] = {}
+        changes: Dict[int, dict] = {}
+        for review in reviews:
+            doctor_id = review["doctor_id"]
+            if doctor_id not in doctors:
+                doctors[doctor_id] = _from_row(
+                    conn.execute("SELECT * FROM doctors WHERE id = ?", (doctor_id,)).fetchone()
+                )
+            changes[doctor_id] = apply_review(doctors[doctor_id], review["rating"], review["created_at"])
+            doctors[doctor_id].update(changes[doctor_id])
+        for doctor_id, doctor_changes in changes.items():
+            self._update(conn, "doctors", doctor_id, doctor_changes)
+
+    # ----- Счётчики -----
+
+    def count_doctors(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM doctors")
+
+    def count_patients(self) -> int:
+        return self._scalar("SELECT COUNT(*) FROM patients")
+
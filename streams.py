@@ -0,0 +1,262 @@
+"""
+Потоки событий (Server-Sent Events) DentalCare App API
+
+Вместо периодического опроса списков клиент держит открытым поток:
+- /api/notifications/{user_id}/stream - новые уведомления пользователя;
+- /api/doctors/{doctor_id}/slots/stream - изменения свободных слотов врача.
+
+StreamHub подписан на шину событий (events.py) и раскладывает события по
+каналам (пользователь или врач). Каждое сообщение получает возрастающий
+номер, который отправляется клиенту в поле id. Канал хранит последние
+сообщения (HISTORY_SIZE): при переподключении с заголовком Last-Event-ID
+клиент получает пропущенные сообщения. Если пропущено больше, чем хранится
+(или процесс перезапускался), клиенту отправляется событие reset - список
+нужно загрузить заново.
+
+Буфер каждого соединения ограничен (BUFFER_SIZE). Если клиент не успевает
+читать, соединение закрывается, а клиент переподключается с Last-Event-ID
+и догоняет по истории канала - медленный клиент не задерживает остальных
+и не копит события в памяти.
+"""
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Deque, Dict, Hashable, List, NamedTuple, Optional, Set
+
+from events import NOTIFICATION_CREATED, SLOT_BOOKED, SLOT_RELEASED, Event, EventBus, Subscription
+from serialization import dumps
+
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних сообщений канала хранится для переподключения
+HISTORY_SIZE = 256
+
+# Сколько сообщений может ждать отправки в одном соединении
+BUFFER_SIZE = 100
+
+# Интервал комментариев keep-alive в секундах
+KEEPALIVE_SECONDS = 15.0
+
+# Через сколько миллисекунд клиенту переподключаться после обрыва
+RETRY_MS = 3000
+
+
+class StreamMessage(NamedTuple):
+    """Сообщение потока"""
+
+    id: int
+    event: str
+    data: bytes  # JSON
+
+    def encode(self) -> bytes:
+        """Сообщение в формате text/event-stream"""
+        return b"id: %d\nevent: %s\ndata: %s\n\n" % (self.id, self.event.encode(), self.data)
+
+
+class StreamConnection:
+    """Соединение клиента с ограниченным буфером сообщений"""
+
+    def __init__(self, hub: "StreamHub", channel: Hashable, buffer_size: int):
+        self.channel = channel
+        self.buffer_size = buffer_size
+        self.overflowed = False
+        self._hub = hub
+        self._buffer: Deque[StreamMessage] = deque()
+        self._ready = asyncio.Event()
+
+    def offer(self, message: StreamMessage) -> None:
+        """Добавить сообщение в буфер (при переполнении соединение закрывается)"""
+        if self.overflowed:
+            return
+        if len(self._buffer) >= self.buffer_size:
+            self.overflowed = True
+            self._buffer.clear()
+        else:
+            self._buffer.append(message)
+        self._ready.set()
+
+    async def next_messages(self, timeout: float) -> Optional[List[StreamMessage]]:
+        """
+        Накопившиеся сообщения (пустой список - истёк таймаут).
+
+        None означает, что клиент отстал и соединение нужно закрыть.
+        """
+        if not self._buffer and not self.overflowed:
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        if self.overflowed:
+            return None
+        messages = list(self._buffer)
+        self._buffer.clear()
+        return messages
+
+    def close(self) -> None:
+        """Отключить соединение от канала"""
+        self._hub.disconnect(self)
+
+
+class _Channel:
+    __slots__ = ("history", "evicted_id", "connections")
+
+    def __init__(self, history_size: int):
+        self.history: Deque[StreamMessage] = deque(maxlen=history_size)
+        self.evicted_id = 0  # номер последнего вытесненного из истории сообщения
+        self.connections: Set[StreamConnection] = set()
+
+    def append(self, message: StreamMessage) -> None:
+        if len(self.history) == self.history.maxlen:
+            self.evicted_id = self.history[0].id
+        self.history.append(message)
+
+
+def user_channel(user_id: int) -> Hashable:
+    """Канал уведомлений пользователя"""
+    return ("user", user_id)
+
+
+def doctor_channel(doctor_id: int) -> Hashable:
+    """Канал свободных слотов врача"""
+    return ("doctor", doctor_id)
+
+
+def slot_event(event_type: str, appointment: dict, slot_time: Optional[datetime] = None) -> Event:
+    """Событие занятия (SLOT_BOOKED) или освобождения (SLOT_RELEASED) слота врача записью"""
+    slot_time = slot_time or appointment["appointment_time"]
+    return Event(
+        type=event_type,
+        user_id=appointment["patient_id"],
+        related_id=appointment["id"],
+        data={
+            "doctor_id": appointment["doctor_id"],
+            "slot_time": slot_time,
+            "available": event_type == SLOT_RELEASED,
+        },
+        created_at=datetime.now(),
+    )
+
+
+def route(event: Event) -> Optional[Hashable]:
+    """Канал, в который направляется событие шины"""
+    if event.type == NOTIFICATION_CREATED:
+        return user_channel(event.user_id)
+    if event.type in (SLOT_BOOKED, SLOT_RELEASED):
+        return doctor_channel(event.data["doctor_id"])
+    return None
+
+
+class StreamHub:
+    """Каналы потоков событий с историей для переподключения"""
+
+    def __init__(self, bus: EventBus, history_size: int = HISTORY_SIZE, buffer_size: int = BUFFER_SIZE):
+        self.bus = bus
+        self.history_size = history_size
+        self.buffer_size = buffer_size
+        self.last_id = 0
+        self.overflows = 0
+        self._channels: Dict[Hashable, _Channel] = {}
+        self._subscription: Optional[Subscription] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Подписаться на события шины"""
+        self._subscription = self.bus.subscribe(
+            maxsize=10_000, types=(NOTIFICATION_CREATED, SLOT_BOOKED, SLOT_RELEASED)
+        )
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Отписаться от шины"""
+        if self._task is None:
+            return
+        self._subscription.close()
+        await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._subscription.next_batch(1000)
+            if not batch:
+                return
+            for event in batch:
+                try:
+                    self.dispatch(event)
+                except Exception:
+                    logger.exception("Не удалось разослать событие %s", event.type)
+
+    def dispatch(self, event: Event) -> Optional[StreamMessage]:
+        """Добавить событие в историю канала и разослать подключённым клиентам"""
+        channel_key = route(event)
+        if channel_key is None:
+            return None
+        self.last_id += 1
+        message = StreamMessage(self.last_id, event.type, dumps(event.data))
+        channel = self._channels.get(channel_key)
+        if channel is None:
+            channel = self._channels[channel_key] = _Channel(self.history_size)
+        channel.append(message)
+        for connection in channel.connections:
+            if not connection.overflowed:
+                connection.offer(message)
+                if connection.overflowed:
+                    self.overflows += 1
+        return message
+
+    def connect(self, channel_key: Hashable, last_event_id: Optional[int] = None) -> StreamConnection:
+        """
+        Подключиться к каналу.
+
+        Если передан last_event_id, в буфер сразу попадают пропущенные
+        сообщения канала; если их уже нет в истории, - событие reset.
+        """
+        channel = self._channels.get(channel_key)
+        if channel is None:
+            channel = self._channels[channel_key] = _Channel(self.history_size)
+        connection = StreamConnection(self, channel_key, self.buffer_size)
+        if last_event_id is not None:
+            missed = [message for message in channel.history if message.id > last_event_id]
+            # Номер из прошлого запуска процесса, вытесненная история или больше
+            # пропущенного, чем помещается в буфер, - клиент загружает данные заново
+            if last_event_id > self.last_id or last_event_id < channel.evicted_id or len(missed) > self.buffer_size:
+                connection.offer(StreamMessage(self.last_id, "reset", b"{}"))
+            else:
+                for message in missed:
+                    connection.offer(message)
+        channel.connections.add(connection)
+        return connection
+
+    def disconnect(self, connection: StreamConnection) -> None:
+        """Отключить соединение"""
+        channel = self._channels.get(connection.channel)
+        if channel is not None:
+            channel.connections.discard(connection)
+
+    def stats(self) -> dict:
+        """Счётчики потоков"""
+        return {
+            "channels": len(self._channels),
+            "connections": sum(len(c.connections) for c in self._channels.values()),
+            "last_event_id": self.last_id,
+            "overflows": self.overflows,
+        }
+
+
+async def event_stream(connection: StreamConnection, keepalive: float = KEEPALIVE_SECONDS) -> AsyncIterator[bytes]:
+    """Тело ответа text/event-stream для соединения"""
+    try:
+        yield b"retry: %d\n\n" % RETRY_MS
+        while True:
+            messages = await connection.next_messages(keepalive)
+            if messages is None:
+                # Клиент отстал: он переподключится с Last-Event-ID
+                return
+            if not messages:
+                yield b": keep-alive\n\n"
+                continue
+            yield b"".join(message.encode() for message in messages)
+    finally:
+        connection.close()
@@ -0,0 +1,54 @@
+"""
+Общие настройки тестов DentalCare App API
+
+Модули приложения лежат в корне репозитория; тесты запускаются оттуда же:
+    python -m pytest -q
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import DoctorSpecialization  # noqa: E402
+from storage import InMemoryStorage, SQLiteStorage  # noqa: E402
+
+
+def make_seed() -> dict:
+    """Небольшой набор данных: два врача и два пациента без записей"""
+    return {
+        "doctors": {
+            doctor_id: {
+                "id": doctor_id, "first_name": f"Врач{doctor_id}", "last_name": "Тестовый",
+                "specialization": DoctorSpecialization.THERAPIST, "experience_years": 5,
+                "photo_url": None, "rating": None, "reviews_count": 0,
+            }
+            for doctor_id in (1, 2)
+        },
+        "patients": {
+            patient_id: {
+                "id": patient_id, "first_name": f"Пациент{patient_id}", "last_name": "Тестовый",
+                "phone": "+79160000000", "email": None, "birth_date": None,
+            }
+            for patient_id in (1, 2)
+        },
+        "appointments": {},
+        "results": {},
+        "services": {},
+        "reviews": {},
+        "notifications": {},
+    }
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def storage(request, tmp_path):
+    """Хранилище каждого вида с данными make_seed()"""
+    if request.param == "memory":
+        yield InMemoryStorage(make_seed())
+        return
+    path = str(tmp_path / "dental.db")
+    SQLiteStorage.initialize(path, make_seed())
+    session = SQLiteStorage.connect(path)
+    yield session
+    session.close()
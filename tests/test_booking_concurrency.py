@@ -0,0 +1,102 @@
+"""
+Стресс-тест бронирования: одновременные попытки занять один слот
+
+Ровно одна попытка успешна, остальные получают SlotConflictError. Хранилище
+в памяти проверяется потоками (общий BookingLedger), SQLite - процессами
+с отдельными соединениями к одному файлу базы (BEGIN IMMEDIATE).
+"""
+import multiprocessing
+import threading
+from datetime import datetime, timedelta
+
+from conftest import make_seed
+from models import AppointmentStatus
+from storage import InMemoryStorage, SlotConflictError, SQLiteStorage
+
+
+SLOT = datetime(2031, 1, 6, 10, 0)
+THREADS = 2000
+PROCESSES = 16
+ROUNDS = 60
+
+
+def attempt(index: int, slot: datetime) -> dict:
+    """Попытка записи, перекрывающая slot: сам слот, 60 минут с него или с предыдущего"""
+    variant = index % 3
+    return {
+        "patient_id": 1 + index % 2, "doctor_id": 1,
+        "appointment_time": slot - timedelta(minutes=30) if variant == 2 else slot,
+        "duration_minutes": 30 if variant == 0 else 60,
+        "service_type": "Осмотр", "status": AppointmentStatus.PENDING,
+        "created_at": SLOT, "updated_at": SLOT,
+    }
+
+
+def book(storage, appointment: dict) -> bool:
+    try:
+        storage.add_appointment(appointment)
+    except SlotConflictError:
+        return False
+    return True
+
+
+def test_threads_book_one_slot_once():
+    storage = InMemoryStorage(make_seed())
+    barrier = threading.Barrier(THREADS)
+    results = [None] * THREADS
+
+    def run(index: int) -> None:
+        barrier.wait()
+        results[index] = book(storage, attempt(index, SLOT))
+
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    assert results.count(False) == THREADS - 1
+    booked = storage.query_appointments(doctor_id=1, limit=THREADS)
+    assert len(booked) == 1
+    # Отклонённые попытки не расходуют ID
+    assert booked[0]["id"] == 1
+    assert book(storage, attempt(0, SLOT + timedelta(hours=1)))
+    assert storage.query_appointments(doctor_id=1, limit=THREADS)[-1]["id"] == 2
+
+
+def _process(number: int, path: str, barrier, queue) -> None:
+    storage = SQLiteStorage.connect(path)
+    try:
+        for round_ in range(ROUNDS):
+            slot = SLOT + timedelta(hours=round_)
+            barrier.wait()
+            queue.put((round_, book(storage, attempt(number + round_, slot))))
+    finally:
+        storage.close()
+
+
+def test_processes_book_one_slot_once(tmp_path):
+    path = str(tmp_path / "dental.db")
+    SQLiteStorage.initialize(path, make_seed())
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(PROCESSES)
+    queue = context.Queue()
+    processes = [context.Process(target=_process, args=(number, path, barrier, queue)) for number in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    results = [queue.get(timeout=60) for _ in range(PROCESSES * ROUNDS)]
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    for round_ in range(ROUNDS):
+        assert [won for number, won in results if number == round_].count(True) == 1
+
+    storage = SQLiteStorage.connect(path)
+    try:
+        booked = storage.query_appointments(doctor_id=1, limit=PROCESSES * ROUNDS)
+    finally:
+        storage.close()
+    assert len(booked) == ROUNDS
+    assert sorted(appointment["id"] for appointment in booked) == list(range(1, ROUNDS + 1))
@@ -0,0 +1,51 @@
+"""
+Тесты индексов in-memory хранилища (indexes.py)
+"""
+import random
+from bisect import bisect_left, bisect_right, insort
+
+import pytest
+
+from indexes import SortedBlocks
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    # Маленькие блоки, чтобы разбиение и удаление блоков срабатывали часто
+    monkeypatch.setattr(SortedBlocks, "BLOCK_SIZE", 4)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_sorted_blocks_match_sorted_list(small_blocks, seed):
+    rng = random.Random(seed)
+    blocks = SortedBlocks(rng.sample(range(200), 30))
+    expected = sorted(blocks)
+    for _ in range(3000):
+        value = rng.randrange(200)
+        if rng.random() < 0.55:
+            blocks.add(value)
+            insort(expected, value)
+        else:
+            present = value in expected
+            assert blocks.remove(value) is present
+            if present:
+                expected.remove(value)
+        assert len(blocks) == len(expected)
+
+        key = rng.randrange(-1, 201)
+        assert blocks.bisect_right(key) == bisect_right(expected, key)
+        assert list(blocks.iter_after(key)) == expected[bisect_right(expected, key):]
+        assert list(blocks.iter_after(key, reverse=True)) == expected[:bisect_left(expected, key)][::-1]
+    assert list(blocks) == expected
+    assert list(blocks.iter_after()) == expected
+    assert list(blocks.iter_after(reverse=True)) == expected[::-1]
+
+
+def test_sorted_blocks_empty():
+    blocks = SortedBlocks()
+    assert not blocks
+    assert blocks.remove(1) is False
+    assert blocks.bisect_right(1) == 0
+    assert list(blocks.iter_after(1)) == list(blocks.iter_after(1, reverse=True)) == []
+    blocks.add(1)
+    assert blocks.remove(1) and list(blocks) == [] and list(blocks.iter_after(reverse=True)) == []
@@ -0,0 +1,50 @@
+"""
+Тесты инкрементального рейтинга врачей (rating.py)
+"""
+from datetime import datetime, timedelta
+from itertools import permutations
+
+import pytest
+
+from rating import apply_review
+
+
+T = datetime(2030, 1, 1, 12, 0)
+
+REVIEWS = [(5, T), (1, T - timedelta(days=365)), (3, T + timedelta(days=1)), (4, T - timedelta(days=20))]
+
+
+def rate(reviews, half_life_days):
+    doctor = {}
+    for rating, reviewed_at in reviews:
+        doctor.update(apply_review(doctor, rating, reviewed_at, half_life_days))
+    return doctor
+
+
+@pytest.mark.parametrize("half_life_days", [None, 30.0, 180.0])
+def test_rating_does_not_depend_on_arrival_order(half_life_days):
+    expected = rate(sorted(REVIEWS, key=lambda review: review[1]), half_life_days)
+    for order in permutations(REVIEWS):
+        doctor = rate(order, half_life_days)
+        assert doctor["rating"] == expected["rating"]
+        assert doctor["rating_sum"] == pytest.approx(expected["rating_sum"])
+        assert doctor["rating_weight"] == pytest.approx(expected["rating_weight"])
+        assert doctor["reviews_count"] == len(REVIEWS)
+        assert doctor["rated_at"] == T + timedelta(days=1)
+
+
+def test_older_review_does_not_move_rated_at_back():
+    doctor = rate([(5, T), (1, T - timedelta(days=365)), (3, T + timedelta(days=1))], 30.0)
+    assert doctor["rating"] == 3.99
+    assert doctor["rated_at"] == T + timedelta(days=1)
+
+
+def test_plain_average_without_half_life():
+    assert rate(REVIEWS, None)["rating"] == round((5 + 1 + 3 + 4) / 4, 2)
+
+
+def test_seed_doctor_rating_is_the_starting_point():
+    doctor = {"rating": 4.0, "reviews_count": 3}
+    doctor.update(apply_review(doctor, 5, T, None))
+    assert doctor["rating"] == 4.25
+    assert doctor["reviews_count"] == 4
@@ -0,0 +1,165 @@
+"""
+Тесты планировщика напоминаний (reminders.py) на симулированных часах
+
+Записи проходят подтверждение, отмену, перенос и завершение, часы
+планировщика двигаются шагами tick(now), посередине планировщик
+"перезапускается" (новая куча, load() из хранилища), и старый экземпляр
+продолжает работать параллельно, как второй процесс. Каждая запись,
+подтверждённая к моменту напоминания, получает ровно одно напоминание о
+своём текущем времени приёма; отменённые и завершённые - ни одного.
+"""
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from conftest import make_seed
+from database import Database
+from events import EventBus
+from models import AppointmentStatus, NotificationType
+from notifications import appointment_event
+from reminders import ReminderScheduler
+from storage import InMemoryStorage
+
+
+BASE = datetime(2031, 1, 6, 9, 0)
+STEP = timedelta(hours=7)
+LEAD = timedelta(hours=24)
+
+
+class SimulatedClock:
+    def __init__(self, now: datetime):
+        self.now = now
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+class RecordingWorker:
+    """Заглушка доставки: запоминает уведомления и время симулированных часов"""
+
+    def __init__(self, clock: SimulatedClock):
+        self.clock = clock
+        self.delivered: List[tuple] = []
+
+    async def deliver(self, notifications: List[dict]) -> None:
+        self.delivered.extend((notification["related_id"], self.clock()) for notification in notifications)
+
+
+def scheduler(database: Database, worker: RecordingWorker, clock: SimulatedClock) -> ReminderScheduler:
+    return ReminderScheduler(EventBus(), database, worker, lead=LEAD, batch_size=500, clock=clock)
+
+
+async def transition(storage, schedulers, event_type: NotificationType, appointment_id: int, **changes) -> None:
+    """Изменить запись в хранилище и передать событие планировщикам (как шина событий)"""
+    appointment = dict(storage.update_appointment(appointment_id, **changes))
+    event = appointment_event(event_type, appointment)
+    for item in schedulers:
+        item.handle(event)
+
+
+async def simulate(storage, count: int) -> None:
+    clock = SimulatedClock(BASE - timedelta(days=2))
+    worker = RecordingWorker(clock)
+    database = Database(lambda: storage, pool_size=4)
+    shift = timedelta(minutes=30) * (count // 2 + 1)
+
+    created = []
+    for offset in range(0, count, 1000):
+        created += storage.add_appointments([
+            {
+                "patient_id": 1, "doctor_id": 1 + index % 2,
+                "appointment_time": BASE + timedelta(minutes=30) * (index // 2),
+                "service_type": "Осмотр", "status": AppointmentStatus.PENDING,
+                "created_at": BASE, "updated_at": BASE,
+            }
+            for index in range(offset, min(offset + 1000, count))
+        ])
+    ids = [appointment["id"] for appointment in created]
+    times: Dict[int, datetime] = {appointment["id"]: appointment["appointment_time"] for appointment in created}
+
+    # Группы по номеру записи: 0-5 подтверждены, 6 подтверждена и отменена,
+    # 7 подтверждена и перенесена, 8 ожидает подтверждения, 9 подтверждена и завершена
+    first = scheduler(database, worker, clock)
+    await first.load()
+    for index, appointment_id in enumerate(ids):
+        group = index % 10
+        if group == 8:
+            continue
+        await transition(storage, [first], NotificationType.APPOINTMENT_CONFIRMED, appointment_id,
+                         status=AppointmentStatus.CONFIRMED)
+        if group == 6:
+            await transition(storage, [first], NotificationType.APPOINTMENT_CANCELLED, appointment_id,
+                             status=AppointmentStatus.CANCELLED_BY_PATIENT)
+        elif group == 7:
+            times[appointment_id] += shift
+            await transition(storage, [first], NotificationType.APPOINTMENT_RESCHEDULED, appointment_id,
+                             appointment_time=times[appointment_id])
+        elif group == 9:
+            await transition(storage, [first], NotificationType.APPOINTMENT_COMPLETED, appointment_id,
+                             status=AppointmentStatus.COMPLETED)
+
+    # Первая половина исходного расписания - один планировщик
+    restart_at = BASE + (created[-1]["appointment_time"] - BASE) / 2
+    while clock.now + STEP < restart_at:
+        clock.now += STEP
+        await first.tick()
+    last_tick = clock.now
+
+    # "Перезапуск": новый планировщик загружает кучу из хранилища, старый продолжает
+    # работать как второй процесс. Затем группа 5 отменяется, а группа 8 подтверждается
+    clock.now = restart_at
+    second = scheduler(database, worker, clock)
+    await second.load()
+    both = [first, second]
+    confirmed_late = set()
+    for index, appointment_id in enumerate(ids):
+        if index % 10 == 5:
+            await transition(storage, both, NotificationType.APPOINTMENT_CANCELLED, appointment_id,
+                             status=AppointmentStatus.CANCELLED_BY_CLINIC)
+        elif index % 10 == 8 and times[appointment_id] - LEAD > restart_at:
+            confirmed_late.add(appointment_id)
+            await transition(storage, both, NotificationType.APPOINTMENT_CONFIRMED, appointment_id,
+                             status=AppointmentStatus.CONFIRMED)
+
+    end = max(times.values()) + STEP
+    while clock.now < end:
+        clock.now += STEP
+        await second.tick()
+        await first.tick()
+
+    sent = Counter(appointment_id for appointment_id, _ in worker.delivered)
+    assert max(sent.values()) == 1, "напоминание отправлено больше одного раза"
+
+    expected = set()
+    for index, appointment_id in enumerate(ids):
+        group = index % 10
+        remind_at = times[appointment_id] - LEAD
+        if group in (0, 1, 2, 3, 4, 7):
+            expected.add(appointment_id)
+        elif group == 5 and remind_at <= last_tick:
+            expected.add(appointment_id)  # напомнили до отмены
+        elif appointment_id in confirmed_late:
+            expected.add(appointment_id)
+    assert set(sent) == expected
+    assert len(confirmed_late) and len(expected) > count // 2
+
+    # Напоминание отправлено к текущему времени приёма (для перенесённых - к новому)
+    for appointment_id, sent_at in worker.delivered:
+        assert times[appointment_id] - LEAD <= sent_at < times[appointment_id]
+        assert storage.get_appointment(appointment_id)["reminded_at"] is not None
+
+    # Отметки reminded_at в хранилище совпадают с отправленными напоминаниями
+    reminded = {
+        appointment_id for appointment_id in ids
+        if storage.get_appointment(appointment_id)["reminded_at"] is not None
+    }
+    assert reminded == expected
+
+
+def test_reminders_exactly_once_100k():
+    asyncio.run(simulate(InMemoryStorage(make_seed()), 100_000))
+
+
+def test_reminders_exactly_once(storage):
+    asyncio.run(simulate(storage, 2_000))
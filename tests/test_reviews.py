@@ -0,0 +1,66 @@
+"""
+Тесты отзывов: один отзыв на приём, выдача ID и проверки POST /api/reviews
+"""
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from storage import DuplicateReviewError, UnknownDoctorError
+
+
+def review(appointment_id: int, doctor_id: int = 1, rating: int = 5) -> dict:
+    return {
+        "patient_id": 1, "doctor_id": doctor_id, "appointment_id": appointment_id,
+        "rating": rating, "comment": None, "created_at": datetime(2031, 1, 6, 12, 0),
+    }
+
+
+def test_duplicate_review_does_not_use_id(storage):
+    first = storage.add_review(review(10))
+    for _ in range(3):
+        with pytest.raises(DuplicateReviewError) as error:
+            storage.add_review(review(10, rating=1))
+        assert error.value.review_id == first["id"]
+    assert storage.add_review(review(11))["id"] == first["id"] + 1
+    assert storage.get_doctor(1)["rating"] == 5.0
+
+
+def test_review_of_unknown_doctor_is_not_saved(storage):
+    with pytest.raises(UnknownDoctorError) as error:
+        storage.add_review(review(10, doctor_id=99))
+    assert error.value.doctor_id == 99
+    assert storage.query_reviews(patient_id=1) == []
+
+    # Приём не закреплён за несохранённым отзывом, ID не израсходован
+    saved = storage.add_review(review(10))
+    assert saved["id"] == 1
+    assert storage.query_reviews(patient_id=1) == [saved]
+
+
+def test_review_must_name_the_appointment_doctor():
+    import main
+    from models import AppointmentStatus
+
+    async def completed_appointment() -> dict:
+        # Завершённый приём без отзыва (демо-данные ссылаются и на несуществующие приёмы)
+        reviewed = {review["appointment_id"] for review in main.MOCK_REVIEWS.values()}
+        async with main.database.session() as db:
+            for hour in range(10, 18):
+                appointment = await db.add_appointment({
+                    "patient_id": 1, "doctor_id": 1, "appointment_time": datetime(2020, 3, 2, hour, 0),
+                    "service_type": "Осмотр", "status": AppointmentStatus.COMPLETED,
+                    "created_at": datetime(2020, 3, 1), "updated_at": datetime(2020, 3, 2),
+                })
+                if appointment["id"] not in reviewed:
+                    return appointment
+
+    with TestClient(main.app) as client:
+        appointment = client.portal.call(completed_appointment)
+        body = {"patient_id": 1, "doctor_id": 2, "appointment_id": appointment["id"], "rating": 1}
+        response = client.post("/api/reviews", json=body)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Приём проводил другой врач"
+
+        response = client.post("/api/reviews", json=dict(body, doctor_id=1, rating=5))
+        assert response.status_code == 201, response.text
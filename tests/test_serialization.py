@@ -0,0 +1,148 @@
+"""
+Тесты быстрой сериализации списков (serialization.py)
+
+Быстрый режим пропускает проверку записей моделью ответа, поэтому его
+ответ должен совпадать с обычным ответом FastAPI побайтно.
+"""
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+import pytest
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+from pydantic import BaseModel
+
+import serialization
+from models import (
+    AppointmentResponse, AppointmentStatus, DoctorBase, MedicalResultResponse,
+    NotificationResponse, NotificationType, ResultType, ReviewResponse
+)
+from serialization import RecordEncoder, records_response
+
+
+# Кавычки, обратный слеш, управляющие символы, не-ASCII и разделители строк JavaScript
+TRICKY = 'Кавычки "x", слеш \\ и /, перевод\nстроки\r\tтаб, \x00\x01\x1f\x7f, эмодзи 😀, </script>,   '
+
+T = datetime(2031, 3, 3, 10, 0)
+
+
+@pytest.fixture(params=["orjson", "pydantic"])
+def fast_json(request, monkeypatch):
+    """Быстрый режим с каждым из кодировщиков"""
+    if request.param == "orjson" and serialization.orjson is None:
+        pytest.skip("orjson не установлен")
+    if request.param == "pydantic":
+        monkeypatch.setattr(serialization, "orjson", None)
+    monkeypatch.setattr(serialization, "FAST_JSON", True)
+
+
+def pydantic_bytes(model, records: List[dict]) -> bytes:
+    """Ответ обычного пути FastAPI: проверка моделью ответа и её сериализация"""
+    app = FastAPI()
+
+    @app.get("/", response_model=List[model])
+    def endpoint():
+        return records
+
+    with TestClient(app) as client:
+        return client.get("/").content
+
+
+def fast_bytes(model, records: List[dict]) -> bytes:
+    return records_response(records, RecordEncoder(model), Response()).body
+
+
+def fill(storage) -> None:
+    """Записи со значениями None, не-ASCII и экранируемыми символами"""
+    for index in range(4):
+        storage.add_appointment({
+            "patient_id": 1 + index % 2, "doctor_id": 1,
+            "appointment_time": T + timedelta(minutes=30 * index, microseconds=index * 1001),
+            "service_type": TRICKY if index % 2 else "Консультация",
+            "status": AppointmentStatus.CONFIRMED if index % 2 else AppointmentStatus.PENDING,
+            "notes": TRICKY if index % 2 else None,
+            "diagnosis": None, "treatment": "", "recommendations": None,
+            "created_at": T - timedelta(days=1), "updated_at": T - timedelta(days=1),
+            "reminded_at": None, "duration_minutes": 60 if index == 3 else None,
+        })
+        storage.add_result({
+            "patient_id": 1, "doctor_id": 1 + index % 2, "result_type": list(ResultType)[index],
+            "title": TRICKY, "description": None if index % 2 else TRICKY,
+            "file_url": "https://example.com/файл?a=1&b=\"2\"", "created_at": T + timedelta(seconds=index),
+        })
+        storage.add_review({
+            "patient_id": 1, "doctor_id": 1, "appointment_id": 100 + index, "rating": 1 + index,
+            "comment": None if index % 2 else TRICKY, "created_at": T + timedelta(seconds=index),
+        })
+    storage.add_notifications([
+        {
+            "user_id": 1, "notification_type": notification_type, "title": TRICKY, "message": TRICKY,
+            "is_read": index % 2 == 0, "related_id": None if index % 2 else index,
+            "created_at": T + timedelta(seconds=index),
+        }
+        for index, notification_type in enumerate(NotificationType)
+    ])
+
+
+def with_names(records: List[dict], *fields: str) -> List[dict]:
+    return [dict(record, **{field: f"{TRICKY} {record['id']}" for field in fields}) for record in records]
+
+
+def test_storage_lists_match_pydantic(storage, fast_json):
+    fill(storage)
+    lists = [
+        (AppointmentResponse, with_names(storage.query_appointments(), "patient_name", "doctor_name")),
+        (MedicalResultResponse, with_names(storage.query_results(1), "doctor_name")),
+        (NotificationResponse, storage.query_notifications(1)),
+        (ReviewResponse, with_names(storage.query_reviews(doctor_id=1), "patient_name")),
+    ]
+    for model, records in lists:
+        assert len(records) >= 4
+        assert fast_bytes(model, records) == pydantic_bytes(model, records), model.__name__
+
+
+class Measured(BaseModel):
+    value: float
+    optional: Optional[float] = None
+    count: int
+    label: Optional[str] = None
+
+
+def test_floats_match_pydantic(fast_json):
+    values = [5, 0, 4.85, 0.1, -0.0, 1e-7, 2.5e-5, 123456789.0, 1e15, 1e16, 1e22, 1.5e300]
+    records = [
+        {"value": value, "optional": None if index % 3 == 0 else value, "count": index, "label": TRICKY}
+        for index, value in enumerate(values)
+    ]
+    assert fast_bytes(Measured, records) == pydantic_bytes(Measured, records)
+
+    doctors = [
+        {"id": 1, "first_name": "Анна", "last_name": TRICKY, "specialization": "therapist",
+         "experience_years": 3, "rating": 5, "reviews_count": 1},
+        {"id": 2, "first_name": "Олег", "last_name": "Ли", "specialization": "surgeon",
+         "experience_years": 7, "rating": None, "reviews_count": None, "rating_sum": 4.5},
+    ]
+    assert fast_bytes(DoctorBase, doctors) == pydantic_bytes(DoctorBase, doctors)
+
+
+def test_endpoints_match_pydantic(monkeypatch):
+    import main
+
+    with TestClient(main.app) as client:
+        slot = client.get("/api/doctors/1/slots").json()[0]
+        created = client.post("/api/appointments", json={
+            "patient_id": 1, "doctor_id": 1, "appointment_time": slot,
+            "service_type": TRICKY, "notes": TRICKY,
+        })
+        assert created.status_code == 201, created.text
+
+        urls = ["/api/appointments", "/api/appointments?limit=2", "/api/results/1",
+                "/api/notifications/1", "/api/reviews"]
+        for url in urls:
+            monkeypatch.setattr(serialization, "FAST_JSON", False)
+            expected = client.get(url)
+            monkeypatch.setattr(serialization, "FAST_JSON", True)
+            actual = client.get(url)
+            assert expected.status_code == actual.status_code == 200, url
+            assert actual.content == expected.content, url
+            assert actual.headers.get("X-Next-Cursor") == expected.headers.get("X-Next-Cursor")
@@ -0,0 +1,344 @@
+"""
+Импорт и экспорт данных клиники DentalCare App API
+
+Таблицы (врачи, пациенты, записи на приём, результаты, отзывы) выгружаются
+и загружаются потоком в формате NDJSON или CSV - для переноса данных между
+инсталляциями и обмена с другими системами.
+
+Экспорт читает таблицу порциями по ID (Storage.export_records) и отдаёт
+каждую порцию клиенту сразу после кодирования. Сессия хранилища берётся
+на одну порцию и не удерживается на время ответа.
+
+Импорт разбирает тело запроса по строкам по мере поступления, проверяет
+строки моделью таблицы и сохраняет их порциями по CHUNK_SIZE строк одной
+операцией (Storage.import_records). Память ограничена одной порцией
+независимо от размера файла. Перед сохранением порции одним запросом на
+таблицу проверяется, что врачи, пациенты и приёмы, на которые ссылаются
+строки, существуют, а время предстоящей записи на приём - что оно в рабочих
+часах врача и на сетке слотов. Строки с ошибками проверки пропускаются и попадают в
+отчёт. Если порция конфликтует с данными хранилища (ID или слот
+уже заняты), она сохраняется по одной строке, чтобы отклонить только
+конфликтующие.
+
+В CSV пустое значение означает отсутствие значения (None).
+
+Настройки (переменные окружения):
+- DENTAL_TRANSFER_CHUNK - строк в порции импорта и экспорта (по умолчанию 1000)
+"""
+import codecs
+import csv
+import io
+import os
+from bisect import bisect_right
+from datetime import date, datetime
+from enum import Enum
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel, ValidationError
+
+from availability import SLOT_MINUTES, WorkingHours
+from database import AsyncStorage, Database
+from indexes import UPCOMING_STATUSES
+from models import (
+    AppointmentStatus, AppointmentTransfer, DataEntity, DataFormat, DoctorTransfer,
+    MedicalResultTransfer, PatientBase, ReviewTransfer
+)
+from serialization import RecordEncoder, dumps, loads
+from storage import ImportConflictError
+
+
+# Строк в порции импорта и экспорта
+CHUNK_SIZE = int(os.environ.get("DENTAL_TRANSFER_CHUNK", "1000"))
+
+# Сколько отклонённых строк перечисляется в отчёте импорта (первые по номеру строки)
+MAX_REPORTED_ERRORS = 100
+
+# Модели строк таблиц (поля и их порядок в выгрузке)
+MODELS: Dict[DataEntity, Type[BaseModel]] = {
+    DataEntity.DOCTORS: DoctorTransfer,
+    DataEntity.PATIENTS: PatientBase,
+    DataEntity.APPOINTMENTS: AppointmentTransfer,
+    DataEntity.RESULTS: MedicalResultTransfer,
+    DataEntity.REVIEWS: ReviewTransfer,
+}
+
+# Ссылки строк на другие таблицы: поле -> таблица
+REFERENCES: Dict[DataEntity, Dict[str, str]] = {
+    DataEntity.APPOINTMENTS: {"patient_id": "patients", "doctor_id": "doctors"},
+    DataEntity.RESULTS: {"patient_id": "patients", "doctor_id": "doctors"},
+    DataEntity.REVIEWS: {"patient_id": "patients", "doctor_id": "doctors", "appointment_id": "appointments"},
+}
+
+REFERENCE_NAMES = {"patients": "Пациент", "doctors": "Врач", "appointments": "Приём"}
+
+MEDIA_TYPES = {
+    DataFormat.NDJSON: "application/x-ndjson",
+    DataFormat.CSV: "text/csv; charset=utf-8",
+}
+
+# Строка файла: номер первой строки и значения (или ошибка разбора)
+Row = Tuple[int, Union[Any, ValueError]]
+
+
+# ========== Экспорт ==========
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_rows(rows: List[dict], fmt: DataFormat) -> bytes:
+    """Порция строк выгрузки в формате fmt"""
+    if fmt == DataFormat.NDJSON:
+        return b"".join(dumps(row) + b"\n" for row in rows)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+    writer.writerows([_csv_value(value) for value in row.values()] for row in rows)
+    return buffer.getvalue().encode()
+
+
+async def export_rows(
+    database: Database,
+    entity: DataEntity,
+    fmt: DataFormat,
+    chunk_size: int = CHUNK_SIZE
+) -> AsyncIterator[bytes]:
+    """Тело выгрузки таблицы: порции строк в порядке ID"""
+    encoder = RecordEncoder(MODELS[entity])
+    if fmt == DataFormat.CSV:
+        yield ",".join(encoder.model.model_fields).encode() + b"\n"
+    after_id = 0
+    while True:
+        async with database.session() as db:
+            records = await db.export_records(entity.value, after_id, chunk_size)
+        if not records:
+            return
+        after_id = records[-1]["id"]
+        yield encode_rows([encoder.row(record) for record in records], fmt)
+
+
+# ========== Импорт ==========
+
+async def iter_lines(body: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """
+    Строки текста UTF-8 из потока байтов.
+
+    Части потока могут резать строку и многобайтный символ в любом месте.
+    Текст не в UTF-8 вызывает UnicodeDecodeError.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    async for chunk in body:
+        lines = (tail + decoder.decode(chunk)).split("\n")
+        tail = lines.pop()
+        for line in lines:
+            yield line.rstrip("\r")
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail.rstrip("\r")
+
+
+async def parse_ndjson(lines: AsyncIterator[str]) -> AsyncIterator[Row]:
+    """Строки NDJSON: JSON-объект в каждой строке, пустые строки пропускаются"""
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_no, loads(line)
+        except ValueError:
+            yield line_no, ValueError("Строка не является JSON")
+
+
+async def parse_csv(lines: AsyncIterator[str]) -> AsyncIterator[Row]:
+    """
+    Строки CSV: первая строка - названия полей.
+
+    Значение в кавычках может занимать несколько строк файла; номер строки
+    в результате - номер первой из них.
+    """
+    header = None
+    line_no = start = 0
+    pending: List[str] = []
+    async for line in lines:
+        line_no += 1
+        if not pending:
+            start = line_no
+        pending.append(line)
+        text = "\n".join(pending) if len(pending) > 1 else line
+        if text.count('"') % 2:
+            continue  # кавычки не закрыты - значение продолжается на следующей строке
+        pending = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = values
+        elif len(values) != len(header):
+            yield start, ValueError(f"Ожидалось значений: {len(header)}, получено: {len(values)}")
+        else:
+            yield start, {name: value if value != "" else None for name, value in zip(header, values)}
+    if pending:
+        yield start, ValueError("Кавычки не закрыты до конца файла")
+
+
+PARSERS = {DataFormat.NDJSON: parse_ndjson, DataFormat.CSV: parse_csv}
+
+
+def _validation_detail(exc: ValidationError) -> str:
+    return "; ".join(
+        "{}: {}".format(".".join(str(part) for part in error["loc"]) or "строка", error["msg"])
+        for error in exc.errors()
+    )
+
+
+class Importer:
+    """
+    Загрузка строк таблицы порциями с отчётом об отклонённых строках.
+
+    on_saved вызывается с записями каждой сохранённой порции - например, чтобы
+    запланировать напоминания о загруженных записях на приём.
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        entity: DataEntity,
+        chunk_size: int = CHUNK_SIZE,
+        on_saved: Optional[Callable[[List[dict]], Any]] = None
+    ):
+        self.database = database
+        self.entity = entity
+        self.model = MODELS[entity]
+        self.chunk_size = chunk_size
+        self.on_saved = on_saved
+        self.imported = 0
+        self.rejected = 0
+        self.errors: List[dict] = []
+        self.line = 0  # последняя прочитанная строка
+        self._chunk: List[Tuple[int, dict]] = []
+
+    def reject(self, line: int, detail: str) -> None:
+        """
+        Отклонить строку.
+
+        Отчёт упорядочен по номеру строки: строки порции, сохраняемой по
+        одной, отклоняются после более поздних строк той же порции.
+        """
+        self.rejected += 1
+        error = {"line": line, "detail": detail}
+        if not self.errors or line >= self.errors[-1]["line"]:
+            if len(self.errors) < MAX_REPORTED_ERRORS:
+                self.errors.append(error)
+            return
+        self.errors.insert(bisect_right([error["line"] for error in self.errors], line), error)
+        del self.errors[MAX_REPORTED_ERRORS:]
+
+    async def add(self, line: int, row: Union[Any, ValueError]) -> None:
+        """Проверить строку и добавить её в порцию"""
+        self.line = line
+        if isinstance(row, ValueError):
+            self.reject(line, str(row))
+            return
+        try:
+            record = self.model.model_validate(row).model_dump()
+        except ValidationError as exc:
+            self.reject(line, _validation_detail(exc))
+            return
+        self._chunk.append((line, record))
+        if len(self._chunk) >= self.chunk_size:
+            await self.flush()
+
+    def _row_error(self, record: dict, found: Dict[str, Dict[int, dict]]) -> Optional[str]:
+        """Ошибка ссылок строки на найденные записи других таблиц (None - строка верна)"""
+        for field, table in REFERENCES[self.entity].items():
+            if record[field] not in found[field]:
+                return f"{REFERENCE_NAMES[table]} с ID {record[field]} не найден"
+
+        if (
+            self.entity == DataEntity.APPOINTMENTS
+            and record["status"] in UPCOMING_STATUSES
+            and record["appointment_time"] > datetime.now()
+        ):
+            # Предстоящим записям - те же правила времени, что и при записи через API;
+            # история (прошедшие, завершённые и отменённые) загружается как есть
+            hours = WorkingHours.from_doctor(found["doctor_id"][record["doctor_id"]])
+            appointment_time = record["appointment_time"]
+            if not hours.contains(appointment_time):
+                return f"Время приёма вне рабочего времени врача ({hours})"
+            if not hours.fits(appointment_time, record["duration_minutes"]):
+                return f"Приём не заканчивается до конца рабочего времени ({hours})"
+            if not hours.on_grid(appointment_time):
+                return f"Время приёма не на начале слота: каждые {SLOT_MINUTES} минут с {hours.start:%H:%M}"
+        elif self.entity == DataEntity.REVIEWS:
+            appointment = found["appointment_id"][record["appointment_id"]]
+            if (appointment["patient_id"], appointment["doctor_id"]) != (record["patient_id"], record["doctor_id"]):
+                return "Пациент или врач отзыва не совпадает с приёмом"
+            if appointment["status"] != AppointmentStatus.COMPLETED:
+                return "Отзыв можно оставить только для завершённого приёма"
+        return None
+
+    async def _check_references(self, db: AsyncStorage, chunk: List[Tuple[int, dict]]) -> List[Tuple[int, dict]]:
+        """Отклонить строки порции со ссылками на несуществующие записи; возвращает остальные"""
+        references = REFERENCES.get(self.entity)
+        if not references:
+            return chunk
+        found = {
+            field: await db.get_records(table, {record[field] for _, record in chunk})
+            for field, table in references.items()
+        }
+        accepted = []
+        for line, record in chunk:
+            detail = self._row_error(record, found)
+            if detail is None:
+                accepted.append((line, record))
+            else:
+                self.reject(line, detail)
+        return accepted
+
+    async def flush(self) -> None:
+        """Сохранить накопленную порцию"""
+        chunk, self._chunk = self._chunk, []
+        if not chunk:
+            return
+        table = self.entity.value
+        async with self.database.session() as db:
+            chunk = await self._check_references(db, chunk)
+            if not chunk:
+                return
+            records = [record for _, record in chunk]
+            try:
+                await db.import_records(table, records)
+            except ImportConflictError:
+                # Порция конфликтует с хранилищем: сохраняем по строке, отклоняя конфликтующие
+                records = []
+                for line, record in chunk:
+                    try:
+                        await db.import_records(table, [record])
+                        records.append(record)
+                    except ImportConflictError as exc:
+                        self.reject(line, exc.detail)
+        self.imported += len(records)
+        if self.on_saved is not None and records:
+            self.on_saved(records)
+
+    async def run(self, body: AsyncIterator[bytes], fmt: DataFormat) -> dict:
+        """Загрузить файл из потока байтов; возвращает итог импорта"""
+        try:
+            async for line, row in PARSERS[fmt](iter_lines(body)):
+                await self.add(line, row)
+        except UnicodeDecodeError:
+            self.reject(self.line + 1, "Текст не в кодировке UTF-8, импорт остановлен")
+        await self.flush()
+        return {
+            "entity": self.entity,
+            "imported": self.imported,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }